@@ -1,23 +1,27 @@
 # app.py - FINAL CORRECTED VERSION
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, get_flashed_messages
+from flask import Response, stream_template, stream_with_context
 from werkzeug.utils import secure_filename
 import sqlite3
 from flask import make_response
 from datetime import date
 import functools
+import hmac
 import csv
 from datetime import datetime # <-- Import the datetime object
 from collections import defaultdict
 from collections import Counter
 import os
+import time
 from smart_scheduler import get_all_classrooms, get_all_teachers, get_all_bookings
 from math import ceil
 # Note: Removed unused imports: datetime, timedelta, Counter, defaultdict, etc.
 
 # Import DB and Core Logic
 # Assuming db_setup.py and smart_scheduler.py are in place and correct
-from db_setup import connect_db, initialize_database
+from config import get_db_path, set_db_path, is_memory_database
+from db_setup import connect_db, initialize_database, record_factory, booking_row, teacher_row, material_request_row
 from smart_scheduler import (
     run_database_migrations,  
     get_teacher_by_id, get_teacher_by_username, register_ict_admin, 
@@ -27,40 +31,66 @@ from smart_scheduler import (
     get_bookings_by_teacher_id, get_pending_requests,
     get_all_teacher_management_data, update_teacher_approval_status, 
     delete_teacher_by_id, get_usage_reports_and_summary,
-    get_all_bookings # Added missing import
+    get_all_bookings, # Added missing import
+    iter_all_bookings, BOOKING_STATUSES,
+    get_teacher_booking_history, HISTORY_PAGE_SIZE
+)
+from change_log import get_changes_since, maybe_compact_change_log
+import sql_trace
+import metrics
+import traffic
+import maintenance
+import cache_bus
+import calendar_feeds
+import slot_holds
+import notifications
+from equipment import plan_equipment, reserve_equipment, sync_booking_equipment
+import materials
+import write_queue
+from write_queue import run_write
+import snapshots
+from snapshots import connect_snapshot
+from room_catalog import get_room_catalog
+from purge import start_purge_thread
+from queries import (
+    AVAILABILITY_SQL, MANAGE_BOOKINGS_PAGE_SQL, ADMIN_ALL_BOOKINGS_PAGE_SQL, MATERIAL_REQUESTS_PAGE_SQL, MATERIAL_REQUESTS_COUNT_SQL,
+    REPORT_STATUS_SUMMARY_SQL, REPORT_TEACHER_RANKING_SQL, REPORT_SUBJECT_RANKING_SQL,
+    REPORT_TOP_TEACHERS_SQL, REPORT_TOP_SUBJECTS_SQL, REPORT_TEACHER_LIST_SQL,
 )
 
 # --- Flask App Setup ---
 app = Flask(__name__)
 # *** IMPORTANT: Change this to a secure, long random string for production ***
 app.secret_key = 'your_super_secure_secret_key_12345' 
-DB_FILE = "smart_classroom.db"
 UPLOAD_FOLDER = "uploads/letters"
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
-DB_FILE = "smart_classroom.db" # Required for get_db_connection
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['DATABASE'] = get_db_path()
+# Shared secret for /changes clients that do not log in (hallway displays); unset = login only.
+app.config['SYNC_TOKEN'] = os.environ.get('SMART_CLASSROOM_SYNC_TOKEN')
+sql_trace.init_app(app)
+metrics.init_app(app)  # after sql_trace, so it can still read the request's SQL stats
+traffic.init_app(app)
+maintenance.init_app(app)
+notifications.init_app(app)
+snapshots.init_app(app)
 # Define get_db_connection locally or import if not defined elsewhere for utilities
 def get_db_connection():
     """Returns a SQLite connection with row_factory set to sqlite3.Row."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect_db()
     conn.row_factory = sqlite3.Row
     return conn
 
 # --- Session-Based User Utility ---
 
 def get_current_user():
-    """Retrieves the user data from the database based on the session ID."""
+    """Retrieves the logged-in user's Teacher record based on the session ID (None if logged out)."""
     user_id = session.get('user_id')
     if user_id:
-        user_data = get_teacher_by_id(user_id)
-        if user_data:
-            # Map the tuple to a dictionary for easy access (based on smart_scheduler structure)
-            keys = ["id", "name", "subject", "username", "password", "role", "is_approved", "email", "phone", "class"]
-            user = dict(zip(keys, user_data))
-            return user
+        return get_teacher_by_id(user_id)
     return None
 
 # ----------------------------
@@ -80,7 +110,7 @@ def admin_required(view):
     @functools.wraps(view)
     def wrapped_view(**kwargs):
         current_user = get_current_user()
-        if not current_user or current_user.get('role') != 'ICT_Admin':
+        if not current_user or current_user.Role != 'ICT_Admin':
             flash('Access denied. ICT Admin privileges required.', 'danger')
             # Redirect admin failures to the main teacher booking page
             return redirect(url_for('bookings')) 
@@ -106,8 +136,34 @@ def create_default_user():
         if success:
             print(f"INFO: Default '{username}' user created.")
 
-# Run initialization on startup
-create_default_user()
+def configure_app(config=None):
+    """
+    Applies settings to the module-level app and returns it; used by wsgi.py and gunicorn.
+
+    This is not a factory: the routes are registered on the single `app` created when this
+    module is imported, so every call configures (and returns) that same object, and
+    settings from earlier calls stay in place. The database path, SQL tracing and write
+    mode given here are process-wide.
+
+    Importing this module never touches the database: schema creation, migrations
+    and the default admin are handled once by `flask --app wsgi init` (or by the
+    development server below), not by every worker that loads the app.
+    """
+    if config:
+        app.config.update(config)
+        if 'DATABASE' in config:
+            set_db_path(config['DATABASE'])
+        if 'SQL_TRACE' in config:
+            sql_trace.set_enabled(config['SQL_TRACE'])
+        if 'WRITE_MODE' in config:
+            write_queue.set_mode(config['WRITE_MODE'])
+    app.config['DATABASE'] = get_db_path()
+    return app
+
+@app.cli.command('init')
+def init_command():
+    """One-shot setup: create tables, run migrations and ensure the default admin."""
+    create_default_user()
 
 # ----------------------------
 # Routes: Authentication
@@ -180,19 +236,16 @@ def register():
         #     return render_template('register.html')
 
         # 2. Database Insertion
-        conn = connect_db()
-        cursor = conn.cursor()
-        
-        # 3. Update the SQL query to include the new columns and values
-        cursor.execute("""
-            INSERT INTO Teachers 
-                (Name, Subject, Username, Password, Email, Phone, Gender, ClassTeacher, Role, IsApproved)
-            VALUES 
-                (?, ?, ?, ?, ?, ?, ?, ?, 'Teacher', 0)
-        """, (name, subject, username, password, email, phone, gender, class_teacher))
-        
-        conn.commit()
-        conn.close()
+        def insert_teacher(conn):
+            # 3. Update the SQL query to include the new columns and values
+            conn.execute("""
+                INSERT INTO Teachers 
+                    (Name, Subject, Username, Password, Email, Phone, Gender, ClassTeacher, Role, IsApproved)
+                VALUES 
+                    (?, ?, ?, ?, ?, ?, ?, ?, 'Teacher', 0)
+            """, (name, subject, username, password, email, phone, gender, class_teacher))
+
+        run_write(insert_teacher)
         
         flash('Registration successful! Please wait for ICT Teacher approval.', 'success')
         return redirect(url_for('login'))
@@ -203,8 +256,8 @@ def register():
 def user_status():
     teacher_info = get_current_user()
     if teacher_info:
-        is_approved = teacher_info.get('is_approved')
-        name = teacher_info.get('name') 
+        is_approved = teacher_info.IsApproved
+        name = teacher_info.Name
         
         status_text = "Approved! You can now access booking pages." if is_approved == 1 else "Pending approval by the ICT Teacher."
         status_class = "success" if is_approved == 1 else "warning"
@@ -216,6 +269,19 @@ def user_status():
 # ----------------------------
 
 
+def _history_args():
+    """Reads the booking history filters shared by the page and the JSON API."""
+    scope = request.args.get('scope', 'upcoming')
+    status = request.args.get('status')
+    return {
+        'scope': scope if scope in ('upcoming', 'past', 'all') else 'upcoming',
+        'date_from': request.args.get('date_from') or None,
+        'date_to': request.args.get('date_to') or None,
+        'status': status if status in BOOKING_STATUSES else None,
+        'cursor': request.args.get('cursor') or None,
+        'limit': min(max(1, request.args.get('limit', HISTORY_PAGE_SIZE, type=int)), 100),
+    }
+
 @app.route("/teacher/bookings")
 def teacher_bookings():
     teacher_id = session.get('user_id') 
@@ -223,8 +289,55 @@ def teacher_bookings():
         return redirect(url_for('logout'))
 
     # NOTE: Replaced current_user.id with session-based ID
-    bookings = get_bookings_by_teacher_id(teacher_id) 
-    return render_template("teacher_bookings.html", bookings=bookings)
+    args = _history_args()
+    history = get_teacher_booking_history(teacher_id, **args)
+    return render_template("my_bookings.html", bookings=history['bookings'],
+                           next_cursor=history['next_cursor'], filters=args, statuses=BOOKING_STATUSES)
+
+@app.route("/api/teacher/bookings")
+def teacher_bookings_api():
+    """JSON booking history of the logged-in teacher: ?scope=upcoming|past|all&date_from&date_to&status&cursor&limit"""
+    teacher_id = session.get('user_id')
+    if not teacher_id:
+        return jsonify({'error': 'login required'}), 401
+    history = get_teacher_booking_history(teacher_id, **_history_args())
+    return jsonify(bookings=[dict(booking) for booking in history['bookings']], next_cursor=history['next_cursor'])
+
+# --- CALENDAR FEEDS ---
+# Public like /view_all_request. Unchanged feeds are answered with 304 from
+# FeedVersions alone (see calendar_feeds.py).
+
+def _calendar_feed(kind, entity_id):
+    version, modified = calendar_feeds.feed_version(kind, entity_id)
+    etag = calendar_feeds.feed_etag(kind, entity_id, version)
+    not_modified = (request.if_none_match.contains(etag) if request.if_none_match
+                    else modified is not None and request.if_modified_since is not None
+                    and modified <= request.if_modified_since)
+    if not_modified:
+        metrics.record_cache('calendar_feed', True)
+        response = Response(status=304)
+    else:
+        metrics.record_cache('calendar_feed', False)
+        body = calendar_feeds.get_feed(kind, entity_id, version)
+        if body is None:
+            return jsonify({'error': f'unknown {kind}'}), 404
+        response = Response(body, mimetype='text/calendar')
+        response.headers['Content-Disposition'] = f'inline; filename="{kind}-{entity_id}.ics"'
+    response.set_etag(etag)
+    if modified is not None:
+        response.last_modified = modified
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate; cheap thanks to the ETag
+    return response
+
+@app.route('/calendar/teacher/<int:teacher_id>.ics')
+def teacher_calendar(teacher_id):
+    """Approved bookings of one teacher as an iCalendar feed."""
+    return _calendar_feed('teacher', teacher_id)
+
+@app.route('/calendar/room/<int:room_id>.ics')
+def room_calendar(room_id):
+    """Approved bookings of one room as an iCalendar feed."""
+    return _calendar_feed('room', room_id)
 
 # ----------------------------
 # Routes: Admin Interface
@@ -282,10 +395,6 @@ def approve_teacher_account(teacher_id, action):
 @app.route('/admin/manage_teachers/edit/<int:teacher_id>', methods=['GET', 'POST'])
 def edit_teacher_page(teacher_id):
     """Handles displaying and updating a teacher's details."""
-    conn = connect_db()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
     if request.method == "POST":
         name = request.form.get("name")
         subject = request.form.get("subject")
@@ -294,21 +403,23 @@ def edit_teacher_page(teacher_id):
         email = request.form.get("email")
         phone = request.form.get("phone")
         class_assigned = request.form.get("class")
-        
-        try:
-            cursor.execute("""
+
+        def update_teacher(conn):
+            conn.execute("""
                 UPDATE Teachers
                 SET Name=?, Subject=?, Username=?, Role=?, Email=?, Phone=?, Class=?
                 WHERE TeacherID=?
             """, (name, subject, username, role, email, phone, class_assigned, teacher_id))
-            conn.commit()
+
+        try:
+            run_write(update_teacher)
             flash(f"Teacher {name} information updated successfully!", "success")
         except sqlite3.Error as e:
             flash(f"Error updating teacher: {e}", "danger")
-        finally:
-            conn.close()
-            return redirect(url_for('manage_teachers'))
-    
+        return redirect(url_for('manage_teachers'))
+
+    conn = connect_db(teacher_row)
+    cursor = conn.cursor()
     cursor.execute("SELECT * FROM Teachers WHERE TeacherID=?", (teacher_id,))
     teacher = cursor.fetchone()
     conn.close()
@@ -325,7 +436,8 @@ def edit_teacher_page(teacher_id):
 def delete_teacher_account(teacher_id): 
     # NOTE: Renamed to avoid clash with imported function
     if delete_teacher_by_id(teacher_id):
-        flash("Teacher and associated bookings deleted successfully!", "success")
+        start_purge_thread()
+        flash("Teacher deleted. Their bookings are being removed in the background.", "success")
     else:
         flash("Failed to delete teacher (ICT Admin accounts cannot be deleted).", "danger")
     return redirect(url_for('manage_teachers'))
@@ -338,7 +450,7 @@ def approve_booking(booking_id):
     return redirect(url_for("manage_bookings"))
 @app.route('/manage_bookings')
 def manage_bookings():
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
 
     # Pagination settings
@@ -347,22 +459,7 @@ def manage_bookings():
     offset = (page - 1) * per_page
 
     # Fetch paginated bookings with teacher and room names
-    cursor.execute("""
-        SELECT 
-            b.BookingID,
-            t.Name AS TeacherName,
-            c.Name AS RoomName,
-            b.Date,
-            b.StartTime,
-            b.EndTime,
-            b.Equipment,
-            b.Status
-        FROM Bookings b
-        LEFT JOIN Teachers t ON b.TeacherID = t.TeacherID
-        LEFT JOIN Classrooms c ON b.RoomID = c.RoomID
-        ORDER BY b.Date DESC
-        LIMIT ? OFFSET ?
-    """, (per_page, offset))
+    cursor.execute(MANAGE_BOOKINGS_PAGE_SQL, (per_page, offset))
     bookings = cursor.fetchall()
 
     # Get total number of bookings
@@ -387,7 +484,7 @@ def manage_bookings():
 
 @app.route('/manage_teacherbook')
 def manage_teacherbook():
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
 
     # Pagination settings
@@ -396,22 +493,7 @@ def manage_teacherbook():
     offset = (page - 1) * per_page
 
     # Fetch paginated bookings with teacher and room names
-    cursor.execute("""
-        SELECT 
-            b.BookingID,
-            t.Name AS TeacherName,
-            c.Name AS RoomName,
-            b.Date,
-            b.StartTime,
-            b.EndTime,
-            b.Equipment,
-            b.Status
-        FROM Bookings b
-        LEFT JOIN Teachers t ON b.TeacherID = t.TeacherID
-        LEFT JOIN Classrooms c ON b.RoomID = c.RoomID
-        ORDER BY b.Date DESC
-        LIMIT ? OFFSET ?
-    """, (per_page, offset))
+    cursor.execute(MANAGE_BOOKINGS_PAGE_SQL, (per_page, offset))
     bookings = cursor.fetchall()
 
     # Get total number of bookings
@@ -500,19 +582,22 @@ def inject_global_vars():
 
 # --- SIMULATION FUNCTIONS (Replace with actual Database Queries) ---
 
+summary_row = record_factory('Summary')
+
 def calculate_status_summary():
     """Fetches the count of bookings by Status from the database."""
-    conn = connect_db()
+    conn = connect_snapshot()
     if not conn:
         return {'Approved': 0, 'Pending': 0, 'Denied': 0, 'Cancelled': 0}
 
     cursor = conn.cursor()
-    # Query: SELECT Status, COUNT(BookingID) FROM Bookings GROUP BY Status
-    cursor.execute("SELECT Status, COUNT(BookingID) AS Count FROM Bookings GROUP BY Status")
+    cursor.row_factory = summary_row
+    # BookingCounts includes bookings moved to the archive (see archive.py)
+    cursor.execute("SELECT Status, SUM(Bookings) AS Count FROM BookingCounts GROUP BY Status")
     results = cursor.fetchall()
     conn.close()
     
-    status_summary = {row['Status']: row['Count'] for row in results}
+    status_summary = {row.Status: row.Count for row in results}
     
     # Ensure all required keys exist (defaulting to 0)
     default_summary = {'Approved': 0, 'Pending': 0, 'Denied': 0, 'Cancelled': 0}
@@ -522,101 +607,63 @@ def calculate_status_summary():
 
 def calculate_teacher_ranking():
     """Fetches and ranks teachers by number of Approved bookings."""
-    conn = connect_db()
+    conn = connect_snapshot()
     if not conn:
         return []
         
     cursor = conn.cursor()
+    cursor.row_factory = summary_row
     # Query: JOIN Teachers and Bookings, filter by Approved, group by Teacher Name, order by count DESC
-    cursor.execute("""
-        SELECT 
-            T.Name, 
-            COUNT(B.BookingID) AS Count
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        WHERE B.Status = 'Approved'
-        GROUP BY T.Name
-        ORDER BY Count DESC
-        LIMIT 10
-    """)
+    cursor.execute(REPORT_TOP_TEACHERS_SQL, (10,))
     # Results are (Name, Count)
     results = cursor.fetchall()
     conn.close()
     
-    # Convert sqlite3.Row objects to list of tuples for the template
-    return [(row['Name'], row['Count']) for row in results]
+    # Convert the records to plain tuples for the template
+    return [(row.Name, row.Count) for row in results]
 
 def calculate_subject_ranking():
     """Fetches and ranks subjects by number of Approved bookings."""
-    conn = connect_db()
+    conn = connect_snapshot()
     if not conn:
         return []
         
     cursor = conn.cursor()
+    cursor.row_factory = summary_row
     # Note: Your Bookings table does not have a 'subject' column, 
     # but the Teachers table does. We'll use the Teacher's Subject.
     # If the booking itself specifies the subject, you must add it to the Bookings table.
     
     # Assuming we get the subject from the Teacher tied to the approved booking:
-    cursor.execute("""
-        SELECT 
-            T.Subject, 
-            COUNT(B.BookingID) AS Count
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        WHERE B.Status = 'Approved' AND T.Subject IS NOT NULL
-        GROUP BY T.Subject
-        ORDER BY Count DESC
-        LIMIT 10
-    """)
+    cursor.execute(REPORT_TOP_SUBJECTS_SQL, (10,))
     results = cursor.fetchall()
     conn.close()
     
     # Convert to list of tuples for the template
-    return [(row['Subject'], row['Count']) for row in results]
+    return [(row.Subject, row.Count) for row in results]
 
 # --- THE FLASK ENDPOINT ---
 
 
 @app.route('/admin/reports')
 def admin_reports():
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
 
     # --- Booking summary ---
-    cursor.execute("SELECT Status, COUNT(*) FROM Bookings GROUP BY Status")
+    cursor.execute(REPORT_STATUS_SUMMARY_SQL)
     summary = {row[0]: row[1] for row in cursor.fetchall()}
 
     # --- Teacher ranking ---
-    cursor.execute("""
-        SELECT T.Name, COUNT(B.BookingID)
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        WHERE B.Status = 'Approved'
-        GROUP BY T.Name
-        ORDER BY COUNT(B.BookingID) DESC
-    """)
+    cursor.execute(REPORT_TEACHER_RANKING_SQL)
     teacher_ranking = cursor.fetchall()
 
     # --- Subject ranking ---
-    cursor.execute("""
-        SELECT T.Subject, COUNT(B.BookingID)
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        WHERE B.Status = 'Approved'
-        GROUP BY T.Subject
-        ORDER BY COUNT(B.BookingID) DESC
-    """)
+    cursor.execute(REPORT_SUBJECT_RANKING_SQL)
     subject_ranking = cursor.fetchall()
 
     # --- Teacher list ---
-    cursor.execute("""
-        SELECT T.Name, T.Email, T.Phone, 
-               COUNT(B.BookingID) AS Bookings
-        FROM Teachers T
-        LEFT JOIN Bookings B ON T.TeacherID = B.TeacherID
-        GROUP BY T.TeacherID
-    """)
+    cursor.execute(REPORT_TEACHER_LIST_SQL)
     teacher_list = [
         dict(Name=row[0], Email=row[1], Phone=row[2], Bookings=row[3])
         for row in cursor.fetchall()
@@ -642,33 +689,19 @@ def admin_reports():
 
 @app.route('/admin/analysis')
 def analysis():
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
 
     # Booking summary
-    cursor.execute("SELECT Status, COUNT(*) FROM Bookings GROUP BY Status")
+    cursor.execute(REPORT_STATUS_SUMMARY_SQL)
     summary = {row[0]: row[1] for row in cursor.fetchall()}
 
     # Teacher ranking
-    cursor.execute("""
-        SELECT T.Name, COUNT(B.BookingID)
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        WHERE B.Status = 'Approved'
-        GROUP BY T.Name
-        ORDER BY COUNT(B.BookingID) DESC
-    """)
+    cursor.execute(REPORT_TEACHER_RANKING_SQL)
     teacher_ranking = cursor.fetchall()
 
     # Subject ranking
-    cursor.execute("""
-        SELECT T.Subject, COUNT(B.BookingID)
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        WHERE B.Status = 'Approved'
-        GROUP BY T.Subject
-        ORDER BY COUNT(B.BookingID) DESC
-    """)
+    cursor.execute(REPORT_SUBJECT_RANKING_SQL)
     subject_ranking = cursor.fetchall()
 
     conn.close()
@@ -687,25 +720,107 @@ def analysis():
     )
 
 
+# --- PUBLIC REQUEST LIST ---
+# /view_all_request is public, so it is paged, capped and streamed: rows go from the
+# cursor through stream_template in chunks instead of one fetchall() over the whole
+# table. Anonymous renderings are cached against the bookings, teachers and rooms
+# cache versions (see cache_bus.py), so a change in any worker invalidates them at once.
+
+ALL_REQUESTS_PER_PAGE = 50
+ALL_REQUESTS_MAX_PER_PAGE = 200
+ALL_REQUESTS_MAX_PAGE = 50
+ALL_REQUESTS_CACHE_TTL_SECONDS = 300
+ALL_REQUESTS_CACHE_DOMAINS = ('bookings', 'teachers', 'rooms')
+ALL_REQUESTS_CACHE_MAX_ENTRIES = 256
+STREAM_CHUNK_CHARS = 16384
+
+_all_requests_cache = {}  # (filters, page, per_page) -> (versions, stored_at, html)
+
+class _PageState:
+    """Filled in while the rows stream, read by the template after the table."""
+    def __init__(self):
+        self.rows = 0
+        self.has_next = False
+
+def _page_rows(rows, per_page, state):
+    for row in rows:
+        if state.rows == per_page:
+            state.has_next = True  # the extra row only tells us another page exists
+            break
+        state.rows += 1
+        yield row
+
+def _chunked(pieces, size=STREAM_CHUNK_CHARS):
+    """Joins Jinja's small fragments into larger writes."""
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _cache_all_requests(key, versions, pieces):
+    """Passes the stream through and stores the full page once it has been sent."""
+    parts = []
+    for piece in pieces:
+        parts.append(piece)
+        yield piece
+    if len(_all_requests_cache) >= ALL_REQUESTS_CACHE_MAX_ENTRIES:
+        _all_requests_cache.pop(next(iter(_all_requests_cache)))
+    _all_requests_cache[key] = (versions, time.monotonic(), ''.join(parts))
+
 @app.route('/view_all_request')
 def view_all_requests():
     """
-    Fetches and displays all classroom booking requests.
+    Displays classroom booking requests, one capped page at a time, with date/status filters.
     Note: This endpoint is publicly accessible as requested (no decorators).
     """
-    try:
-        # 1. Fetch all bookings using the existing function
-        # This function should return a list of all booking records (Approved, Pending, Denied)
-        all_bookings = get_all_bookings()
-        
-        # 2. Render the template and pass the data
-        return render_template('all_requests.html', bookings=all_bookings)
-        
-    except Exception as e:
-        # Handle potential errors (e.g., database connection failure)
-        flash(f"An error occurred while fetching requests: {e}", 'danger')
-        # Redirect back to the main booking page or a safe default
-        return redirect(url_for('book_classroom')) 
+    page = max(1, request.args.get('page', 1, type=int))
+    if page > ALL_REQUESTS_MAX_PAGE:
+        flash(f"Only the first {ALL_REQUESTS_MAX_PAGE} pages are available; narrow the dates instead.", 'warning')
+        return redirect(url_for('view_all_requests', **dict(request.args, page=ALL_REQUESTS_MAX_PAGE)))
+    per_page = min(max(1, request.args.get('per_page', ALL_REQUESTS_PER_PAGE, type=int)), ALL_REQUESTS_MAX_PER_PAGE)
+    filters = {
+        'date_from': request.args.get('date_from') or None,
+        'date_to': request.args.get('date_to') or None,
+        'status': request.args.get('status') if request.args.get('status') in BOOKING_STATUSES else None,
+    }
+
+    # Only anonymous pages without pending flash messages look the same for everyone.
+    cacheable = not session.get('user_id') and '_flashes' not in session
+    key = (tuple(filters.values()), page, per_page)
+    versions = cache_bus.versions_of(ALL_REQUESTS_CACHE_DOMAINS) if cacheable else None
+    cacheable = versions is not None
+    if cacheable:
+        cached = _all_requests_cache.get(key)
+        hit = cached is not None and cached[0] == versions and time.monotonic() - cached[1] < ALL_REQUESTS_CACHE_TTL_SECONDS
+        metrics.record_cache('all_requests', hit)
+        if hit:
+            return cached[2]
+
+    # Pop the flash messages now: the session cookie is written before the body streams,
+    # so popping them inside the template would leave them in the cookie for the next page.
+    # Flask keeps the popped messages on the request context for the template to show.
+    get_flashed_messages(with_categories=True)
+
+    state = _PageState()
+    rows = iter_all_bookings(limit=per_page + 1, offset=(page - 1) * per_page, **filters)
+    pieces = _chunked(stream_template(
+        'all_requests.html',
+        bookings=_page_rows(rows, per_page, state),
+        page_state=state,
+        page=page,
+        per_page=per_page,
+        max_page=ALL_REQUESTS_MAX_PAGE,
+        filters=filters,
+        statuses=BOOKING_STATUSES,
+    ))
+    if cacheable:
+        pieces = _cache_all_requests(key, versions, pieces)
+    return Response(stream_with_context(pieces), mimetype='text/html')
     # app.py
 
 # Ensure get_all_classrooms is imported from smart_scheduler
@@ -714,6 +829,30 @@ def view_all_requests():
 
 
 
+def _has_sync_token():
+    expected = app.config.get('SYNC_TOKEN')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return bool(expected) and hmac.compare_digest(supplied, expected)
+
+@app.route('/changes')
+def changes():
+    """
+    Delta sync for schedule mirrors: returns the rows touched after ?since=<seq>.
+    Clients store the returned 'next' value and pass it back on the next poll;
+    when 'reset' is true they must reload the full data set first.
+    Needs a logged-in user or the sync token (Authorization: Bearer <SYNC_TOKEN>).
+    """
+    if not session.get('user_id') and not _has_sync_token():
+        return jsonify({'error': 'login or sync token required'}), 401
+
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 500, type=int)
+
+    result = get_changes_since(since, limit)
+    maybe_compact_change_log()
+    return jsonify(result)
+
+
 @app.route('/add-columns-fix')
 def add_db_columns():
     conn = connect_db()
@@ -739,12 +878,8 @@ def add_db_columns():
 
 @app.route('/bookings/new', methods=['GET', 'POST'])
 def bookings():
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    # ✅ Fetch classrooms with correct column name
-    cursor.execute("SELECT RoomID, Name, EquipmentList FROM Classrooms")
-    classrooms = cursor.fetchall()
+    # ✅ Classrooms come from the in-memory room catalog
+    classrooms = list(get_room_catalog().values())
 
     if request.method == 'POST':
         # ✅ Get logged-in teacher info from session
@@ -758,27 +893,89 @@ def bookings():
         equipment = request.form.get('equipment', '').strip()
         status = 'Pending'
 
+        metrics.BOOKING_SUBMISSIONS.inc('form')
+
         # ✅ Validation
         if not (teacher_id and room_id and date and start_time and end_time):
             flash("Please fill in all required fields.", "danger")
         else:
-            try:
+            def insert_booking(conn):
+                cursor = conn.cursor()
+                # The room is already booked at an overlapping time.
+                cursor.execute(AVAILABILITY_SQL, (room_id, date, end_time, start_time))
+                if cursor.fetchone()[0]:
+                    return "taken"
+                # Another teacher is still filling in the form for this slot.
+                if slot_holds.held_by_other(cursor, teacher_id, room_id, date, start_time, end_time):
+                    return "held"
+                reservations, shortages = plan_equipment(cursor, room_id, date, start_time, end_time, equipment)
+                if shortages:
+                    return shortages
                 cursor.execute("""
                     INSERT INTO Bookings (TeacherID, RoomID, Date, StartTime, EndTime, Equipment, Status)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 """, (teacher_id, room_id, date, start_time, end_time, equipment, status))
-                conn.commit()
-                flash(f"Booking created successfully by {username} and marked as Pending!", "success")
-                return redirect(url_for('bookings'))
+                reserve_equipment(cursor, cursor.lastrowid, date, start_time, end_time, reservations)
+                slot_holds.convert_hold(cursor, teacher_id)
+                return None
+
+            try:
+                conflict = run_write(insert_booking)
+                if conflict is None:
+                    flash(f"Booking created successfully by {username} and marked as Pending!", "success")
+                    return redirect(url_for('bookings'))
+                metrics.BOOKING_CONFLICTS.inc('form')
+                if conflict == "taken":
+                    flash("This room is already booked at that time. Please choose another time.", "warning")
+                elif conflict == "held":
+                    flash("Another teacher is booking this slot right now. Please choose another time.", "warning")
+                else:
+                    flash(f"Not enough equipment free at this time: {', '.join(conflict)}. "
+                          "Please choose another time or ask for less.", "warning")
             except sqlite3.Error as e:
                 flash(f"Database error: {e}", "danger")
 
-    conn.close()
     # ✅ Use "classrooms" variable to match template
     return render_template('bookings.html', classrooms=classrooms)
 
 
 
+@app.route('/bookings/hold', methods=['POST'])
+def hold_slot():
+    """
+    Holds the slot picked on the booking form for a few minutes (see slot_holds.py).
+    Returns {'held': true, 'expires_in': seconds} or 409 when the slot is booked or held.
+    """
+    teacher_id = session.get('user_id')
+    if not teacher_id:
+        return jsonify({'error': 'login required'}), 401
+    room_id = request.form.get('room_id', type=int)
+    date = request.form.get('date')
+    start_time = request.form.get('start_time')
+    end_time = calculate_end_time(start_time) if start_time else None
+    if not (room_id and date and end_time):
+        return jsonify({'error': 'room_id, date and start_time are required'}), 400
+
+    try:
+        expires_at = slot_holds.place_hold(teacher_id, room_id, date, start_time, end_time)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {e}'}), 500
+    if expires_at is None:
+        return jsonify({'held': False, 'reason': 'This slot is already booked or being booked.'}), 409
+    return jsonify({'held': True, 'end_time': end_time, 'expires_in': int(expires_at - time.time())})
+
+@app.route('/bookings/hold/release', methods=['POST'])
+def release_slot_hold():
+    """Gives up the teacher's hold when they leave the booking form without submitting it."""
+    teacher_id = session.get('user_id')
+    if not teacher_id:
+        return jsonify({'error': 'login required'}), 401
+    try:
+        slot_holds.release_hold(teacher_id)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Database error: {e}'}), 500
+    return '', 204
+
 @app.route('/booking/<int:booking_id>/cancel', methods=['POST', 'GET'])
 def cancel_booking(booking_id):
     # Logic to cancel the booking
@@ -790,10 +987,10 @@ def cancel_booking(booking_id):
 def admin_all_bookings():
     """
     Fetches all bookings from the database,
-    joining with Teachers and Classrooms tables
+    read from the BookingView table (teacher and room names included)
     to show readable information, with pagination.
     """
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
 
     # Pagination settings
@@ -802,38 +999,8 @@ def admin_all_bookings():
     offset = (page - 1) * per_page
 
     # Fetch paginated bookings with teacher subject
-    cursor.execute("""
-        SELECT 
-            B.BookingID,
-            T.Name AS TeacherName,
-            T.Subject AS TeacherSubject,
-            C.Name AS RoomName,
-            B.Date,
-            B.StartTime,
-            B.EndTime,
-            B.Equipment,
-            B.Status
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        JOIN Classrooms C ON B.RoomID = C.RoomID
-        ORDER BY B.Date DESC, B.StartTime ASC
-        LIMIT ? OFFSET ?
-    """, (per_page, offset))
-
-    bookings = [
-        dict(
-            BookingID=row[0],
-            TeacherName=row[1],
-            Subject=row[2],
-            RoomName=row[3],
-            Date=row[4],
-            StartTime=row[5],
-            EndTime=row[6],
-            Equipment=row[7],
-            Status=row[8],
-        )
-        for row in cursor.fetchall()
-    ]
+    cursor.execute(ADMIN_ALL_BOOKINGS_PAGE_SQL, (per_page, offset))
+    bookings = cursor.fetchall()
 
     # Get total number of bookings for pagination
     cursor.execute("SELECT COUNT(*) FROM Bookings")
@@ -855,14 +1022,12 @@ def admin_all_bookings():
 
 @app.route('/booking_reports')
 def booking_reports():
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
 
     # --- Status Summary ---
-    cursor.execute("SELECT Status FROM Bookings")
-    bookings_status = cursor.fetchall()
-    status_list = [b[0] for b in bookings_status if b[0]]  # remove None
-    status_summary = Counter(status_list)
+    cursor.execute(REPORT_STATUS_SUMMARY_SQL)
+    status_summary = Counter(dict(cursor.fetchall()))
 
     status_labels = list(status_summary.keys()) if status_summary else []
     status_counts = list(status_summary.values()) if status_summary else []
@@ -873,27 +1038,13 @@ def booking_reports():
     status_summary_list = list(zip(status_labels, status_counts, status_percentages))
 
     # --- Top Teachers ---
-    cursor.execute("""
-        SELECT t.Name, COUNT(*) as count
-        FROM Bookings b
-        JOIN Teachers t ON b.TeacherID = t.TeacherID
-        WHERE b.Status='Approved'
-        GROUP BY t.Name
-        ORDER BY count DESC
-    """)
+    cursor.execute(REPORT_TEACHER_RANKING_SQL)
     teacher_ranking = cursor.fetchall() or []
     teacher_labels = [t[0] for t in teacher_ranking]
     teacher_counts = [t[1] for t in teacher_ranking]
 
     # --- Top Subjects ---
-    cursor.execute("""
-        SELECT t.Subject, COUNT(*) as count
-        FROM Bookings b
-        JOIN Teachers t ON b.TeacherID = t.TeacherID
-        WHERE b.Status='Approved'
-        GROUP BY t.Subject
-        ORDER BY count DESC
-    """)
+    cursor.execute(REPORT_SUBJECT_RANKING_SQL)
     subject_ranking = cursor.fetchall() or []
     subject_labels = [s[0] for s in subject_ranking]
     subject_counts = [s[1] for s in subject_ranking]
@@ -916,7 +1067,7 @@ def booking_reports():
 # EDIT BOOKING ENDPOINT
 @app.route('/edit_booking/<int:booking_id>', methods=['GET', 'POST'])
 def edit_booking(booking_id):
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
 
     # Fetch the booking details along with teacher info
@@ -937,10 +1088,10 @@ def edit_booking(booking_id):
         WHERE B.BookingID = ?
     """, (booking_id,))
     booking = cursor.fetchone()
+    conn.close()
 
     if not booking:
         flash("Booking not found.", "danger")
-        conn.close()
         return redirect(url_for('manage_bookings'))
 
     if request.method == 'POST':
@@ -951,60 +1102,59 @@ def edit_booking(booking_id):
         equipment = request.form.get('equipment')
         status = request.form.get('status')
 
-        # Update booking
-        cursor.execute("""
-            UPDATE Bookings
-            SET Date = ?, StartTime = ?, EndTime = ?, Equipment = ?, Status = ?
-            WHERE BookingID = ?
-        """, (date, start_time, end_time, equipment, status, booking_id))
-        conn.commit()
-        conn.close()
+        def update_booking(conn):
+            cursor = conn.cursor()
+            row = cursor.execute("SELECT Status FROM Bookings WHERE BookingID = ?", (booking_id,)).fetchone()
+            old_status = row[0] if row else None
+            cursor.execute("""
+                UPDATE Bookings
+                SET Date = ?, StartTime = ?, EndTime = ?, Equipment = ?, Status = ?
+                WHERE BookingID = ?
+            """, (date, start_time, end_time, equipment, status, booking_id))
+            # A decision made here reaches the teacher like one from the approve/deny buttons.
+            notify = status != old_status and status in ('Approved', 'Denied')
+            if notify:
+                notifications.notify_booking_status(conn, booking_id, status)
+            # Admin edits are not refused for equipment; overbooked items are only reported.
+            return notify, sync_booking_equipment(cursor, booking_id, booking.RoomID, date, start_time, end_time,
+                                                  equipment, status)
+
+        try:
+            notified, shortages = run_write(update_booking)
+        except sqlite3.Error as e:
+            flash(f"Database error: {e}", "danger")
+            return redirect(url_for('admin_all_bookings'))
+        if notified:
+            notifications.wake()
         flash("Booking updated successfully.", "success")
+        if shortages:
+            flash(f"Equipment overbooked at this time: {', '.join(shortages)}.", "warning")
         return redirect(url_for('admin_all_bookings'))
 
-    conn.close()
-
-    # Prepare data for template
-    booking_data = {
-        "BookingID": booking[0],
-        "TeacherID": booking[1],
-        "TeacherName": booking[2],
-        "TeacherSubject": booking[3],
-        "RoomID": booking[4],
-        "Date": booking[5],
-        "StartTime": booking[6],
-        "EndTime": booking[7],
-        "Equipment": booking[8],
-        "Status": booking[9]
-    }
-
     # Status options
     status_options = ['Pending', 'Approved', 'Denied']
 
     return render_template(
         'edit_booking.html',
-        booking=booking_data,
+        booking=booking,
         status_options=status_options
     )
 
 @app.route('/delete_booking/<int:booking_id>', methods=['POST'])
 def delete_booking(booking_id):
-    conn = connect_db()
-    cursor = conn.cursor()
+    def delete(conn):
+        # Deletes nothing when the booking does not exist
+        return conn.execute("DELETE FROM Bookings WHERE BookingID = ?", (booking_id,)).rowcount > 0
 
-    # Check if booking exists
-    cursor.execute("SELECT * FROM Bookings WHERE BookingID = ?", (booking_id,))
-    booking = cursor.fetchone()
-    if not booking:
-        conn.close()
+    try:
+        deleted = run_write(delete)
+    except sqlite3.Error as e:
+        flash(f"Database error: {e}", "danger")
+        return redirect(url_for('manage_bookings'))
+    if not deleted:
         flash("Booking not found.", "danger")
         return redirect(url_for('manage_bookings'))
 
-    # Delete the booking
-    cursor.execute("DELETE FROM Bookings WHERE BookingID = ?", (booking_id,))
-    conn.commit()
-    conn.close()
-
     flash(f"Booking #{booking_id} has been deleted.", "success")
     return redirect(url_for('manage_bookings'))
 def allowed_file(filename):
@@ -1031,17 +1181,18 @@ def request_material():
         filename = secure_filename(f"{full_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{letter_file.filename}")
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         letter_file.save(filepath)
+        metrics.UPLOAD_BYTES.inc('letter', amount=os.path.getsize(filepath))
 
         # Save to database
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO MaterialRequests 
-            (FullName, Gender, PhoneNumber, ClassTeacher, MaterialName, BorrowedDate, ReturnedDate, Reason, LetterFile)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (full_name, gender, phone_number, class_teacher, material_name, borrowed_date, returned_date, reason, filename))
-        conn.commit()
-        conn.close()
+        def insert_request(conn):
+            conn.execute("""
+                INSERT INTO MaterialRequests 
+                (FullName, Gender, PhoneNumber, ClassTeacher, MaterialName, BorrowedDate, ReturnedDate, Reason, LetterFile)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (full_name, gender, phone_number, class_teacher, material_name, borrowed_date, returned_date, reason, filename))
+            materials.track_material(conn, material_name)
+
+        run_write(insert_request)
 
         flash("Material request submitted successfully!", "success")
         return redirect(url_for('request_material'))
@@ -1050,8 +1201,7 @@ def request_material():
 
 @app.route('/admin/material_requests')
 def admin_material_requests():
-    conn = connect_db()
-    conn.row_factory = sqlite3.Row  # <-- Make rows dict-like
+    conn = connect_db(material_request_row)  # rows support req.Field and req['Field']
     cursor = conn.cursor()
 
     # Get filters
@@ -1061,30 +1211,28 @@ def admin_material_requests():
     per_page = 10  # Number of requests per page
     offset = (page - 1) * per_page
 
-    # Base query
-    query = "SELECT * FROM MaterialRequests WHERE 1=1"
+    # Optional filters
+    where = ""
     params = []
 
     # Apply search filter
     if search:
-        query += " AND FullName LIKE ?"
+        where += " AND FullName LIKE ?"
         params.append(f"%{search}%")
 
     # Apply status filter
     if status:
-        query += " AND Status = ?"
+        where += " AND Status = ?"
         params.append(status)
 
     # Count total results for pagination
-    total_query = f"SELECT COUNT(*) FROM ({query})"
-    cursor.execute(total_query, params)
+    cursor.execute(MATERIAL_REQUESTS_COUNT_SQL.format(where=where), params)
     total_records = cursor.fetchone()[0]
     total_pages = max(1, (total_records + per_page - 1) // per_page)
 
     # Fetch paginated results ordered by CreatedAt
-    query += " ORDER BY CreatedAt DESC LIMIT ? OFFSET ?"
     params.extend([per_page, offset])
-    cursor.execute(query, params)
+    cursor.execute(MATERIAL_REQUESTS_PAGE_SQL.format(where=where), params)
     requests = cursor.fetchall()  # Each row is now dict-like
 
     conn.close()
@@ -1099,8 +1247,7 @@ def admin_material_requests():
     )
 @app.route('/material_requests')
 def material_requests():
-    conn = connect_db()
-    conn.row_factory = sqlite3.Row  # <-- Make rows dict-like
+    conn = connect_db(material_request_row)  # rows support req.Field and req['Field']
     cursor = conn.cursor()
 
     # Get filters
@@ -1110,30 +1257,28 @@ def material_requests():
     per_page = 10  # Number of requests per page
     offset = (page - 1) * per_page
 
-    # Base query
-    query = "SELECT * FROM MaterialRequests WHERE 1=1"
+    # Optional filters
+    where = ""
     params = []
 
     # Apply search filter
     if search:
-        query += " AND FullName LIKE ?"
+        where += " AND FullName LIKE ?"
         params.append(f"%{search}%")
 
     # Apply status filter
     if status:
-        query += " AND Status = ?"
+        where += " AND Status = ?"
         params.append(status)
 
     # Count total results for pagination
-    total_query = f"SELECT COUNT(*) FROM ({query})"
-    cursor.execute(total_query, params)
+    cursor.execute(MATERIAL_REQUESTS_COUNT_SQL.format(where=where), params)
     total_records = cursor.fetchone()[0]
     total_pages = max(1, (total_records + per_page - 1) // per_page)
 
     # Fetch paginated results ordered by CreatedAt
-    query += " ORDER BY CreatedAt DESC LIMIT ? OFFSET ?"
     params.extend([per_page, offset])
-    cursor.execute(query, params)
+    cursor.execute(MATERIAL_REQUESTS_PAGE_SQL.format(where=where), params)
     requests = cursor.fetchall()  # Each row is now dict-like
 
     conn.close()
@@ -1150,29 +1295,41 @@ def material_requests():
 
 @app.route('/admin/approve_material/<int:request_id>')
 def approve_material(request_id):
-    try:
-        conn = connect_db()
+    def approve(conn):
         cursor = conn.cursor()
 
         # Check if the record exists
         cursor.execute("SELECT * FROM MaterialRequests WHERE RequestID=?", (request_id,))
-        record = cursor.fetchone()
+        if not cursor.fetchone():
+            return False
 
-        if not record:
-            flash("⚠️ Material request not found!", "warning")
-        else:
-            # Update only the Status column since ApprovedDate doesn't exist
-            cursor.execute("""
-                UPDATE MaterialRequests 
-                SET Status = 'Approved'
-                WHERE RequestID = ?
-            """, (request_id,))
-            conn.commit()
+        # Refuse to lend more units than are in stock on any day of the loan
+        shortage = materials.check_loan(cursor, request_id)
+        if shortage:
+            return shortage
+
+        # Update only the Status column since ApprovedDate doesn't exist
+        cursor.execute("""
+            UPDATE MaterialRequests 
+            SET Status = 'Approved'
+            WHERE RequestID = ?
+        """, (request_id,))
+        notifications.notify_material_status(conn, request_id, 'Approved')
+        return True
+
+    try:
+        result = run_write(approve)
+        if result is True:
+            notifications.wake()
             flash(f"✅ Material request #{request_id} approved successfully!", "success")
+        elif result:
+            name, stock, out = result
+            flash(f"⚠️ Cannot approve request #{request_id}: {out} of {stock} {name} already lent "
+                  "on some of these days.", "warning")
+        else:
+            flash("⚠️ Material request not found!", "warning")
     except Exception as e:
         flash(f"❌ Error approving request: {e}", "danger")
-    finally:
-        conn.close()
 
     return redirect(url_for('admin_material_requests'))
 
@@ -1180,32 +1337,55 @@ def approve_material(request_id):
 # ❌ Admin rejects material request
 @app.route('/admin/reject_material/<int:request_id>')
 def reject_material(request_id):
-    try:
-        conn = connect_db()
+    def reject(conn):
         cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM MaterialRequests WHERE RequestID=?", (request_id,))
-        record = cursor.fetchone()
+        if not cursor.fetchone():
+            return False
 
-        if not record:
-            flash("Material request not found!", "warning")
-        else:
-            cursor.execute("""
-                UPDATE MaterialRequests 
-                SET Status='Rejected', RejectedDate=? 
-                WHERE RequestID=?
-            """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), request_id))
-            conn.commit()
+        cursor.execute("""
+            UPDATE MaterialRequests 
+            SET Status='Rejected', RejectedDate=? 
+            WHERE RequestID=?
+        """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), request_id))
+        notifications.notify_material_status(conn, request_id, 'Rejected')
+        return True
+
+    try:
+        if run_write(reject):
+            notifications.wake()
             flash(f"🚫 Material request #{request_id} rejected!", "danger")
+        else:
+            flash("Material request not found!", "warning")
     except Exception as e:
         flash(f"Error rejecting request: {e}", "danger")
-    finally:
-        conn.close()
 
     return redirect(url_for('admin_material_requests'))
+@app.route('/admin/material_stock')
+def material_stock():
+    """Units of each material out and free over ?start=&end= (ISO dates), optionally for one ?material=."""
+    current_user = get_current_user()
+    if not current_user or current_user.Role != 'ICT_Admin':
+        return jsonify({'error': 'ICT Admin privileges required'}), 403
+    start = request.args.get('start') or date.today().isoformat()
+    end = request.args.get('end') or start
+    try:
+        if date.fromisoformat(end) < date.fromisoformat(start):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates with start <= end'}), 400
+
+    stock = materials.stock_over_time(start, end, request.args.get('material'))
+    return jsonify({name: {'stock': units,
+                           'periods': [{'from': first, 'to': last, 'out': out,
+                                        'free': None if units is None else units - out}
+                                       for first, last, out in steps]}
+                    for name, (units, steps) in stock.items()})
+
 @app.route('/admin/export_material_requests')
 def export_material_requests():
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT 
@@ -1244,7 +1424,11 @@ def export_material_requests():
     return response
 if __name__ == '__main__':
     # Initialize the database file if it doesn't exist (assuming db_setup.py is run)
-    if not os.path.exists(DB_FILE):
-        print(f"WARNING: Database file '{DB_FILE}' not found. Please run db_setup.py script first.")
+    db_path = get_db_path()
+    if not is_memory_database(db_path) and not os.path.exists(db_path):
+        print(f"WARNING: Database file '{db_path}' not found. Please run db_setup.py script first.")
 
+    # The development server sets up the schema itself; production runs `flask --app wsgi init` once.
+    create_default_user()
+    sql_trace.set_enabled(True)
     app.run(debug=True)
@@ -0,0 +1,175 @@
+# archive.py
+#
+# Moves finished bookings out of the hot Bookings table into a cold archive database.
+#
+#   python archive.py run [--days 365] [--batch 500]
+#   python archive.py status
+#
+# Bookings dated more than ARCHIVE_RETENTION_DAYS ago are copied into
+# <database>.archive.db (ATTACHed as 'archive') and deleted from the live table in
+# small batches. Each batch is one transaction, so a crash never leaves a booking
+# in both places or in neither. Their per-month counts are added to
+# BookingArchiveStats in the live database, so reports that read the BookingCounts
+# view keep their totals. The deletes are not written to ChangeLog (see
+# ARCHIVING_STATE_KEY in db_setup.py): the bookings still exist, so sync clients
+# keep them.
+#
+# History pages use connect_history(), whose AllBookings view spans both databases.
+
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+from config import get_db_path, is_memory_database
+from db_setup import ARCHIVING_STATE_KEY, connect_db
+
+# --- CONFIGURATION ---
+
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("SMART_CLASSROOM_ARCHIVE_DAYS", 365))
+
+# Rows moved per transaction, and pause between transactions so writers get the lock.
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_SLEEP_SECONDS = 0.01
+
+BOOKING_COLUMNS = "BookingID, TeacherID, RoomID, Date, StartTime, EndTime, Equipment, Status"
+
+def archive_path(db_path=None):
+    """The archive lives next to the live database: smart_classroom.db -> smart_classroom.archive.db"""
+    base, ext = os.path.splitext(db_path or get_db_path())
+    return f"{base}.archive{ext or '.db'}"
+
+# --- ATTACH ---
+
+def attach_archive(conn, create=False):
+    """
+    ATTACHes the archive database as 'archive' and defines the temporary AllBookings view.
+    Returns True when the archive is attached; without one, AllBookings covers the live table only.
+    """
+    db_path = get_db_path()
+    path = archive_path(db_path)
+    attached = not is_memory_database(db_path) and (create or os.path.exists(path))
+    if attached:
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS archive.Bookings (
+                BookingID INTEGER PRIMARY KEY,
+                TeacherID INTEGER NOT NULL,
+                RoomID INTEGER NOT NULL,
+                Date TEXT NOT NULL,
+                StartTime TEXT NOT NULL,
+                EndTime TEXT NOT NULL,
+                Equipment TEXT,
+                Status TEXT,
+                ArchivedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_teacher_date ON Bookings (TeacherID, Date)")
+        conn.execute(f"""
+            CREATE TEMP VIEW IF NOT EXISTS AllBookings AS
+                SELECT {BOOKING_COLUMNS}, 0 AS Archived FROM main.Bookings
+                UNION ALL
+                SELECT {BOOKING_COLUMNS}, 1 AS Archived FROM archive.Bookings
+        """)
+    else:
+        conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS AllBookings AS SELECT {BOOKING_COLUMNS}, 0 AS Archived FROM main.Bookings")
+    return attached
+
+def connect_history():
+    """Returns a live connection on which AllBookings spans the hot and archived bookings."""
+    conn = connect_db()
+    attach_archive(conn)
+    return conn
+
+# --- ARCHIVAL ---
+
+def _archive_batch(conn, cutoff, batch_size):
+    """Moves up to batch_size bookings dated before cutoff. Returns the number moved."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # The batch is the first batch_size qualifying IDs, so "Date < cutoff AND BookingID <= last_id"
+        # selects exactly those rows in the three statements below.
+        row = conn.execute("""
+            SELECT MAX(BookingID), COUNT(*) FROM (
+                SELECT BookingID FROM main.Bookings WHERE Date < ? ORDER BY BookingID LIMIT ?
+            )
+        """, (cutoff, batch_size)).fetchone()
+        last_id, count = row
+        if not count:
+            conn.execute("COMMIT")
+            return 0
+
+        conn.execute(f"""
+            INSERT OR REPLACE INTO archive.Bookings ({BOOKING_COLUMNS})
+            SELECT {BOOKING_COLUMNS} FROM main.Bookings WHERE Date < ? AND BookingID <= ?
+        """, (cutoff, last_id))
+        conn.execute("""
+            INSERT INTO main.BookingArchiveStats (Month, TeacherID, RoomID, Status, Bookings)
+            SELECT substr(Date, 1, 7), TeacherID, RoomID, COALESCE(Status, 'Pending'), COUNT(*)
+            FROM main.Bookings WHERE Date < ? AND BookingID <= ?
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (Month, TeacherID, RoomID, Status) DO UPDATE SET Bookings = Bookings + excluded.Bookings
+        """, (cutoff, last_id))
+        conn.execute("INSERT OR REPLACE INTO main.InternalState (Key, Value) VALUES (?, '1')",
+                     (ARCHIVING_STATE_KEY,))
+        conn.execute("DELETE FROM main.Bookings WHERE Date < ? AND BookingID <= ?", (cutoff, last_id))
+        conn.execute("DELETE FROM main.InternalState WHERE Key = ?", (ARCHIVING_STATE_KEY,))
+        conn.execute("COMMIT")
+        return count
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def archive_bookings(retention_days=ARCHIVE_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE,
+                     sleep=ARCHIVE_BATCH_SLEEP_SECONDS, verbose=False):
+    """Archives bookings older than retention_days. Returns the number of bookings moved."""
+    if is_memory_database():
+        print("In-memory databases are not archived.")
+        return 0
+
+    cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+    conn = connect_db()
+    conn.isolation_level = None  # one explicit transaction per batch
+    moved = 0
+    started = time.perf_counter()
+    try:
+        attach_archive(conn, create=True)
+        while True:
+            count = _archive_batch(conn, cutoff, batch_size)
+            if not count:
+                break
+            moved += count
+            if verbose:
+                print(f"  archived {moved} bookings dated before {cutoff}")
+            time.sleep(sleep)
+    finally:
+        conn.close()
+
+    if verbose:
+        print(f"Moved {moved} bookings to {archive_path()} in {time.perf_counter() - started:.2f}s")
+    return moved
+
+def archive_status():
+    """Returns row counts and date ranges of the hot and archived bookings."""
+    conn = connect_history()
+    try:
+        return conn.execute("""
+            SELECT Archived, COUNT(*), MIN(Date), MAX(Date) FROM AllBookings GROUP BY Archived
+        """).fetchall()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Archive old bookings into the cold archive database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="move bookings older than the retention horizon")
+    run.add_argument("--days", type=int, default=ARCHIVE_RETENTION_DAYS)
+    run.add_argument("--batch", type=int, default=ARCHIVE_BATCH_SIZE)
+    sub.add_parser("status", help="show hot and archived booking counts")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        archive_bookings(args.days, args.batch, verbose=True)
+    else:
+        for archived, count, first, last in archive_status():
+            print(f"{'archive' if archived else 'hot':<8} {count:>8} bookings  {first} .. {last}")
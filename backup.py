@@ -0,0 +1,320 @@
+# backup.py
+#
+# Online backups of the live database.
+#
+#   python backup.py create [--label nightly] [--keep 14]
+#   python backup.py list
+#   python backup.py verify backups/smart_classroom_20261019_120000_manual.db.gz
+#   python backup.py restore backups/smart_classroom_20261019_120000_manual.db.gz --yes
+#
+# Backups use the SQLite backup API in small page steps with a pause between
+# steps, so the database is never held for long and writers keep working while
+# a backup runs. Every artifact is checked with PRAGMA integrity_check before it
+# is gzip-compressed, and old artifacts are rotated per label.
+#
+# The archive database (see archive.py) is backed up alongside, as
+# smart_classroom_<timestamp>_<label>.archive.db.gz, and restored, verified and
+# rotated together with its backup. After a restore the ChangeLog sequence,
+# CacheVersions and FeedVersions are moved past their pre-restore values, so sync
+# clients resync and no cache or feed ETag matches data from before the restore.
+
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from archive import archive_path, attach_archive
+from change_log import FLOOR_STATE_KEY
+from config import PROJECT_DIR, get_db_path, is_memory_database
+from db_setup import connect_db
+from snapshots import snapshot_path
+from write_queue import run_write
+
+# --- CONFIGURATION ---
+
+BACKUP_DIR = os.environ.get("SMART_CLASSROOM_BACKUP_DIR", os.path.join(PROJECT_DIR, "backups"))
+
+# Pages copied per step and pause between steps (see sqlite3.Connection.backup).
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP_SECONDS = 0.005
+
+# Number of artifacts kept per label.
+DEFAULT_KEEP = 10
+
+BACKUP_PREFIX = "smart_classroom_"
+
+# --- HELPERS ---
+
+def _integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+def _decompress_to_temp(path):
+    """Returns a temporary uncompressed copy of a backup artifact (caller removes it)."""
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", prefix="smart_classroom_restore_")
+    with os.fdopen(fd, "wb") as out:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as src:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+    return tmp_path
+
+def _archive_artifact(path):
+    """The archive database's artifact of a backup: ..._manual.db.gz -> ..._manual.archive.db.gz"""
+    head, _sep, tail = path.rpartition(".db")
+    return f"{head}.archive.db{tail}"
+
+def _parse_label(filename):
+    # smart_classroom_<YYYYmmdd>_<HHMMSS>_<label>.db[.gz]
+    stem = filename[len(BACKUP_PREFIX):].split(".db")[0]
+    parts = stem.split("_", 2)
+    return parts[2] if len(parts) == 3 else ""
+
+# --- BACKUP ---
+
+def _write_artifact(source, path, compress, pages, sleep, progress):
+    """Copies an open database into a verified artifact at path (.gz added when compressed). Returns its path."""
+    partial = path + ".partial"
+    target = sqlite3.connect(partial)
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    finally:
+        target.close()
+
+    problems = _integrity_check(partial)
+    if problems != ["ok"]:
+        os.remove(partial)
+        raise RuntimeError(f"Backup failed integrity check: {problems[:5]}")
+
+    if compress:
+        with open(partial, "rb") as src, gzip.open(path + ".gz", "wb", compresslevel=6) as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        os.remove(partial)
+        return path + ".gz"
+    os.replace(partial, path)
+    return path
+
+def create_backup(label="manual", backup_dir=None, keep=DEFAULT_KEEP, compress=True,
+                  pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP_SECONDS, verbose=False):
+    """
+    Takes an online, page-stepped backup, verifies it and rotates old ones.
+    Returns the path of the new artifact. Raises RuntimeError if verification fails.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}_{label}.db"
+    path = os.path.join(backup_dir, name)
+
+    def progress(_status, remaining, total):
+        if verbose:
+            print(f"  copied {total - remaining}/{total} pages")
+        # sqlite3 only sleeps by itself when the source is busy; pausing here between
+        # steps also gives waiting writers a window on every step.
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    started = time.perf_counter()
+    source = connect_db()
+    try:
+        artifact = _write_artifact(source, path, compress, pages, sleep, progress)
+    finally:
+        source.close()
+    copy_seconds = time.perf_counter() - started
+
+    # The archive is copied after the live database: a booking archived in between is
+    # then in both copies (restore_backup() drops the duplicate) rather than in neither.
+    archived = archive_path()
+    if not is_memory_database() and os.path.exists(archived):
+        source = sqlite3.connect(archived)
+        try:
+            _write_artifact(source, _archive_artifact(path), compress, pages, sleep, progress)
+        finally:
+            source.close()
+
+    if verbose:
+        print(f"Backup of {get_db_path()} written to {artifact} "
+              f"(copy {copy_seconds:.2f}s, total {time.perf_counter() - started:.2f}s, "
+              f"{os.path.getsize(artifact) / 1024:.0f} KiB)")
+    rotate_backups(label, keep, backup_dir)
+    return artifact
+
+def list_backups(backup_dir=None):
+    """Returns backup artifacts, newest first (archive artifacts go with their backup and are not listed)."""
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [name for name in os.listdir(backup_dir)
+             if name.startswith(BACKUP_PREFIX) and (name.endswith(".db") or name.endswith(".db.gz"))
+             and ".archive.db" not in name]
+    return [os.path.join(backup_dir, name) for name in sorted(names, reverse=True)]
+
+def rotate_backups(label, keep=DEFAULT_KEEP, backup_dir=None):
+    """Deletes all but the newest `keep` artifacts with the given label, with their archive artifacts."""
+    same_label = [path for path in list_backups(backup_dir) if _parse_label(os.path.basename(path)) == label]
+    for path in same_label[keep:]:
+        os.remove(path)
+        if os.path.exists(_archive_artifact(path)):
+            os.remove(_archive_artifact(path))
+
+def _verify_artifact(path):
+    tmp_path = _decompress_to_temp(path)
+    try:
+        return _integrity_check(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+def verify_backup(path):
+    """
+    Runs PRAGMA integrity_check on an artifact and its archive artifact, if any.
+    Returns the list of messages (['ok'] when healthy).
+    """
+    problems = _verify_artifact(path)
+    if problems == ["ok"] and os.path.exists(_archive_artifact(path)):
+        problems = _verify_artifact(_archive_artifact(path))
+    return problems
+
+# --- RESTORE ---
+
+def _counters():
+    """The live ChangeLog sequence, CacheVersions and FeedVersions (empty on a new database)."""
+    conn = connect_db()
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+        return (row[0] if row else 0,
+                conn.execute("SELECT Domain, Version FROM CacheVersions").fetchall(),
+                conn.execute("SELECT Kind, EntityID, Version FROM FeedVersions").fetchall())
+    except sqlite3.OperationalError:
+        return 0, [], []
+    finally:
+        conn.close()
+
+def _move_counters_past(counters):
+    """
+    Moves every counter past both its pre-restore and its restored value, and empties
+    ChangeLog below a new floor, so every sync client is told to reload.
+    Returns the new ChangeLog floor.
+    """
+    seq, cache_versions, feed_versions = counters
+
+    def bump(conn):
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+        floor = max(seq, row[0] if row else 0) + 1
+        conn.execute("DELETE FROM ChangeLog WHERE Seq <= ?", (floor,))
+        if row:
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'ChangeLog'", (floor,))
+        else:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('ChangeLog', ?)", (floor,))
+        conn.execute("INSERT OR REPLACE INTO InternalState (Key, Value) VALUES (?, ?)",
+                     (FLOOR_STATE_KEY, str(floor)))
+
+        conn.executemany("""
+            INSERT INTO CacheVersions (Domain, Version) VALUES (?, ?)
+            ON CONFLICT (Domain) DO UPDATE SET Version = MAX(Version, excluded.Version)
+        """, cache_versions)
+        conn.execute("UPDATE CacheVersions SET Version = Version + 1")
+        conn.executemany("""
+            INSERT INTO FeedVersions (Kind, EntityID, Version) VALUES (?, ?, ?)
+            ON CONFLICT (Kind, EntityID) DO UPDATE SET Version = MAX(Version, excluded.Version)
+        """, feed_versions)
+        conn.execute("UPDATE FeedVersions SET Version = Version + 1, ModifiedAt = CURRENT_TIMESTAMP")
+        return floor
+
+    return run_write(bump)
+
+def _drop_archived_duplicates():
+    """Removes archived copies of bookings that the restored live table holds again."""
+    conn = connect_db()
+    try:
+        if attach_archive(conn):
+            conn.execute("DELETE FROM archive.Bookings WHERE BookingID IN (SELECT BookingID FROM main.Bookings)")
+            conn.commit()
+    finally:
+        conn.close()
+
+def restore_backup(path, pages=BACKUP_PAGES_PER_STEP, verbose=True):
+    """
+    Replaces the contents of the live database (and the archive, when the backup has one)
+    with a verified backup artifact. The copy goes through the backup API, so other
+    connections see a consistent switch. Returns the elapsed seconds.
+    """
+    started = time.perf_counter()
+    artifacts = [(path, None)]
+    if os.path.exists(_archive_artifact(path)):
+        artifacts.append((_archive_artifact(path), archive_path()))
+    tmp_paths = []
+    try:
+        for artifact, _target in artifacts:
+            tmp_paths.append(_decompress_to_temp(artifact))
+        decompress_seconds = time.perf_counter() - started
+        for (artifact, _target), tmp_path in zip(artifacts, tmp_paths):
+            problems = _integrity_check(tmp_path)
+            if problems != ["ok"]:
+                raise RuntimeError(f"Refusing to restore, {artifact} failed integrity check: {problems[:5]}")
+        check_seconds = time.perf_counter() - started - decompress_seconds
+
+        counters = _counters()
+        for (_artifact, target_path), tmp_path in zip(artifacts, tmp_paths):
+            source = sqlite3.connect(tmp_path)
+            target = sqlite3.connect(target_path) if target_path else connect_db()
+            try:
+                source.backup(target, pages=pages)
+            finally:
+                target.close()
+                source.close()
+    finally:
+        for tmp_path in tmp_paths:
+            os.remove(tmp_path)
+
+    _drop_archived_duplicates()
+    _move_counters_past(counters)
+    # The report snapshot still shows the data from before; reports read live until it is retaken.
+    if os.path.exists(snapshot_path()):
+        os.remove(snapshot_path())
+
+    elapsed = time.perf_counter() - started
+    if verbose:
+        print(f"Restored {path} into {get_db_path()} in {elapsed:.2f}s "
+              f"(decompress {decompress_seconds:.2f}s, integrity check {check_seconds:.2f}s, "
+              f"copy {elapsed - decompress_seconds - check_seconds:.2f}s)")
+    return elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Online backup and restore for the classroom database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="take a verified, compressed online backup")
+    create.add_argument("--label", default="manual")
+    create.add_argument("--keep", type=int, default=DEFAULT_KEEP)
+    create.add_argument("--no-compress", action="store_true")
+    create.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP)
+    create.add_argument("--sleep", type=float, default=BACKUP_STEP_SLEEP_SECONDS)
+    sub.add_parser("list", help="list backup artifacts")
+    verify = sub.add_parser("verify", help="run PRAGMA integrity_check on an artifact")
+    verify.add_argument("path")
+    restore = sub.add_parser("restore", help="restore an artifact into the live database")
+    restore.add_argument("path")
+    restore.add_argument("--yes", action="store_true", help="do not ask for confirmation")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        create_backup(args.label, keep=args.keep, compress=not args.no_compress,
+                      pages=args.pages, sleep=args.sleep, verbose=True)
+    elif args.command == "list":
+        for path in list_backups():
+            archived = " (+ archive)" if os.path.exists(_archive_artifact(path)) else ""
+            print(f"{os.path.getsize(path) / 1024:10.0f} KiB  {path}{archived}")
+    elif args.command == "verify":
+        result = verify_backup(args.path)
+        print("\n".join(result))
+        sys.exit(0 if result == ["ok"] else 1)
+    elif args.command == "restore":
+        if not args.yes and input(f"Overwrite {get_db_path()} with {args.path}? [y/N] ").lower() != "y":
+            sys.exit("Restore cancelled.")
+        restore_backup(args.path)
@@ -0,0 +1,198 @@
+# benchmark.py
+#
+# End-to-end benchmarks for the hot paths, run in-process against a seeded database.
+#
+#   python benchmark.py                               # seed a temporary DB, run, save JSON
+#   python benchmark.py --db /tmp/bench.db --iterations 50
+#   python benchmark.py --compare bench_results/old.json bench_results/new.json
+#
+# Results are written to bench_results/<timestamp>_<commit>.json so runs from
+# different commits can be compared; --compare exits with status 1 when any
+# benchmark got slower than the allowed threshold.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from config import PROJECT_DIR, get_db_path, set_db_path
+import seed_data
+
+RESULTS_DIR = os.path.join(PROJECT_DIR, "bench_results")
+
+# A benchmark counts as a regression when its median grows by more than this fraction.
+DEFAULT_THRESHOLD = 0.20
+
+# --- MEASUREMENT ---
+
+def _summarize(samples_s):
+    ordered = sorted(samples_s)
+    ms = [s * 1000 for s in ordered]
+    return {
+        'n': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 4),
+        'p50_ms': round(ms[len(ms) // 2], 4),
+        'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        'min_ms': round(ms[0], 4),
+        'max_ms': round(ms[-1], 4),
+    }
+
+def _time_calls(func, iterations):
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# --- BENCHMARKS ---
+
+def run_benchmarks(iterations=30, seed=7):
+    """Runs every benchmark against the configured database. Returns {name: summary}."""
+    # Imported here so that the database path is configured before the app loads.
+    from app import configure_app, create_default_user
+    from db_setup import connect_db
+    import smart_scheduler
+
+    create_default_user()
+    app = configure_app({'TESTING': False})
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    conn = connect_db()
+    room_ids = [row[0] for row in conn.execute("SELECT RoomID FROM Classrooms")]
+    teacher_ids = [row[0] for row in conn.execute("SELECT TeacherID FROM Teachers WHERE Role = 'Teacher'")]
+    dates = [row[0] for row in conn.execute("SELECT DISTINCT Date FROM Bookings ORDER BY Date")] or ['2030-01-07']
+    booking_total = conn.execute("SELECT COUNT(*) FROM Bookings").fetchone()[0]
+    material_total = conn.execute("SELECT COUNT(*) FROM MaterialRequests").fetchone()[0]
+    conn.close()
+
+    rng = random.Random(seed)
+    slots = [slot for slot, _label in smart_scheduler.get_available_hours()]
+    results = {}
+
+    def bench(name, func, n=iterations):
+        results[name] = _summarize(_time_calls(func, n))
+        print(f"  {name:<45} p50 {results[name]['p50_ms']:>9.3f} ms   p95 {results[name]['p95_ms']:>9.3f} ms")
+
+    def route(path):
+        def call(_i):
+            response = client.get(path)
+            if response.status_code >= 400:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+        return call
+
+    # Scheduler functions
+    bench('check_availability', lambda i: smart_scheduler.check_availability(
+        rng.choice(room_ids), rng.choice(dates), rng.choice(slots)), n=iterations * 10)
+    future_day = f"{datetime.now().year + 50}-01-"
+    bench('submit_booking_request', lambda i: smart_scheduler.submit_booking_request(
+        rng.choice(teacher_ids) if teacher_ids else 1, room_ids[i % len(room_ids)],
+        f"{future_day}{1 + (i // len(room_ids)) % 28:02d}", slots[(i // (len(room_ids) * 28)) % len(slots)], ''))
+    bench('get_pending_requests', lambda i: smart_scheduler.get_pending_requests())
+    bench('get_all_bookings', lambda i: smart_scheduler.get_all_bookings(), n=max(3, iterations // 5))
+
+    # Report routes
+    for path in ('/admin/reports', '/booking_reports', '/admin/export_material_requests', '/ict_admin/dashboard'):
+        try:
+            bench(f"GET {path}", route(path), n=max(3, iterations // 3))
+        except RuntimeError as e:
+            print(f"  SKIPPED {path}: {e}")
+
+    # Paginated list pages: first page and the deepest page
+    for path, per_page, total in (('/manage_bookings', 5, booking_total),
+                                  ('/manage_teacherbook', 5, booking_total),
+                                  ('/admin/all_bookings', 10, booking_total),
+                                  ('/admin/material_requests', 10, material_total)):
+        last_page = max(1, (total + per_page - 1) // per_page)
+        bench(f"GET {path}?page=1", route(f"{path}?page=1"))
+        bench(f"GET {path}?page={last_page} (deep)", route(f"{path}?page={last_page}"))
+
+    # Material search
+    bench('GET /admin/material_requests?search=', route('/admin/material_requests?search=Uwi'))
+    bench('GET /material_requests?status=Pending', route('/material_requests?search=Jean&status=Pending'))
+
+    return results
+
+# --- RESULTS ---
+
+def save_results(results, dataset, output=None):
+    commit = _git_commit()
+    document = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'dataset': dataset,
+        'results': results,
+    }
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    return output
+
+def compare(old_path, new_path, threshold=DEFAULT_THRESHOLD):
+    """Prints p50 deltas between two result files. Returns True when nothing regressed."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{'benchmark':<50} {old['commit']:>10} {new['commit']:>10}   change")
+    ok = True
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if not before:
+            print(f"{name:<50} {'-':>10} {result['p50_ms']:>10.3f}   (new)")
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<50} {before['p50_ms']:>10.3f} {result['p50_ms']:>10.3f}   {change:+.1%}{flag}")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the booking, report and list hot paths.")
+    parser.add_argument('--db', help="existing seeded database to use (default: seed a temporary one)")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier for the default seed sizes")
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--output', help="result file (default: bench_results/<timestamp>_<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(0 if compare(*args.compare, threshold=args.threshold) else 1)
+
+    if args.db:
+        set_db_path(args.db)
+        dataset = {'db': args.db}
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="smart_classroom_bench_")
+        set_db_path(os.path.join(tmp_dir, "bench.db"))
+        counts = {name: max(1, int(n * args.scale)) for name, n in seed_data.DEFAULT_COUNTS.items()}
+        print(f"Seeding {get_db_path()} ...")
+        dataset = seed_data.seed_database(counts)
+
+    print("Running benchmarks:")
+    results = run_benchmarks(args.iterations)
+    print(f"Results written to {save_results(results, dataset, args.output)}")
@@ -0,0 +1,90 @@
+# boot_check.py
+#
+# Import-time budget check for the production entry point.
+#
+#   python boot_check.py                  # checks `import wsgi` against the default budget
+#   python boot_check.py --budget-ms 30
+#
+# Runs `python -X importtime -c "import wsgi"` in a fresh interpreter, sums the
+# self time of this project's own modules (third-party imports such as Flask
+# are reported but not counted against the budget), and verifies that the
+# import did not create or modify the database file. Exits with status 1 on failure.
+
+import argparse
+import os
+import subprocess
+import sys
+
+from config import get_db_path, is_memory_database
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Self time allowed for the project's own modules, in milliseconds.
+DEFAULT_BUDGET_MS = 50
+
+def _project_modules():
+    """Names of the top-level modules that live in this repository."""
+    return {name[:-3] for name in os.listdir(PROJECT_DIR) if name.endswith('.py')}
+
+def _db_fingerprint(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+def measure_import(module='wsgi'):
+    """Returns (total_us, {module: self_us}) for importing `module` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    self_times = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        self_times[name] = int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us, self_times
+
+def check_boot(module='wsgi', budget_ms=DEFAULT_BUDGET_MS):
+    """Runs the check and prints a report. Returns True when within budget."""
+    db_path = get_db_path()
+    before = None if is_memory_database(db_path) else _db_fingerprint(db_path)
+    total_us, self_times = measure_import(module)
+    after = None if is_memory_database(db_path) else _db_fingerprint(db_path)
+
+    project = _project_modules()
+    own = {name: us for name, us in self_times.items() if name.split('.')[0] in project}
+    own_ms = sum(own.values()) / 1000
+
+    print(f"Importing '{module}': {total_us / 1000:.1f} ms total, {own_ms:.1f} ms in project modules "
+          f"(budget {budget_ms} ms)")
+    for name, us in sorted(own.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {us / 1000:8.2f} ms  {name}")
+
+    ok = True
+    if own_ms > budget_ms:
+        print(f"FAIL: project modules took {own_ms:.1f} ms, over the {budget_ms} ms budget.")
+        ok = False
+    if before != after:
+        print(f"FAIL: importing '{module}' created or modified {db_path}.")
+        ok = False
+    if ok:
+        print("OK")
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the import-time cost of the app entry point.")
+    parser.add_argument('--module', default='wsgi')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+    sys.exit(0 if check_boot(args.module, args.budget_ms) else 1)
@@ -0,0 +1,161 @@
+# cache_bus.py
+#
+# Cross-worker invalidation for in-process caches.
+#
+# Every gunicorn worker keeps its own caches, so a write handled by one worker
+# must reach the others. Triggers created in db_setup.py bump a counter in
+# CacheVersions for each cache domain (settings, rooms, teachers, bookings,
+# materials) in the same transaction as the write. A cached value remembers the
+# versions of the domains it was built from and is reused only while they are
+# unchanged:
+#
+#   @cached('rooms', 'settings')
+#   def get_room_catalog(): ...
+#
+# The versions are read with one small query at most once per request (kept on
+# flask.g), or at most every VERSION_CHECK_SECONDS outside a request, so caches
+# stay correct across processes without short TTLs. Flask is only looked up when
+# the process has already loaded it, so CLI tools using this module never import it.
+#
+#   python cache_bus.py versions
+#   python cache_bus.py bump rooms
+
+import argparse
+import functools
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+from config import get_db_path
+from db_setup import connect_db, CACHE_DOMAINS
+
+# --- CONFIGURATION ---
+
+# Outside a request (background threads, CLI) the versions are re-read at most this often.
+VERSION_CHECK_SECONDS = 1.0
+
+# Entries kept per cached function; the oldest entry is dropped first.
+DEFAULT_MAX_ENTRIES = 256
+
+_MISSING = object()
+_lock = threading.Lock()
+_background = {}  # db path -> (read_at, versions), for callers outside a request
+
+# --- VERSIONS ---
+
+def _request_g():
+    """flask.g while handling a request, else None (without importing Flask into CLI tools)."""
+    flask = sys.modules.get('flask')
+    if flask is None or not flask.has_app_context():
+        return None
+    return flask.g
+
+def _read_versions():
+    conn = connect_db()
+    try:
+        return dict(conn.execute("SELECT Domain, Version FROM CacheVersions").fetchall())
+    except sqlite3.OperationalError:
+        # Table not created yet: report no versions, so nothing is cached.
+        return None
+    finally:
+        conn.close()
+
+def current_versions():
+    """Returns {domain: version}, read at most once per request. None if the table is missing."""
+    db_path = get_db_path()
+    g = _request_g()
+    if g is not None:
+        versions = g.get('_cache_versions')
+        if versions is None or versions[0] != db_path:
+            versions = g._cache_versions = (db_path, _read_versions())
+        return versions[1]
+
+    read_at, versions = _background.get(db_path, (0.0, None))
+    if time.monotonic() - read_at >= VERSION_CHECK_SECONDS:
+        versions = _read_versions()
+        _background[db_path] = (time.monotonic(), versions)
+    return versions
+
+def versions_of(domains):
+    """
+    The version tuple of the given domains, or None when it cannot be read. A domain
+    without a CacheVersions row is never bumped by its triggers, so it is not cacheable.
+    """
+    versions = current_versions()
+    if versions is None or any(domain not in versions for domain in domains):
+        return None
+    return (get_db_path(),) + tuple(versions[domain] for domain in domains)
+
+def forget_versions():
+    """Makes the next lookup in this request/thread re-read the versions (after a local write)."""
+    g = _request_g()
+    if g is not None:
+        g.pop('_cache_versions', None)
+    _background.pop(get_db_path(), None)
+
+def bump(*domains):
+    """Invalidates caches of domains whose data changed outside the triggered tables."""
+    conn = connect_db()
+    try:
+        # Upsert: also brings back a row that was deleted, so the domain is cached again.
+        conn.executemany("""
+            INSERT INTO CacheVersions (Domain, Version) VALUES (?, 1)
+            ON CONFLICT (Domain) DO UPDATE SET Version = Version + 1
+        """, [(domain,) for domain in domains])
+        conn.commit()
+    finally:
+        conn.close()
+    forget_versions()
+
+# --- CACHE DECORATOR ---
+
+def cached(*domains, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Caches a function's results per positional/keyword arguments until one of
+    `domains` changes in any worker. The wrapped function gets cache_clear().
+    """
+    unknown = set(domains) - set(CACHE_DOMAINS)
+    if unknown:
+        raise ValueError(f"Unknown cache domains: {', '.join(sorted(unknown))}")
+
+    def decorator(func):
+        entries = {}  # args key -> (versions, value)
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            versions = versions_of(domains)
+            entry = entries.get(key)
+            hit = versions is not None and entry is not None and entry[0] == versions
+            metrics.record_cache(name, hit)
+            if hit:
+                return entry[1]
+
+            value = func(*args, **kwargs)
+            if versions is not None:
+                with _lock:
+                    if key not in entries and len(entries) >= max_entries:
+                        entries.pop(next(iter(entries)), None)
+                    entries[key] = (versions, value)
+            return value
+
+        wrapper.cache_clear = entries.clear
+        wrapper.cache_domains = domains
+        return wrapper
+    return decorator
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or bump the cache domain versions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("versions", help="show the current version of every cache domain")
+    bump_cmd = sub.add_parser("bump", help="invalidate the caches of the given domains in every worker")
+    bump_cmd.add_argument("domains", nargs="+", choices=sorted(CACHE_DOMAINS))
+    args = parser.parse_args()
+
+    if args.command == "bump":
+        bump(*args.domains)
+    for domain, version in sorted((_read_versions() or {}).items()):
+        print(f"{domain:<10} {version}")
@@ -0,0 +1,189 @@
+# calendar_feeds.py
+#
+# iCalendar (.ics) feeds of approved bookings, per teacher and per room:
+#
+#   /calendar/teacher/<TeacherID>.ics
+#   /calendar/room/<RoomID>.ics
+#
+# Calendar clients poll these every few minutes. Each feed has a version in
+# FeedVersions, bumped by triggers (db_setup.py) whenever one of its approved
+# bookings, or a teacher/room name shown in it, changes. The version gives the
+# ETag and its timestamp the Last-Modified header, so an unchanged feed is
+# answered with 304 after a single primary-key lookup, without reading bookings.
+#
+# A changed feed is rebuilt incrementally: each worker keeps the rendered VEVENTs
+# of the feeds it served with the ChangeLog sequence they were read at, and on
+# the next version re-reads only the bookings that appear in ChangeLog since.
+# Renames, large gaps and compacted logs fall back to a full rebuild.
+
+import threading
+from datetime import datetime, timezone
+
+from db_setup import connect_db
+
+# --- CONFIGURATION ---
+
+FEED_KINDS = ('teacher', 'room')
+
+# Feeds kept rendered per worker; the oldest is dropped first.
+FEED_CACHE_MAX_ENTRIES = 512
+
+# More changed bookings than this since the cached copy: rebuild the feed in full instead.
+INCREMENTAL_MAX_CHANGES = 500
+
+PRODID = "-//Smart Classroom//Booking Feed//EN"
+
+_FEED_COLUMNS = "BookingID, TeacherID, RoomID, Date, StartTime, EndTime, Equipment, TeacherName, Subject, RoomName"
+
+_lock = threading.Lock()
+_feeds = {}  # (kind, entity id) -> _Feed
+
+class _Feed:
+    """A rendered feed: its version, the ChangeLog seq it was read at and its events by BookingID."""
+    __slots__ = ('version', 'seq', 'title', 'events', 'body')
+
+    def __init__(self, version, seq, title, events):
+        self.version = version
+        self.seq = seq
+        self.title = title
+        self.events = events
+        self.body = _render_calendar(title, events)
+
+# --- VERSIONS ---
+
+def feed_version(kind, entity_id):
+    """Returns (version, last modified as an aware datetime or None) of a feed. Version 0: never had events."""
+    conn = connect_db()
+    try:
+        row = conn.execute("SELECT Version, ModifiedAt FROM FeedVersions WHERE Kind = ? AND EntityID = ?",
+                           (kind, entity_id)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return 0, None
+    return row[0], datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+def feed_etag(kind, entity_id, version):
+    return f"{kind}-{entity_id}-v{version}"
+
+# --- ICALENDAR TEXT ---
+
+def _escape(text):
+    return (str(text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def _fold(line):
+    """Folds a content line at 75 octets, as RFC 5545 requires."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1  # never split a UTF-8 character
+        parts.append(encoded[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts)
+
+def _local_time(day, hhmm):
+    return f"{day.replace('-', '')}T{hhmm.replace(':', '')}00"
+
+def _render_event(kind, booking, stamp):
+    booking_id, teacher_id, room_id, day, start, end, equipment, teacher, subject, room = booking
+    summary = f"{room} booking" if kind == 'teacher' else f"{teacher} ({subject})" if subject else teacher
+    description = f"Teacher: {teacher}\nRoom: {room}" + (f"\nEquipment: {equipment}" if equipment else "")
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:booking-{booking_id}@smart-classroom",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_local_time(day, start)}",
+        f"DTEND:{_local_time(day, end)}",
+        f"SUMMARY:{_escape(summary)}",
+        f"LOCATION:{_escape(room)}",
+        f"DESCRIPTION:{_escape(description)}",
+        "END:VEVENT",
+    ]
+    return "\r\n".join(_fold(line) for line in lines)
+
+def _render_calendar(title, events):
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+              "METHOD:PUBLISH", _fold(f"X-WR-CALNAME:{_escape(title)}")]
+    # Events are kept in BookingID order, which is also the order they were booked in.
+    body = header + [events[booking_id] for booking_id in sorted(events)] + ["END:VCALENDAR"]
+    return "\r\n".join(body) + "\r\n"
+
+# --- BUILD ---
+
+def _changelog_seq(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+    return row[0] if row else 0
+
+def _title(conn, kind, entity_id):
+    if kind == 'teacher':
+        row = conn.execute("SELECT Name FROM Teachers WHERE TeacherID = ?", (entity_id,)).fetchone()
+        return f"{row[0]} - classroom bookings" if row else None
+    row = conn.execute("SELECT Name FROM Classrooms WHERE RoomID = ?", (entity_id,)).fetchone()
+    return f"{row[0]} - bookings" if row else None
+
+def _changed_booking_ids(conn, since_seq):
+    """Booking IDs written after since_seq, or None when only a full rebuild is safe."""
+    first = conn.execute("SELECT MIN(Seq) FROM ChangeLog").fetchone()[0]
+    if first is not None and first > since_seq + 1:
+        return None  # compaction removed changes we have not seen
+    rows = conn.execute("""
+        SELECT TableName, RowID FROM ChangeLog WHERE Seq > ? LIMIT ?
+    """, (since_seq, INCREMENTAL_MAX_CHANGES + 1)).fetchall()
+    if len(rows) > INCREMENTAL_MAX_CHANGES or any(table in ('Teachers', 'Classrooms') for table, _ in rows):
+        return None
+    return {row_id for table, row_id in rows if table == 'Bookings'}
+
+def _build(kind, entity_id, version, cached):
+    column = 'TeacherID' if kind == 'teacher' else 'RoomID'
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    conn = connect_db()
+    try:
+        # The seq is read before the bookings, so later writes are picked up next time.
+        seq = _changelog_seq(conn)
+        title = _title(conn, kind, entity_id)
+        if title is None:
+            return None
+        changed = _changed_booking_ids(conn, cached.seq) if cached else None
+        if changed is None:
+            rows = conn.execute(f"SELECT {_FEED_COLUMNS} FROM BookingView WHERE {column} = ? AND Status = 'Approved'",
+                                (entity_id,)).fetchall()
+            events = {row[0]: _render_event(kind, row, stamp) for row in rows}
+        else:
+            events = dict(cached.events)
+            ids = sorted(changed)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                for booking_id in chunk:
+                    events.pop(booking_id, None)
+                placeholders = ", ".join("?" for _ in chunk)
+                for row in conn.execute(f"""
+                    SELECT {_FEED_COLUMNS} FROM BookingView
+                    WHERE BookingID IN ({placeholders}) AND {column} = ? AND Status = 'Approved'
+                """, chunk + [entity_id]):
+                    events[row[0]] = _render_event(kind, row, stamp)
+    finally:
+        conn.close()
+    return _Feed(version, seq, title, events)
+
+def get_feed(kind, entity_id, version):
+    """Returns the .ics text of a feed at (at least) `version`, or None for an unknown teacher/room."""
+    if kind not in FEED_KINDS:
+        raise ValueError(f"Unknown feed kind: {kind}")
+    key = (kind, entity_id)
+    cached = _feeds.get(key)
+    if cached is not None and cached.version == version:
+        return cached.body
+
+    feed = _build(kind, entity_id, version, cached)
+    if feed is None:
+        return None
+    with _lock:
+        if key not in _feeds and len(_feeds) >= FEED_CACHE_MAX_ENTRIES:
+            _feeds.pop(next(iter(_feeds)), None)
+        _feeds[key] = feed
+    return feed.body
@@ -0,0 +1,183 @@
+# change_log.py
+#
+# Delta sync for clients that mirror the schedule (hallway displays, phones, dashboards).
+# Triggers created in db_setup.py append to ChangeLog on every write to the tracked
+# tables; clients remember the last Seq they saw and ask only for what came after it.
+
+import sqlite3
+import time
+
+from db_setup import connect_db, CHANGE_TRACKED_TABLES
+
+# --- CONFIGURATION ---
+
+# Maximum number of changes returned by one call; clients page with the returned 'next'.
+CHANGES_PAGE_SIZE = 500
+
+# Compaction keeps at most this many log rows. Clients further behind must resync in full.
+CHANGE_LOG_MAX_ROWS = 10000
+
+# Minimum number of seconds between two automatic compactions in one process.
+COMPACT_INTERVAL_SECONDS = 300
+
+# InternalState key holding the highest Seq removed by compaction.
+FLOOR_STATE_KEY = 'change_log_floor'
+
+# Columns sent to sync clients per table. Passwords and contact details stay out.
+SYNC_COLUMNS = {
+    'Bookings': ['BookingID', 'TeacherID', 'RoomID', 'Date', 'StartTime', 'EndTime', 'Equipment', 'Status'],
+    'Teachers': ['TeacherID', 'Name', 'Subject', 'Role', 'IsApproved', 'Class'],
+    'Classrooms': ['RoomID', 'Name', 'EquipmentList'],
+    'MaterialRequests': ['RequestID', 'FullName', 'ClassTeacher', 'MaterialName',
+                         'BorrowedDate', 'ReturnedDate', 'Status', 'CreatedAt'],
+}
+
+_last_compaction = 0.0
+
+# --- READ FUNCTIONS ---
+
+def _get_floor(cursor):
+    cursor.execute("SELECT Value FROM InternalState WHERE Key = ?", (FLOOR_STATE_KEY,))
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+def get_latest_seq():
+    """Returns the highest sequence number written so far (0 for an empty log)."""
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+def _fetch_rows(cursor, table, row_ids):
+    """Loads the current state of the given rows, keyed by primary key."""
+    columns = SYNC_COLUMNS[table]
+    pk = CHANGE_TRACKED_TABLES[table]
+    rows = {}
+    ids = list(row_ids)
+    # Stay well below SQLITE_MAX_VARIABLE_NUMBER on old SQLite builds.
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {pk} IN ({placeholders})",
+            chunk,
+        )
+        for row in cursor.fetchall():
+            rows[row[0]] = dict(zip(columns, row))
+    return rows
+
+def get_changes_since(since_seq, limit=CHANGES_PAGE_SIZE):
+    """
+    Returns the rows touched after `since_seq`.
+
+    Only the latest change per row is reported, as an 'upsert' carrying the row's
+    current state or a 'delete' with row None. If `since_seq` is older than what
+    compaction has kept, 'reset' is True and the client must refetch everything.
+    """
+    limit = max(1, min(int(limit), CHANGES_PAGE_SIZE))
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        floor = _get_floor(cursor)
+        if since_seq < floor:
+            cursor.execute("SELECT COALESCE(MAX(Seq), ?) FROM ChangeLog", (floor,))
+            return {'since': since_seq, 'next': cursor.fetchone()[0], 'reset': True,
+                    'has_more': False, 'changes': []}
+
+        cursor.execute("""
+            SELECT Seq, TableName, RowID, Op
+            FROM ChangeLog
+            WHERE Seq > ?
+            ORDER BY Seq
+            LIMIT ?
+        """, (since_seq, limit + 1))
+        entries = cursor.fetchall()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        # Collapse repeated changes to the same row, keeping the newest one.
+        latest = {}
+        for seq, table, row_id, op in entries:
+            latest[(table, row_id)] = (seq, op)
+
+        ids_by_table = {}
+        for (table, row_id), (seq, op) in latest.items():
+            if op != 'D':
+                ids_by_table.setdefault(table, set()).add(row_id)
+        current_rows = {table: _fetch_rows(cursor, table, ids) for table, ids in ids_by_table.items()}
+
+        changes = []
+        for (table, row_id), (seq, op) in sorted(latest.items(), key=lambda item: item[1][0]):
+            row = current_rows.get(table, {}).get(row_id)
+            changes.append({
+                'seq': seq,
+                'table': table,
+                'id': row_id,
+                'op': 'delete' if row is None else 'upsert',
+                'row': row,
+            })
+
+        next_seq = entries[-1][0] if entries else since_seq
+        return {'since': since_seq, 'next': next_seq, 'reset': False,
+                'has_more': has_more, 'changes': changes}
+    finally:
+        conn.close()
+
+# --- COMPACTION ---
+
+def compact_change_log(max_rows=CHANGE_LOG_MAX_ROWS):
+    """
+    Keeps ChangeLog bounded.
+
+    1. Drops entries superseded by a newer change to the same row (clients only
+       ever need the latest state).
+    2. If more than `max_rows` entries remain, drops the oldest and raises the
+       floor so that clients behind it are told to resync.
+    Returns the number of rows removed.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        # One probe of idx_changelog_row (TableName, RowID, Seq) per entry.
+        cursor.execute("""
+            DELETE FROM ChangeLog
+            WHERE EXISTS (
+                SELECT 1 FROM ChangeLog Later
+                WHERE Later.TableName = ChangeLog.TableName
+                  AND Later.RowID = ChangeLog.RowID
+                  AND Later.Seq > ChangeLog.Seq
+            )
+        """)
+        removed = cursor.rowcount
+
+        cursor.execute("SELECT COUNT(*) FROM ChangeLog")
+        excess = cursor.fetchone()[0] - max_rows
+        if excess > 0:
+            cursor.execute("SELECT Seq FROM ChangeLog ORDER BY Seq LIMIT 1 OFFSET ?", (excess - 1,))
+            new_floor = cursor.fetchone()[0]
+            cursor.execute("DELETE FROM ChangeLog WHERE Seq <= ?", (new_floor,))
+            removed += cursor.rowcount
+            cursor.execute("INSERT OR REPLACE INTO InternalState (Key, Value) VALUES (?, ?)",
+                           (FLOOR_STATE_KEY, str(new_floor)))
+
+        conn.commit()
+        return removed
+    except sqlite3.Error as e:
+        print(f"Database error compacting change log: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
+
+def maybe_compact_change_log():
+    """Runs compaction at most once every COMPACT_INTERVAL_SECONDS in this process."""
+    global _last_compaction
+    now = time.monotonic()
+    if now - _last_compaction < COMPACT_INTERVAL_SECONDS:
+        return 0
+    _last_compaction = now
+    return compact_change_log()
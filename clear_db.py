@@ -1,9 +1,15 @@
-import sqlite3
-
-DB_PATH = "smart_classroom.db"  # Path to your database file
+from backup import create_backup
+from config import get_db_path
+from db_setup import connect_db, VERSION_TABLES
+from equipment import MIGRATION_STATE_KEY as EQUIPMENT_MIGRATED
+from materials import MIGRATION_STATE_KEY as MATERIALS_MIGRATED
 
 def clear_database():
-    conn = sqlite3.connect(DB_PATH)
+    # Safety snapshot first; if it cannot be taken, nothing is deleted.
+    safety_backup = create_backup(label="pre-clear")
+    print(f"🛟 Safety snapshot saved to {safety_backup}")
+
+    conn = connect_db()
     cursor = conn.cursor()
 
     # Check if sqlite_sequence exists
@@ -17,11 +23,14 @@ def clear_database():
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
     tables = cursor.fetchall()
 
-    print("🧹 Clearing all tables in smart_classroom.db...\n")
+    print(f"🧹 Clearing all tables in {get_db_path()}...\n")
 
     for (table_name,) in tables:
         if table_name.startswith('sqlite_'):  # Skip system tables
             continue
+        # Version counters keep counting up, so caches and sync clients see the deletes below.
+        if table_name in VERSION_TABLES:
+            continue
 
         print(f"Deleting all data from table: {table_name}")
         cursor.execute(f"DELETE FROM {table_name};")
@@ -30,9 +39,13 @@ def clear_database():
         if has_sequence:
             cursor.execute("DELETE FROM sqlite_sequence WHERE name=?;", (table_name,))
 
+    # The inventory tables were emptied: let the next migration rebuild them.
+    cursor.execute("DELETE FROM InternalState WHERE Key IN (?, ?)", (EQUIPMENT_MIGRATED, MATERIALS_MIGRATED))
+
     conn.commit()
     conn.close()
     print("\n✅ All data in 'smart_classroom' database has been cleared successfully!")
+    print(f"   To undo: python backup.py restore {safety_backup}")
 
 if __name__ == "__main__":
     clear_database()
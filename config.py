@@ -0,0 +1,73 @@
+# config.py
+#
+# Central configuration for the database location. Every module gets the path
+# from get_db_path() instead of hard-coding "smart_classroom.db".
+#
+# Resolution order:
+#   1. set_db_path(...) / app.config['DATABASE'] passed to configure_app()
+#   2. the SMART_CLASSROOM_DB environment variable
+#   3. smart_classroom.db next to this file (independent of the working directory)
+#
+# The special value ":memory:" selects a shared-cache in-memory database
+# (file::memory:?cache=shared), which every connection in the process sees.
+
+import os
+import sqlite3
+import uuid
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_FILE = os.path.join(PROJECT_DIR, "smart_classroom.db")
+DB_ENV_VAR = "SMART_CLASSROOM_DB"
+SHARED_MEMORY_URI = "file::memory:?cache=shared"
+
+_db_path = None
+
+# In-memory databases disappear when their last connection closes, so one
+# connection per database is kept open here until release_memory_database().
+_memory_keepers = {}
+
+def _normalize(path):
+    return SHARED_MEMORY_URI if path == ":memory:" else path
+
+def get_db_path():
+    """Returns the database path or URI currently in use."""
+    if _db_path:
+        return _db_path
+    return _normalize(os.environ.get(DB_ENV_VAR) or DEFAULT_DB_FILE)
+
+def set_db_path(path):
+    """Overrides the database location for this process (None restores the default)."""
+    global _db_path
+    _db_path = _normalize(path) if path else None
+    if _db_path and is_memory_database(_db_path):
+        _keep_alive(_db_path)
+
+def is_uri(path):
+    return path.startswith("file:")
+
+def is_memory_database(path=None):
+    path = path or get_db_path()
+    return path.startswith("file::memory:") or "mode=memory" in path
+
+def _keep_alive(uri):
+    if uri not in _memory_keepers:
+        _memory_keepers[uri] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+def use_memory_database(name=None):
+    """
+    Creates a private shared-cache in-memory database and returns its URI.
+
+    Each call with a new name gets an empty database, so tests can isolate
+    themselves from each other while still sharing it across the connections
+    the app opens during one test.
+    """
+    name = name or f"smart_classroom_{uuid.uuid4().hex}"
+    uri = f"file:{name}?mode=memory&cache=shared"
+    _keep_alive(uri)
+    return uri
+
+def release_memory_database(uri):
+    """Closes the keep-alive connection, discarding the in-memory database."""
+    conn = _memory_keepers.pop(uri, None)
+    if conn:
+        conn.close()
@@ -1,13 +1,105 @@
 # db_setup.py
 import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager
 
-DB_FILE = "smart_classroom.db"
+import metrics
+import sql_trace
+from config import get_db_path, is_memory_database, is_uri, set_db_path, use_memory_database, release_memory_database
 
-def connect_db():
+# Tables whose row changes are recorded in ChangeLog, mapped to their primary key.
+CHANGE_TRACKED_TABLES = {
+    'Bookings': 'BookingID',
+    'Teachers': 'TeacherID',
+    'Classrooms': 'RoomID',
+    'MaterialRequests': 'RequestID',
+}
+
+# InternalState key that archive.py sets inside each archival transaction: the rows it
+# moves out of Bookings still exist (in the archive), so their deletes are not logged.
+ARCHIVING_STATE_KEY = 'archiving'
+
+# Cache domains (see cache_bus.py) and the tables whose writes bump their CacheVersions row.
+CACHE_DOMAINS = {
+    'settings': ('SystemSettings',),
+    'rooms': ('Classrooms',),
+    'teachers': ('Teachers',),
+    'bookings': ('Bookings', 'BookingArchiveStats'),
+    'materials': ('MaterialRequests',),
+}
+
+# Version counters that sync clients, calendar subscribers and other workers have
+# already seen (with the change-log floor in InternalState). They must only ever
+# move forward, so clear_db.py leaves these tables alone.
+VERSION_TABLES = ('ChangeLog', 'CacheVersions', 'FeedVersions', 'InternalState')
+
+# Bookkeeping keys that older versions kept in SystemSettings; moved to InternalState.
+INTERNAL_STATE_KEYS = ('change_log_floor', 'maintenance_last_run', 'equipment_migrated', 'materials_migrated')
+
+# --- ROW RECORDS ---
+# Row factories that build compact, immutable records straight from the cursor.
+# One namedtuple-based class is created per record name and column list and then
+# reused, so each row costs a single tuple (no per-row dict or __dict__). Records
+# support row.Date, row['Date'], row[3], row.get('Date'), dict(row) and row._asdict(),
+# so they drop in wherever tuples, dicts or sqlite3.Row were used before.
+
+_record_types = {}
+
+def _record_getitem(self, key):
+    if isinstance(key, str):
+        return tuple.__getitem__(self, self._index[key])
+    return tuple.__getitem__(self, key)
+
+def _record_get(self, key, default=None):
+    index = self._index.get(key)
+    return default if index is None else tuple.__getitem__(self, index)
+
+def _record_keys(self):
+    return self._columns
+
+def record_type(name, columns):
+    """Returns the (cached) record class for the given name and column names."""
+    key = (name, columns)
+    cls = _record_types.get(key)
+    if cls is None:
+        base = namedtuple(name, columns, rename=True)  # rename: columns like COUNT(*) become _0
+        cls = _record_types[key] = type(name, (base,), {
+            '__slots__': (),
+            '_columns': columns,
+            '_index': {column: i for i, column in enumerate(columns)},
+            '__getitem__': _record_getitem,
+            'get': _record_get,
+            'keys': _record_keys,
+        })
+    return cls
+
+def record_factory(name):
+    """Returns a row factory producing `name` records, e.g. cursor.row_factory = record_factory('Booking')."""
+    last = (None, None)  # description seen last and its record class, to skip the lookup per row
+
+    def factory(cursor, row):
+        nonlocal last
+        cached = last
+        if cursor.description is not cached[0]:
+            # Replaced as one tuple, so threads sharing the factory never pair a class with the wrong columns.
+            cached = last = (cursor.description, record_type(name, tuple(column[0] for column in cursor.description)))
+        return cached[1]._make(row)
+
+    factory.__name__ = f"{name.lower()}_row"
+    return factory
+
+booking_row = record_factory('Booking')
+teacher_row = record_factory('Teacher')
+room_row = record_factory('Room')
+material_request_row = record_factory('MaterialRequest')
+
+def connect_db(row_factory=None):
     """Connects to the SQLite database and returns the connection object."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = None 
+        db_path = get_db_path()
+        conn = sqlite3.connect(db_path, uri=is_uri(db_path), factory=sql_trace.connection_factory())
+        conn.row_factory = row_factory
+        metrics.DB_CONNECTIONS.inc()
         return conn
     except sqlite3.Error as e:
         print(f"Database connection error: {e}")
@@ -25,6 +117,11 @@ def initialize_database():
 
     cursor = conn.cursor()
     try:
+        # Write-ahead log: readers keep reading while a write commits, and
+        # maintenance.py checkpoints the log. The mode is stored in the file.
+        if not is_memory_database():
+            cursor.execute("PRAGMA journal_mode=WAL")
+
         # Teachers Table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Teachers (
@@ -37,7 +134,8 @@ def initialize_database():
                 IsApproved INTEGER DEFAULT 0,
                 Email TEXT,
                 Phone TEXT,
-                Class TEXT
+                Class TEXT,
+                DeletedAt TIMESTAMP
             )
         """)
 
@@ -46,7 +144,8 @@ def initialize_database():
             CREATE TABLE IF NOT EXISTS Classrooms (
                 RoomID INTEGER PRIMARY KEY AUTOINCREMENT,
                 Name TEXT UNIQUE NOT NULL,
-                EquipmentList TEXT
+                EquipmentList TEXT,
+                Capacity INTEGER
             )
         """)
         # Insert default rooms if none exist
@@ -104,6 +203,235 @@ def initialize_database():
             )
         """)
 
+        # ----------- ChangeLog Table (delta sync) -----------
+        # One row per insert/update/delete on the tracked tables, written by triggers.
+        # Seq is monotonic (AUTOINCREMENT never reuses values), so clients can ask
+        # for "everything after Seq N" instead of refetching whole tables.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ChangeLog (
+                Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                TableName TEXT NOT NULL,
+                RowID INTEGER NOT NULL,
+                Op TEXT NOT NULL,
+                ChangedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_changelog_row ON ChangeLog (TableName, RowID, Seq)")
+        _create_change_log_triggers(cursor)
+
+        # ----------- Archive aggregates (see archive.py) -----------
+        # Bookings moved to the archive database leave their counts behind here,
+        # so reports that read BookingCounts keep their totals after archival.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS BookingArchiveStats (
+                Month TEXT NOT NULL,
+                TeacherID INTEGER NOT NULL,
+                RoomID INTEGER NOT NULL,
+                Status TEXT NOT NULL,
+                Bookings INTEGER NOT NULL,
+                PRIMARY KEY (Month, TeacherID, RoomID, Status)
+            )
+        """)
+        # Live rows use the same COALESCE as archive.py, so a NULL status stays in the
+        # 'Pending' bucket before and after archival. Recreated so older databases get it.
+        cursor.execute("DROP VIEW IF EXISTS BookingCounts")
+        cursor.execute("""
+            CREATE VIEW BookingCounts AS
+                SELECT substr(Date, 1, 7) AS Month, TeacherID, RoomID, COALESCE(Status, 'Pending') AS Status,
+                       1 AS Bookings
+                FROM Bookings
+                UNION ALL
+                SELECT Month, TeacherID, RoomID, Status, Bookings FROM BookingArchiveStats
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_date ON Bookings (Date)")
+
+        # ----------- BookingView Table (denormalized read model) -----------
+        # Bookings with their teacher's name and subject and the room name, kept in step
+        # by triggers, so the booking list pages read one table in index order.
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'BookingView'")
+        booking_view_exists = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS BookingView (
+                BookingID INTEGER PRIMARY KEY,
+                TeacherID INTEGER NOT NULL,
+                RoomID INTEGER NOT NULL,
+                Date TEXT NOT NULL,
+                StartTime TEXT NOT NULL,
+                EndTime TEXT NOT NULL,
+                Equipment TEXT,
+                Status TEXT,
+                TeacherName TEXT,
+                Subject TEXT,
+                RoomName TEXT
+            )
+        """)
+        # Sort orders of the list pages: newest first (manage pages, public list, get_all_bookings),
+        # newest day first with the earliest slot first (admin list), and the status queues.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_view_date ON BookingView (Date, StartTime)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_view_admin ON BookingView (Date DESC, StartTime ASC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_view_status ON BookingView (Status, Date, StartTime)")
+        # Renames touch only the affected teacher's or room's rows.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_view_teacher ON BookingView (TeacherID)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_view_room ON BookingView (RoomID)")
+        _create_booking_view_triggers(cursor)
+        if not booking_view_exists:
+            rebuild_booking_view(cursor)
+
+        # ----------- FeedVersions Table (see calendar_feeds.py) -----------
+        # A version per teacher and per room calendar feed, bumped by triggers whenever an
+        # approved booking of theirs (or a name shown in it) changes, so a feed poll is
+        # answered from this table alone while nothing changed.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS FeedVersions (
+                Kind TEXT NOT NULL,
+                EntityID INTEGER NOT NULL,
+                Version INTEGER NOT NULL DEFAULT 1,
+                ModifiedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (Kind, EntityID)
+            ) WITHOUT ROWID
+        """)
+        _create_feed_version_triggers(cursor)
+
+        # ----------- Equipment inventory (see equipment.py) -----------
+        # Equipment: every kind of item, with the number in the shared (mobile) pool.
+        # RoomEquipment: items fixed in a room, parsed from Classrooms.EquipmentList.
+        # BookingEquipment: pool items reserved by a booking, with the booking's slot copied
+        # in so the per-slot check is one range search on the partial index below.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Equipment (
+                EquipmentID INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                Quantity INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS RoomEquipment (
+                RoomID INTEGER NOT NULL,
+                EquipmentID INTEGER NOT NULL,
+                Quantity INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (RoomID, EquipmentID),
+                FOREIGN KEY (RoomID) REFERENCES Classrooms(RoomID),
+                FOREIGN KEY (EquipmentID) REFERENCES Equipment(EquipmentID)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS BookingEquipment (
+                BookingID INTEGER NOT NULL,
+                EquipmentID INTEGER NOT NULL,
+                Quantity INTEGER NOT NULL DEFAULT 1,
+                Date TEXT NOT NULL,
+                StartTime TEXT NOT NULL,
+                EndTime TEXT NOT NULL,
+                Active INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (BookingID, EquipmentID),
+                FOREIGN KEY (EquipmentID) REFERENCES Equipment(EquipmentID)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_booking_equipment_slot
+            ON BookingEquipment (EquipmentID, Date, StartTime, EndTime, Quantity) WHERE Active = 1
+        """)
+        _create_booking_equipment_triggers(cursor)
+
+        # ----------- Materials Table (see materials.py) -----------
+        # Stock of each lendable material; NULL until an admin has counted it (no limit is
+        # enforced before that). LongestLoanDays is the longest approved loan
+        # of it so far (kept by triggers): every loan overlapping a date range then
+        # started at most that many days before the range, which bounds the index
+        # range searched on idx_material_loans.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Materials (
+                MaterialID INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                Stock INTEGER,
+                LongestLoanDays INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_material_loans
+            ON MaterialRequests (MaterialName COLLATE NOCASE, BorrowedDate, ReturnedDate) WHERE Status = 'Approved'
+        """)
+        _create_material_loan_triggers(cursor)
+
+        # ----------- SlotHolds Table (see slot_holds.py) -----------
+        # Short-lived reservations of a slot while a teacher fills in the booking form.
+        # ExpiresAt is a Unix timestamp; expired rows are ignored and removed lazily.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SlotHolds (
+                RoomID INTEGER NOT NULL,
+                Date TEXT NOT NULL,
+                StartTime TEXT NOT NULL,
+                EndTime TEXT NOT NULL,
+                TeacherID INTEGER NOT NULL,
+                ExpiresAt REAL NOT NULL,
+                PRIMARY KEY (RoomID, Date, StartTime)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_teacher ON SlotHolds (TeacherID)")
+
+        # ----------- NotificationOutbox Table (see notifications.py) -----------
+        # Messages are written in the same transaction as the status change they report
+        # and sent later by the dispatcher thread, so no admin click waits on a provider.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS NotificationOutbox (
+                OutboxID INTEGER PRIMARY KEY AUTOINCREMENT,
+                Channel TEXT NOT NULL,
+                Recipient TEXT NOT NULL,
+                Subject TEXT,
+                Body TEXT NOT NULL,
+                Status TEXT NOT NULL DEFAULT 'Pending',
+                Attempts INTEGER NOT NULL DEFAULT 0,
+                NextAttemptAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                LastError TEXT,
+                CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                SentAt TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON NotificationOutbox (Status, NextAttemptAt)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_sent ON NotificationOutbox (Channel, SentAt)")
+
+        # ----------- InternalState Table (bookkeeping kept out of SystemSettings) -----------
+        # Change-log floor, maintenance claims and one-time migration flags. Writes to
+        # SystemSettings invalidate the 'settings' cache in every worker; these do not.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS InternalState (
+                Key TEXT PRIMARY KEY,
+                Value TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        placeholders = ", ".join("?" for _ in INTERNAL_STATE_KEYS)
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO InternalState (Key, Value)
+            SELECT Key, Value FROM SystemSettings WHERE Key IN ({placeholders})
+        """, INTERNAL_STATE_KEYS)
+        cursor.execute(f"DELETE FROM SystemSettings WHERE Key IN ({placeholders})", INTERNAL_STATE_KEYS)
+
+        # ----------- CacheVersions Table (cross-worker cache invalidation) -----------
+        # One counter per cache domain, bumped by triggers in the same transaction as
+        # the write, so every worker sees a new version as soon as the write commits.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS CacheVersions (
+                Domain TEXT PRIMARY KEY,
+                Version INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        cursor.executemany("INSERT OR IGNORE INTO CacheVersions (Domain) VALUES (?)",
+                           [(domain,) for domain in CACHE_DOMAINS])
+        _create_cache_version_triggers(cursor)
+
+        # Pending queue, and the material request pages filtered by status / ordered by date
+        # (checked by `python queries.py --check`).
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_date ON Bookings (Status, Date, StartTime)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_material_requests_status ON MaterialRequests (Status, CreatedAt)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_material_requests_created ON MaterialRequests (CreatedAt)")
+
+        # Covers a teacher's history page (see get_teacher_booking_history), so a page of
+        # it is read straight from the index in display order without touching the table.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bookings_teacher_history
+            ON Bookings (TeacherID, Date DESC, StartTime DESC, BookingID DESC, EndTime, Status, RoomID, Equipment)
+        """)
+
         conn.commit()
         print("INFO: Database initialized successfully. All tables ensured.")
 
@@ -113,5 +441,197 @@ def initialize_database():
         if conn:
             conn.close()
 
+def _create_change_log_triggers(cursor):
+    """Creates the INSERT/UPDATE/DELETE triggers that feed ChangeLog."""
+    for table, pk in CHANGE_TRACKED_TABLES.items():
+        for event, op, ref in (('INSERT', 'I', 'NEW'), ('UPDATE', 'U', 'NEW'), ('DELETE', 'D', 'OLD')):
+            name = f"trg_{table.lower()}_{event.lower()}_changelog"
+            when = ""
+            if event == 'DELETE':
+                when = f"WHEN NOT EXISTS (SELECT 1 FROM InternalState WHERE Key = '{ARCHIVING_STATE_KEY}')"
+                # Recreated so older databases get the WHEN clause.
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name}
+                AFTER {event} ON {table} {when}
+                BEGIN
+                    INSERT INTO ChangeLog (TableName, RowID, Op) VALUES ('{table}', {ref}.{pk}, '{op}');
+                END
+            """)
+
+BOOKING_VIEW_COLUMNS = ("BookingID, TeacherID, RoomID, Date, StartTime, EndTime, Equipment, Status, "
+                        "TeacherName, Subject, RoomName")
+
+def _create_booking_view_triggers(cursor):
+    """Creates the triggers that keep BookingView in step with Bookings, Teachers and Classrooms."""
+    upsert_new = f"""
+        INSERT OR REPLACE INTO BookingView ({BOOKING_VIEW_COLUMNS}) VALUES (
+            NEW.BookingID, NEW.TeacherID, NEW.RoomID, NEW.Date, NEW.StartTime, NEW.EndTime,
+            NEW.Equipment, NEW.Status,
+            (SELECT Name FROM Teachers WHERE TeacherID = NEW.TeacherID),
+            (SELECT Subject FROM Teachers WHERE TeacherID = NEW.TeacherID),
+            (SELECT Name FROM Classrooms WHERE RoomID = NEW.RoomID)
+        );
+    """
+    triggers = {
+        'trg_bookings_insert_booking_view': f"AFTER INSERT ON Bookings BEGIN {upsert_new} END",
+        'trg_bookings_update_booking_view': f"""
+            AFTER UPDATE ON Bookings BEGIN
+                DELETE FROM BookingView WHERE BookingID = OLD.BookingID AND OLD.BookingID <> NEW.BookingID;
+                {upsert_new}
+            END""",
+        'trg_bookings_delete_booking_view': """
+            AFTER DELETE ON Bookings BEGIN
+                DELETE FROM BookingView WHERE BookingID = OLD.BookingID;
+            END""",
+        'trg_teachers_rename_booking_view': """
+            AFTER UPDATE OF Name, Subject ON Teachers
+            WHEN OLD.Name IS NOT NEW.Name OR OLD.Subject IS NOT NEW.Subject
+            BEGIN
+                UPDATE BookingView SET TeacherName = NEW.Name, Subject = NEW.Subject WHERE TeacherID = NEW.TeacherID;
+            END""",
+        'trg_classrooms_rename_booking_view': """
+            AFTER UPDATE OF Name ON Classrooms
+            WHEN OLD.Name IS NOT NEW.Name
+            BEGIN
+                UPDATE BookingView SET RoomName = NEW.Name WHERE RoomID = NEW.RoomID;
+            END""",
+    }
+    for name, body in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+def rebuild_booking_view(cursor):
+    """Refills BookingView from Bookings (on first creation, or after it was found out of step)."""
+    cursor.execute("DELETE FROM BookingView")
+    cursor.execute(f"""
+        INSERT INTO BookingView ({BOOKING_VIEW_COLUMNS})
+        SELECT B.BookingID, B.TeacherID, B.RoomID, B.Date, B.StartTime, B.EndTime, B.Equipment, B.Status,
+               T.Name, T.Subject, C.Name
+        FROM Bookings B
+        LEFT JOIN Teachers T ON B.TeacherID = T.TeacherID
+        LEFT JOIN Classrooms C ON B.RoomID = C.RoomID
+    """)
+    return cursor.rowcount
+
+def _create_material_loan_triggers(cursor):
+    """Keeps Materials.LongestLoanDays covering every approved loan of the material."""
+    longest = """
+            UPDATE Materials
+            SET LongestLoanDays = MAX(LongestLoanDays,
+                                      CAST(julianday(NEW.ReturnedDate) - julianday(NEW.BorrowedDate) AS INTEGER))
+            WHERE Name = NEW.MaterialName;
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_material_requests_insert_loan
+        AFTER INSERT ON MaterialRequests
+        WHEN NEW.Status = 'Approved'
+        BEGIN{longest}END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_material_requests_update_loan
+        AFTER UPDATE OF Status, MaterialName, BorrowedDate, ReturnedDate ON MaterialRequests
+        WHEN NEW.Status = 'Approved'
+        BEGIN{longest}END
+    """)
+
+def _create_booking_equipment_triggers(cursor):
+    """Keeps the slot and Active flag of BookingEquipment in step with its booking."""
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_update_booking_equipment
+        AFTER UPDATE OF Date, StartTime, EndTime, Status ON Bookings
+        BEGIN
+            UPDATE BookingEquipment
+            SET Date = NEW.Date, StartTime = NEW.StartTime, EndTime = NEW.EndTime,
+                Active = COALESCE(NEW.Status, 'Pending') IN ('Pending', 'Approved')
+            WHERE BookingID = NEW.BookingID;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_delete_booking_equipment
+        AFTER DELETE ON Bookings
+        BEGIN
+            DELETE FROM BookingEquipment WHERE BookingID = OLD.BookingID;
+        END
+    """)
+
+def _bump_feed(kind, entity_id):
+    return f"""
+        INSERT INTO FeedVersions (Kind, EntityID) VALUES ('{kind}', {entity_id})
+        ON CONFLICT (Kind, EntityID) DO UPDATE SET Version = Version + 1, ModifiedAt = CURRENT_TIMESTAMP;
+    """
+
+def _bump_feeds(kind, column, where):
+    return f"""
+        INSERT INTO FeedVersions (Kind, EntityID)
+        SELECT DISTINCT '{kind}', {column} FROM BookingView WHERE Status = 'Approved' AND {where}
+        ON CONFLICT (Kind, EntityID) DO UPDATE SET Version = Version + 1, ModifiedAt = CURRENT_TIMESTAMP;
+    """
+
+def _create_feed_version_triggers(cursor):
+    """Creates the triggers that bump FeedVersions for the teacher and room feeds of approved bookings."""
+    triggers = {
+        'trg_bookings_insert_feed_version': f"""
+            AFTER INSERT ON Bookings WHEN NEW.Status = 'Approved' BEGIN
+                {_bump_feed('teacher', 'NEW.TeacherID')}
+                {_bump_feed('room', 'NEW.RoomID')}
+            END""",
+        'trg_bookings_update_feed_version': f"""
+            AFTER UPDATE ON Bookings WHEN OLD.Status = 'Approved' OR NEW.Status = 'Approved' BEGIN
+                {_bump_feed('teacher', 'OLD.TeacherID')}
+                {_bump_feed('room', 'OLD.RoomID')}
+                {_bump_feed('teacher', 'NEW.TeacherID')}
+                {_bump_feed('room', 'NEW.RoomID')}
+            END""",
+        'trg_bookings_delete_feed_version': f"""
+            AFTER DELETE ON Bookings WHEN OLD.Status = 'Approved' BEGIN
+                {_bump_feed('teacher', 'OLD.TeacherID')}
+                {_bump_feed('room', 'OLD.RoomID')}
+            END""",
+        # Room feeds show teacher names and teacher feeds show room names.
+        'trg_teachers_rename_feed_version': f"""
+            AFTER UPDATE OF Name, Subject ON Teachers
+            WHEN OLD.Name IS NOT NEW.Name OR OLD.Subject IS NOT NEW.Subject
+            BEGIN
+                {_bump_feed('teacher', 'NEW.TeacherID')}
+                {_bump_feeds('room', 'RoomID', 'TeacherID = NEW.TeacherID')}
+            END""",
+        'trg_classrooms_rename_feed_version': f"""
+            AFTER UPDATE OF Name ON Classrooms WHEN OLD.Name IS NOT NEW.Name BEGIN
+                {_bump_feed('room', 'NEW.RoomID')}
+                {_bump_feeds('teacher', 'TeacherID', 'RoomID = NEW.RoomID')}
+            END""",
+    }
+    for name, body in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+def _create_cache_version_triggers(cursor):
+    """Creates the INSERT/UPDATE/DELETE triggers that bump CacheVersions."""
+    for domain, tables in CACHE_DOMAINS.items():
+        for table in tables:
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_{event.lower()}_cache_version
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE CacheVersions SET Version = Version + 1 WHERE Domain = '{domain}';
+                    END
+                """)
+
+@contextmanager
+def isolated_database(name=None):
+    """
+    Points the app at a fresh, initialized in-memory database for the duration of
+    the block, then discards it. Each block gets its own database, so parallel
+    test workers (and consecutive tests in one worker) never see each other's rows.
+    """
+    uri = use_memory_database(name)
+    set_db_path(uri)
+    try:
+        initialize_database()
+        yield uri
+    finally:
+        set_db_path(None)
+        release_memory_database(uri)
+
 if __name__ == '__main__':
     initialize_database()
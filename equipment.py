@@ -0,0 +1,225 @@
+# equipment.py
+#
+# Equipment inventory and per-slot reservation checks.
+#
+# Equipment used to be free text only (Bookings.Equipment, Classrooms.EquipmentList),
+# so nothing stopped two bookings from claiming the school's single projector at
+# the same time. The inventory tables (created in db_setup.py) are:
+#
+#   Equipment         every kind of item, with the number in the shared pool
+#   RoomEquipment     items fixed in a room (booking the room includes them)
+#   BookingEquipment  pool items reserved by a booking, with the booking's slot
+#
+# A booking's free text is parsed into items ("2x Speakers, Projector"). Items the
+# room already has are covered by the room; the rest are reserved from the pool
+# inside the booking's own write transaction, after checking the units already
+# reserved in overlapping slots with one indexed range search per item. Text that
+# names no inventory item is kept as a free-text note, as before.
+#
+#   python equipment.py list
+#   python equipment.py set-quantity Projector 3
+#   python equipment.py available 2026-11-02 09:00 09:40
+#   python equipment.py migrate [--force]     # parse the existing free-text columns
+
+import argparse
+import re
+
+from db_setup import connect_db
+from queries import EQUIPMENT_RESERVED_SQL
+from write_queue import run_write
+
+# InternalState key set once the free-text columns have been parsed.
+MIGRATION_STATE_KEY = 'equipment_migrated'
+
+_ITEM_SEPARATORS = re.compile(r"\s*[,;\n]\s*")
+_LEADING_QUANTITY = re.compile(r"^(\d+)\s*[x×]?\s+(.+)$", re.IGNORECASE)
+# "Speakers x2" / "Speakers x 2"; the x must stand apart, so "Xbox 360" or "Box 2" are names.
+_TRAILING_QUANTITY = re.compile(r"^(.+?)\s+[x×]\s*(\d+)$", re.IGNORECASE)
+
+# --- PARSING ---
+
+def parse_equipment(text):
+    """'Projector, 2x Speakers, 30 PCs' -> [('Projector', 1), ('Speakers', 2), ('PCs', 30)]"""
+    items = {}
+    for part in _ITEM_SEPARATORS.split(text or ""):
+        part = " ".join(part.split())
+        if not part:
+            continue
+        leading, trailing = _LEADING_QUANTITY.match(part), _TRAILING_QUANTITY.match(part)
+        if leading:
+            name, quantity = leading.group(2), int(leading.group(1))
+        elif trailing:
+            name, quantity = trailing.group(1), int(trailing.group(2))
+        else:
+            name, quantity = part, 1
+        # Names compare case-insensitively, like the Equipment.Name column.
+        first_name, total = items.get(name.lower(), (name, 0))
+        items[name.lower()] = (first_name, total + quantity)
+    return list(items.values())
+
+# --- RESERVATIONS (on the caller's write connection) ---
+
+def plan_equipment(cursor, room_id, date_str, start_time_str, end_time_str, equipment_text, strict=True):
+    """
+    Works out the pool units a booking needs. Returns (reservations, shortages):
+    reservations is [(EquipmentID, quantity)] for reserve_equipment(), shortages the
+    names of items without enough free units in the slot (then nothing should be booked).
+    With strict=False short items are reserved anyway and only reported (admin edits).
+    """
+    reservations, shortages = [], []
+    for name, quantity in parse_equipment(equipment_text):
+        item = cursor.execute("SELECT EquipmentID, Name, Quantity FROM Equipment WHERE Name = ?", (name,)).fetchone()
+        if item is None:
+            continue  # not an inventory item: kept as a free-text note only
+        equipment_id, item_name, pool = item
+        in_room = cursor.execute("SELECT Quantity FROM RoomEquipment WHERE RoomID = ? AND EquipmentID = ?",
+                                 (room_id, equipment_id)).fetchone()
+        from_pool = quantity - (in_room[0] if in_room else 0)
+        if from_pool <= 0:
+            continue
+        reserved = cursor.execute(EQUIPMENT_RESERVED_SQL,
+                                  (equipment_id, date_str, end_time_str, start_time_str)).fetchone()[0]
+        if reserved + from_pool > pool:
+            shortages.append(item_name)
+            if strict:
+                continue
+        reservations.append((equipment_id, from_pool))
+    return reservations, shortages
+
+def reserve_equipment(cursor, booking_id, date_str, start_time_str, end_time_str, reservations, active=True):
+    """Records the planned reservations of a booking (replacing any it had)."""
+    cursor.execute("DELETE FROM BookingEquipment WHERE BookingID = ?", (booking_id,))
+    cursor.executemany("""
+        INSERT INTO BookingEquipment (BookingID, EquipmentID, Quantity, Date, StartTime, EndTime, Active)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(booking_id, equipment_id, quantity, date_str, start_time_str, end_time_str, int(active))
+          for equipment_id, quantity in reservations])
+
+def sync_booking_equipment(cursor, booking_id, room_id, date_str, start_time_str, end_time_str,
+                           equipment_text, status):
+    """Re-plans the reservations of an edited booking. Returns the names of overbooked items."""
+    cursor.execute("DELETE FROM BookingEquipment WHERE BookingID = ?", (booking_id,))
+    reservations, shortages = plan_equipment(cursor, room_id, date_str, start_time_str, end_time_str,
+                                             equipment_text, strict=False)
+    active = status in ('Pending', 'Approved')
+    reserve_equipment(cursor, booking_id, date_str, start_time_str, end_time_str, reservations, active)
+    return shortages if active else []
+
+def available_equipment(date_str, start_time_str, end_time_str):
+    """Returns [(Name, pool Quantity, free units)] for every item in the given slot."""
+    conn = connect_db()
+    try:
+        items = conn.execute("SELECT EquipmentID, Name, Quantity FROM Equipment ORDER BY Name").fetchall()
+        return [(name, quantity,
+                 quantity - conn.execute(EQUIPMENT_RESERVED_SQL,
+                                         (equipment_id, date_str, end_time_str, start_time_str)).fetchone()[0])
+                for equipment_id, name, quantity in items]
+    finally:
+        conn.close()
+
+def set_quantity(name, quantity):
+    """Sets the pool size of an item, adding the item when it is new."""
+    def update(conn):
+        conn.execute("""
+            INSERT INTO Equipment (Name, Quantity) VALUES (?, ?)
+            ON CONFLICT (Name) DO UPDATE SET Quantity = excluded.Quantity
+        """, (name, quantity))
+    run_write(update)
+
+# --- MIGRATION ---
+
+def _equipment_id(cursor, name, known):
+    key = name.lower()
+    if key not in known:
+        # Fixed in a room only: nothing in the shared pool until set-quantity says so.
+        cursor.execute("INSERT OR IGNORE INTO Equipment (Name, Quantity) VALUES (?, 0)", (name,))
+        known[key] = cursor.execute("SELECT EquipmentID FROM Equipment WHERE Name = ?", (name,)).fetchone()[0]
+    return known[key]
+
+def migrate_equipment_strings(force=False):
+    """
+    Builds the inventory from Classrooms.EquipmentList: every item named there becomes an
+    Equipment item (with an empty pool when new) and a RoomEquipment row. Bookings.Equipment is then
+    parsed into BookingEquipment for the items that exist; other booking text stays a
+    free-text note. Runs once unless force is set; re-running is safe. Existing bookings
+    are recorded as they are, even where they already overbook an item.
+    Returns (rooms, bookings) parsed, or None if skipped.
+    """
+    def migrate(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT Value FROM InternalState WHERE Key = ?", (MIGRATION_STATE_KEY,))
+        if cursor.fetchone() and not force:
+            return None
+
+        known = {name.lower(): equipment_id
+                 for equipment_id, name in cursor.execute("SELECT EquipmentID, Name FROM Equipment").fetchall()}
+        room_items = {}
+        rooms = cursor.execute("SELECT RoomID, EquipmentList FROM Classrooms").fetchall()
+        for room_id, text in rooms:
+            for name, quantity in parse_equipment(text):
+                equipment_id = _equipment_id(cursor, name, known)
+                room_items[(room_id, equipment_id)] = quantity
+                cursor.execute("""
+                    INSERT OR REPLACE INTO RoomEquipment (RoomID, EquipmentID, Quantity) VALUES (?, ?, ?)
+                """, (room_id, equipment_id, quantity))
+
+        bookings = cursor.execute("""
+            SELECT BookingID, RoomID, Date, StartTime, EndTime, Status, Equipment FROM Bookings
+            WHERE Equipment IS NOT NULL AND Equipment <> ''
+        """).fetchall()
+        rows = []
+        for booking_id, room_id, date_str, start, end, status, text in bookings:
+            active = int((status or 'Pending') in ('Pending', 'Approved'))
+            for name, quantity in parse_equipment(text):
+                equipment_id = known.get(name.lower())
+                if equipment_id is None:
+                    continue  # not an inventory item: kept as a free-text note only
+                from_pool = quantity - room_items.get((room_id, equipment_id), 0)
+                if from_pool > 0:
+                    rows.append((booking_id, equipment_id, from_pool, date_str, start, end, active))
+        cursor.executemany("""
+            INSERT OR IGNORE INTO BookingEquipment (BookingID, EquipmentID, Quantity, Date, StartTime, EndTime, Active)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        cursor.execute("INSERT OR REPLACE INTO InternalState (Key, Value) VALUES (?, '1')", (MIGRATION_STATE_KEY,))
+        return len(rooms), len(bookings)
+
+    return run_write(migrate)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Equipment inventory.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="items, pool sizes and the rooms that have them")
+    qty = sub.add_parser("set-quantity", help="set the number of an item in the shared pool")
+    qty.add_argument("name")
+    qty.add_argument("quantity", type=int)
+    avail = sub.add_parser("available", help="free pool units per item in a slot")
+    avail.add_argument("date")
+    avail.add_argument("start_time")
+    avail.add_argument("end_time")
+    mig = sub.add_parser("migrate", help="parse the free-text equipment columns into the inventory")
+    mig.add_argument("--force", action="store_true", help="parse again even if done before")
+    args = parser.parse_args()
+
+    if args.command == "set-quantity":
+        set_quantity(args.name, args.quantity)
+    elif args.command == "available":
+        for name, quantity, free in available_equipment(args.date, args.start_time, args.end_time):
+            print(f"{name:<32} {free:>4} of {quantity} free")
+    elif args.command == "migrate":
+        result = migrate_equipment_strings(args.force)
+        print("Already migrated (use --force to parse again)." if result is None
+              else f"Parsed equipment of {result[0]} rooms and {result[1]} bookings.")
+    if args.command in ("list", "set-quantity"):
+        conn = connect_db()
+        try:
+            for name, quantity, rooms in conn.execute("""
+                SELECT E.Name, E.Quantity, GROUP_CONCAT(C.Name, ', ')
+                FROM Equipment E
+                LEFT JOIN RoomEquipment R ON R.EquipmentID = E.EquipmentID
+                LEFT JOIN Classrooms C ON C.RoomID = R.RoomID
+                GROUP BY E.EquipmentID ORDER BY E.Name
+            """):
+                print(f"{name:<32} pool {quantity:>3}   in rooms: {rooms or '-'}")
+        finally:
+            conn.close()
@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+#
+# Usage: gunicorn -c gunicorn.conf.py wsgi:app
+# Run `flask --app wsgi init` once before starting the server.
+
+import multiprocessing
+import os
+
+import metrics
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+# Import the app once in the master and fork workers from it, so each worker
+# starts in milliseconds instead of re-importing Flask and the app modules.
+# No SQLite connection is opened at import time, so nothing is shared across the fork.
+preload_app = True
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+
+# Per-worker metric files are aggregated by /metrics when SMART_CLASSROOM_METRICS_DIR
+# is set; a dead worker's counters are kept but its in-flight gauge is dropped.
+def child_exit(server, worker):
+    metrics.mark_process_dead(worker.pid)
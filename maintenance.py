@@ -0,0 +1,328 @@
+# maintenance.py
+#
+# Database housekeeping in one place.
+#
+#   python maintenance.py stats                 # rows and size per table and index
+#   python maintenance.py pages                 # page size, page/freelist counts, journal mode, file sizes
+#   python maintenance.py integrity [--full]    # PRAGMA quick_check (or integrity_check)
+#   python maintenance.py analyze               # ANALYZE, refreshes the query planner statistics
+#   python maintenance.py optimize              # PRAGMA optimize
+#   python maintenance.py checkpoint [--mode TRUNCATE]
+#   python maintenance.py vacuum [--pages N | --full | --enable-incremental]
+#   python maintenance.py tables                # what show_tables.py prints
+#   python maintenance.py migrate               # create missing tables/indexes and run column migrations
+#   python maintenance.py rebuild-views         # refill BookingView from Bookings
+#
+# The cheap tasks (PRAGMA optimize, a passive WAL checkpoint, a bounded
+# incremental_vacuum, resuming an interrupted teacher purge, pruning sent
+# notifications and expired slot holds) also run automatically from the web
+# app: init_app() starts a thread in each worker that waits until the worker has
+# been idle for IDLE_SECONDS and at most one worker per
+# MAINTENANCE_INTERVAL_SECONDS actually does the work.
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from config import get_db_path, is_memory_database
+from db_setup import connect_db, initialize_database, rebuild_booking_view
+
+# --- CONFIGURATION ---
+
+MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get("SMART_CLASSROOM_MAINTENANCE_INTERVAL", 900))  # 0 disables
+
+# A worker counts as idle once no request has been in flight for this long.
+IDLE_SECONDS = 5
+IDLE_CHECK_SECONDS = 15
+
+# Upper bound on the rows ANALYZE/optimize sample per index, so they stay cheap on large tables.
+ANALYSIS_LIMIT = 1000
+
+# Pages returned to the OS per automatic incremental_vacuum, and the freelist size that triggers it.
+INCREMENTAL_VACUUM_PAGES = 500
+INCREMENTAL_VACUUM_MIN_FREE_PAGES = 1000
+
+# InternalState key holding the time of the last automatic run (shared by all workers).
+LAST_RUN_STATE_KEY = 'maintenance_last_run'
+
+# --- INSPECTION ---
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+def file_stats():
+    """Returns page and file level figures for the live database."""
+    db_path = get_db_path()
+    conn = connect_db()
+    try:
+        stats = {
+            'page_size': _pragma(conn, 'page_size'),
+            'page_count': _pragma(conn, 'page_count'),
+            'freelist_count': _pragma(conn, 'freelist_count'),
+            'auto_vacuum': ('none', 'full', 'incremental')[_pragma(conn, 'auto_vacuum')],
+            'journal_mode': _pragma(conn, 'journal_mode'),
+        }
+    finally:
+        conn.close()
+    stats['free_percent'] = round(100 * stats['freelist_count'] / stats['page_count'], 1) if stats['page_count'] else 0.0
+    if not is_memory_database(db_path):
+        for key, path in (('file_bytes', db_path), ('wal_bytes', db_path + '-wal')):
+            stats[key] = os.path.getsize(path) if os.path.exists(path) else 0
+    return stats
+
+def table_stats():
+    """Returns (name, 'table'|'index', rows or None, pages, bytes) for every table and index."""
+    conn = connect_db()
+    try:
+        try:
+            sizes = {name: (pages, size) for name, pages, size in conn.execute(
+                "SELECT name, COUNT(*), SUM(pgsize) FROM dbstat GROUP BY name")}
+        except sqlite3.OperationalError:
+            sizes = {}  # SQLite built without the dbstat virtual table
+        result = []
+        for name, kind in conn.execute(
+                "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'index') ORDER BY type DESC, name").fetchall():
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] if kind == 'table' else None
+            pages, size = sizes.get(name, (None, None))
+            result.append((name, kind, rows, pages, size))
+        return result
+    finally:
+        conn.close()
+
+def integrity_check(full=False):
+    """Runs PRAGMA quick_check (or the slower integrity_check). Returns the messages, ['ok'] when healthy."""
+    conn = connect_db()
+    try:
+        return [row[0] for row in conn.execute("PRAGMA integrity_check" if full else "PRAGMA quick_check")]
+    finally:
+        conn.close()
+
+# --- TASKS ---
+
+def analyze():
+    """Rebuilds the planner statistics (sqlite_stat1) for every index."""
+    conn = connect_db()
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+def optimize():
+    """PRAGMA optimize: re-analyzes only the tables whose statistics are out of date."""
+    conn = connect_db()
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+    finally:
+        conn.close()
+
+def rebuild_views():
+    """Refills the trigger-maintained BookingView in one transaction. Returns the rows written."""
+    conn = connect_db()
+    try:
+        rows = rebuild_booking_view(conn.cursor())
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+def checkpoint(mode="PASSIVE"):
+    """Checkpoints the WAL. Returns (busy, wal pages, checkpointed pages), or None outside WAL mode."""
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+    conn = connect_db()
+    try:
+        if _pragma(conn, 'journal_mode') != 'wal':
+            return None
+        return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.close()
+
+def vacuum(pages=None, full=False, enable_incremental=False):
+    """
+    Returns free pages to the OS. With auto_vacuum=incremental this frees up to `pages`
+    pages (all when None) without rewriting the file; otherwise it needs full=True,
+    which rewrites the whole database and blocks writers while it runs.
+    enable_incremental switches the database to auto_vacuum=incremental (this takes one full VACUUM).
+    Returns the number of pages freed.
+    """
+    conn = connect_db()
+    conn.isolation_level = None  # VACUUM cannot run inside a transaction
+    try:
+        before = _pragma(conn, 'page_count')
+        if enable_incremental:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        elif full:
+            conn.execute("VACUUM")
+        elif _pragma(conn, 'auto_vacuum') == 2:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages) if pages else 0})")
+        else:
+            print("auto_vacuum is not incremental; use --full, or --enable-incremental once.")
+        return before - _pragma(conn, 'page_count')
+    finally:
+        conn.close()
+
+def run_idle_maintenance():
+    """The cheap tasks run by the scheduler. Returns a dict describing what was done."""
+    done = {}
+    optimize()
+    done['optimize'] = True
+    done['checkpoint'] = checkpoint("PASSIVE")
+    stats = file_stats()
+    if stats['auto_vacuum'] == 'incremental' and stats['freelist_count'] >= INCREMENTAL_VACUUM_MIN_FREE_PAGES:
+        done['vacuumed_pages'] = vacuum(pages=INCREMENTAL_VACUUM_PAGES)
+
+    from purge import purge_deleted_teachers  # local import: purge pulls in the write queue
+    done['purged'] = purge_deleted_teachers()
+
+    from notifications import prune_sent
+    done['notifications_pruned'] = prune_sent()
+
+    from slot_holds import sweep_expired_holds
+    done['holds_expired'] = sweep_expired_holds()
+    return done
+
+# --- IDLE SCHEDULER ---
+
+_activity_lock = threading.Lock()
+_in_flight = 0
+_last_activity = time.monotonic()
+_scheduler_pid = None
+
+def _claim_run(interval):
+    """
+    Atomically records this run in InternalState; only one worker per interval wins.
+    The last run is read first, so idle workers do not take the write lock until it is due.
+    """
+    from write_queue import run_write
+
+    conn = connect_db()
+    try:
+        row = conn.execute("SELECT Value FROM InternalState WHERE Key = ?", (LAST_RUN_STATE_KEY,)).fetchone()
+    finally:
+        conn.close()
+    if row and time.time() - float(row[0]) < interval:
+        return False
+
+    def claim(conn):
+        now = time.time()
+        conn.execute("INSERT OR IGNORE INTO InternalState (Key, Value) VALUES (?, '0')", (LAST_RUN_STATE_KEY,))
+        cursor = conn.execute("""
+            UPDATE InternalState SET Value = ?
+            WHERE Key = ? AND CAST(Value AS REAL) <= ?
+        """, (str(now), LAST_RUN_STATE_KEY, now - interval))
+        return cursor.rowcount == 1
+
+    return run_write(claim)
+
+def _scheduler_loop(interval):
+    while True:
+        time.sleep(IDLE_CHECK_SECONDS)
+        with _activity_lock:
+            idle = _in_flight == 0 and time.monotonic() - _last_activity >= IDLE_SECONDS
+        if not idle:
+            continue
+        try:
+            if _claim_run(interval):
+                run_idle_maintenance()
+        except sqlite3.Error as e:
+            print(f"Scheduled maintenance failed: {e}")
+
+def start_scheduler(interval=None):
+    """Starts the idle maintenance thread for this process (once per process, also after fork)."""
+    global _scheduler_pid
+    interval = MAINTENANCE_INTERVAL_SECONDS if interval is None else interval
+    if not interval or _scheduler_pid == os.getpid():
+        return None
+    _scheduler_pid = os.getpid()
+    thread = threading.Thread(target=_scheduler_loop, args=(interval,), name="db-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+def init_app(app):
+    """Tracks request activity and starts the scheduler on the first request of each worker."""
+    app.config.setdefault('MAINTENANCE_INTERVAL', MAINTENANCE_INTERVAL_SECONDS)
+
+    @app.before_request
+    def _maintenance_request_started():
+        global _in_flight, _last_activity
+        with _activity_lock:
+            _in_flight += 1
+            _last_activity = time.monotonic()
+        if _scheduler_pid != os.getpid():
+            start_scheduler(app.config['MAINTENANCE_INTERVAL'])
+
+    @app.teardown_request
+    def _maintenance_request_finished(_exc):
+        global _in_flight, _last_activity
+        with _activity_lock:
+            _in_flight = max(0, _in_flight - 1)
+            _last_activity = time.monotonic()
+
+# --- CLI ---
+
+def _print_tables():
+    from show_tables import show_tables_with_data
+    show_tables_with_data()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintenance tasks for the classroom database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="rows and size per table and index")
+    sub.add_parser("pages", help="page, freelist and file size figures")
+    integrity = sub.add_parser("integrity", help="PRAGMA quick_check")
+    integrity.add_argument("--full", action="store_true", help="run the slower PRAGMA integrity_check")
+    sub.add_parser("analyze", help="rebuild planner statistics")
+    sub.add_parser("optimize", help="PRAGMA optimize")
+    ckpt = sub.add_parser("checkpoint", help="checkpoint the WAL")
+    ckpt.add_argument("--mode", default="PASSIVE", choices=("PASSIVE", "FULL", "RESTART", "TRUNCATE"))
+    vac = sub.add_parser("vacuum", help="return free pages to the OS")
+    vac.add_argument("--pages", type=int, help="incremental_vacuum at most this many pages")
+    vac.add_argument("--full", action="store_true", help="rewrite the whole file (blocks writers)")
+    vac.add_argument("--enable-incremental", action="store_true", help="switch to auto_vacuum=incremental")
+    sub.add_parser("idle", help="run the scheduler's tasks once now")
+    sub.add_parser("tables", help="print every table with its rows")
+    sub.add_parser("migrate", help="create missing tables and indexes, then run column migrations")
+    sub.add_parser("rebuild-views", help="refill BookingView from Bookings, Teachers and Classrooms")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "stats":
+        print(f"{'name':<40} {'type':<6} {'rows':>9} {'pages':>7} {'KiB':>9}")
+        for name, kind, rows, pages, size in table_stats():
+            print(f"{name:<40} {kind:<6} {'' if rows is None else rows:>9} {pages or '':>7} "
+                  f"{'' if size is None else round(size / 1024):>9}")
+    elif args.command == "pages":
+        for key, value in file_stats().items():
+            print(f"{key:<16} {value}")
+    elif args.command == "integrity":
+        result = integrity_check(args.full)
+        print("\n".join(result))
+        raise SystemExit(0 if result == ["ok"] else 1)
+    elif args.command == "analyze":
+        analyze()
+    elif args.command == "optimize":
+        optimize()
+    elif args.command == "checkpoint":
+        result = checkpoint(args.mode)
+        print("Not in WAL mode, nothing to checkpoint." if result is None
+              else f"busy={result[0]} wal_pages={result[1]} checkpointed={result[2]}")
+    elif args.command == "vacuum":
+        print(f"{vacuum(args.pages, args.full, args.enable_incremental)} pages freed")
+    elif args.command == "idle":
+        print(run_idle_maintenance())
+    elif args.command == "tables":
+        _print_tables()
+    elif args.command == "migrate":
+        from smart_scheduler import run_database_migrations
+        initialize_database()
+        run_database_migrations()
+    elif args.command == "rebuild-views":
+        print(f"{rebuild_views()} BookingView rows written")
+    print(f"{args.command} finished in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,208 @@
+# materials.py
+#
+# Material stock and loan tracking.
+#
+# A material request asks for one unit of a material from BorrowedDate to
+# ReturnedDate (both days included). Once approved it is a loan. The Materials
+# table (db_setup.py) holds the stock of each material; approving a request that
+# would put more units out than the stock on any of its days is refused.
+# A material is added to the table when it is first requested, without a stock:
+# nothing is refused for it until an admin counts the units and sets them with
+# set-stock.
+#
+# Approved loans are indexed by (MaterialName, BorrowedDate, ReturnedDate). Every
+# loan overlapping a date range started at most LongestLoanDays before the range,
+# so the loans of a range are one bounded index range search. The units out over
+# the range then come from a single sweep over the sorted loan endpoints: +1 on
+# the day a loan starts, -1 on the day after it is returned.
+#
+#   python materials.py list
+#   python materials.py set-stock Laptop 12
+#   python materials.py availability 2026-11-01 2026-11-30 [--material Laptop]
+#   python materials.py migrate [--force]    # stock every requested material
+
+import argparse
+from datetime import date, timedelta
+from itertools import groupby
+
+from db_setup import connect_db
+from queries import MATERIAL_LOANS_SQL
+from write_queue import run_write
+
+# InternalState key set once the requested materials have been stocked.
+MIGRATION_STATE_KEY = 'materials_migrated'
+
+# --- SWEEP ---
+
+def _day_after(day):
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+def sweep_loans(loans, start_date, end_date):
+    """
+    Units out over [start_date, end_date] as a step function: [(from, to, out)] with
+    consecutive, inclusive day ranges covering the whole range. `loans` are
+    (BorrowedDate, ReturnedDate) pairs in any order.
+    """
+    events = {}
+    for borrowed, returned in loans:
+        if borrowed > end_date or returned < start_date or returned < borrowed:
+            continue
+        first = max(borrowed, start_date)
+        events[first] = events.get(first, 0) + 1
+        if returned < end_date:
+            back = _day_after(returned)
+            events[back] = events.get(back, 0) - 1
+
+    steps, out, since = [], 0, start_date
+    for day in sorted(events):
+        if events[day] == 0:
+            continue
+        if day > since:
+            steps.append((since, (date.fromisoformat(day) - timedelta(days=1)).isoformat(), out))
+        out += events[day]
+        since = day
+    steps.append((since, end_date, out))
+    return steps
+
+def _loans(cursor, name, longest_loan_days, start_date, end_date):
+    earliest = (date.fromisoformat(start_date) - timedelta(days=longest_loan_days)).isoformat()
+    return cursor.execute(MATERIAL_LOANS_SQL, (name, earliest, end_date, start_date)).fetchall()
+
+def _material(cursor, name):
+    return cursor.execute("SELECT Name, Stock, LongestLoanDays FROM Materials WHERE Name = ?", (name,)).fetchone()
+
+# --- STOCK CHECKS (on the caller's write connection) ---
+
+def check_loan(cursor, request_id):
+    """
+    Checks whether a request can be approved without lending more units than are in
+    stock. Returns None when it can (or the material has no stock set), otherwise
+    (material, stock, most units already out on one of its days).
+    """
+    request = cursor.execute("""
+        SELECT MaterialName, BorrowedDate, ReturnedDate, Status FROM MaterialRequests WHERE RequestID = ?
+    """, (request_id,)).fetchone()
+    if request is None or request[3] == 'Approved':
+        return None
+    name, borrowed, returned, _status = request
+    material = _material(cursor, name)
+    if material is None or material[1] is None:
+        return None
+    material_name, stock, longest = material
+    peak = max(out for _from, _to, out in sweep_loans(_loans(cursor, name, longest, borrowed, returned),
+                                                       borrowed, returned))
+    if peak + 1 > stock:
+        return material_name, stock, peak
+    return None
+
+def track_material(cursor, name):
+    """
+    Adds a newly requested material to Materials without a stock, so it is listed for an
+    admin to count and its longest loan is kept from the start.
+    """
+    cursor.execute("INSERT OR IGNORE INTO Materials (Name) VALUES (?)", (name,))
+
+# --- AVAILABILITY ---
+
+def stock_over_time(start_date, end_date, material=None):
+    """
+    Units out and in stock per material over a date range: {Name: (stock, steps)}
+    with steps as returned by sweep_loans(). Only materials in the Materials table;
+    stock is None for those not counted yet.
+    """
+    conn = connect_db()
+    try:
+        if material:
+            materials = conn.execute("SELECT Name, Stock, LongestLoanDays FROM Materials WHERE Name = ?",
+                                     (material,)).fetchall()
+        else:
+            materials = conn.execute("SELECT Name, Stock, LongestLoanDays FROM Materials ORDER BY Name").fetchall()
+        return {name: (stock, sweep_loans(_loans(conn, name, longest, start_date, end_date), start_date, end_date))
+                for name, stock, longest in materials}
+    finally:
+        conn.close()
+
+def set_stock(name, stock):
+    """Sets the stock of a material, adding it (with its longest approved loan) when it is new."""
+    def update(conn):
+        conn.execute("""
+            INSERT INTO Materials (Name, Stock, LongestLoanDays)
+            SELECT ?, ?, COALESCE(MAX(CAST(julianday(ReturnedDate) - julianday(BorrowedDate) AS INTEGER)), 0)
+            FROM MaterialRequests WHERE MaterialName = ? COLLATE NOCASE AND Status = 'Approved'
+            ON CONFLICT (Name) DO UPDATE SET Stock = excluded.Stock
+        """, (name, stock, name))
+    run_write(update)
+
+# --- MIGRATION ---
+
+def migrate_material_stock(force=False):
+    """
+    Adds every requested material to Materials with its longest approved loan and no
+    stock; set the real counts with set-stock. Existing rows keep their stock. Runs
+    once unless force is set. Returns the number of materials tracked, or None if skipped.
+    """
+    def migrate(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT Value FROM InternalState WHERE Key = ?", (MIGRATION_STATE_KEY,))
+        if cursor.fetchone() and not force:
+            return None
+
+        # One pass over all approved loans, grouped by material in index order.
+        loans = cursor.execute("""
+            SELECT MaterialName, BorrowedDate, ReturnedDate FROM MaterialRequests
+            WHERE Status = 'Approved'
+            ORDER BY MaterialName COLLATE NOCASE, BorrowedDate
+        """)
+        for _key, rows in groupby(loans.fetchall(), key=lambda row: row[0].lower()):
+            rows = list(rows)
+            longest = max((date.fromisoformat(returned) - date.fromisoformat(borrowed)).days
+                          for _name, borrowed, returned in rows)
+            cursor.execute("""
+                INSERT INTO Materials (Name, LongestLoanDays) VALUES (?, ?)
+                ON CONFLICT (Name) DO UPDATE SET LongestLoanDays = MAX(LongestLoanDays, excluded.LongestLoanDays)
+            """, (rows[0][0], longest))
+        # Requested but never lent.
+        cursor.execute("""
+            INSERT OR IGNORE INTO Materials (Name)
+            SELECT DISTINCT MaterialName FROM MaterialRequests
+        """)
+        cursor.execute("INSERT OR REPLACE INTO InternalState (Key, Value) VALUES (?, '1')", (MIGRATION_STATE_KEY,))
+        return cursor.execute("SELECT COUNT(*) FROM Materials").fetchone()[0]
+
+    return run_write(migrate)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Material stock and loans.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="materials and their stock")
+    stock = sub.add_parser("set-stock", help="set the number of units of a material")
+    stock.add_argument("name")
+    stock.add_argument("stock", type=int)
+    avail = sub.add_parser("availability", help="units out and free per day range")
+    avail.add_argument("start_date")
+    avail.add_argument("end_date")
+    avail.add_argument("--material")
+    mig = sub.add_parser("migrate", help="add every requested material to the stock table")
+    mig.add_argument("--force", action="store_true", help="run again even if done before")
+    args = parser.parse_args()
+
+    if args.command == "set-stock":
+        set_stock(args.name, args.stock)
+    elif args.command == "availability":
+        for name, (units, steps) in stock_over_time(args.start_date, args.end_date, args.material).items():
+            print(name)
+            for first, last, out in steps:
+                free = "stock not set" if units is None else f"{units - out:>3} of {units} free"
+                print(f"  {first} .. {last}   {out:>3} out   {free}")
+    elif args.command == "migrate":
+        result = migrate_material_stock(args.force)
+        print("Already migrated (use --force to run again)." if result is None
+              else f"{result} materials tracked.")
+    if args.command in ("list", "set-stock"):
+        conn = connect_db()
+        try:
+            for name, units, longest in conn.execute(
+                    "SELECT Name, Stock, LongestLoanDays FROM Materials ORDER BY Name"):
+                print(f"{name:<32} stock {'-' if units is None else units:>3}   longest loan {longest} days")
+        finally:
+            conn.close()
@@ -0,0 +1,342 @@
+# metrics.py
+#
+# Prometheus-style metrics without external dependencies.
+#
+# Hot-path updates never take a lock: every thread writes to its own shard
+# (a plain dict), and a scrape merges the shards. Shards of threads that have
+# exited are folded into one retired total (on the next new thread or scrape),
+# so thread-per-request servers do not pile up shards. Under gunicorn, set
+# SMART_CLASSROOM_METRICS_DIR to a directory shared by the workers; each worker
+# then dumps its merged values to <dir>/metrics_<pid>.json at most once per
+# FLUSH_INTERVAL_SECONDS, and /metrics sums the files of all workers.
+#
+# Exposed at GET /metrics in the text exposition format (version 0.0.4). Set
+# SMART_CLASSROOM_METRICS_TOKEN and scrape with "Authorization: Bearer <token>";
+# without a token only scrapes from the local machine are answered.
+#
+# There is no connection pool: connect_db() opens a connection per call
+# (db_connections_opened_total). The one long-lived connection is the write
+# queue's, and every write it runs is counted in db_connection_reuses_total.
+
+import atexit
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+
+# --- CONFIGURATION ---
+
+MULTIPROC_DIR = os.environ.get("SMART_CLASSROOM_METRICS_DIR")
+METRICS_TOKEN = os.environ.get("SMART_CLASSROOM_METRICS_TOKEN")
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+FLUSH_INTERVAL_SECONDS = 1.0
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# --- PER-THREAD SHARDS ---
+
+_registry = {}       # metric name -> metric object, in definition order
+_shards = []         # (thread, shard dict) for every live thread that has recorded anything
+_retired = {}        # merged values of threads that have exited
+_shards_lock = threading.Lock()  # taken once per thread and per scrape, never per update
+_local = threading.local()
+_last_flush = 0.0
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _fold_dead_shards()
+            _shards.append((threading.current_thread(), shard))
+        return shard
+
+def _fold_dead_shards():
+    """Merges the shards of exited threads into _retired (the caller holds _shards_lock)."""
+    live = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            live.append((thread, shard))
+        else:
+            for key, value in shard.items():
+                _merge_into(_retired, key, value)
+    _shards[:] = live
+
+def _reset_after_fork():
+    """Forked gunicorn workers must not report the master's values as their own."""
+    global _shards, _retired, _shards_lock, _local, _last_flush
+    _shards = []
+    _retired = {}
+    _shards_lock = threading.Lock()
+    _local = threading.local()
+    _last_flush = 0.0
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+# --- METRIC TYPES ---
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry[name] = self
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return (self.name, tuple(str(value) for value in labelvalues))
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        shard = _shard()
+        key = self._key(labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """A gauge that is only ever moved up and down, so worker values can be summed."""
+    kind = "gauge"
+
+    def inc(self, *labelvalues, amount=1):
+        shard = _shard()
+        key = self._key(labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        shard = _shard()
+        key = self._key(labelvalues)
+        # [count per bucket ..., count above the last bucket, sum]
+        slots = shard.get(key)
+        if slots is None:
+            slots = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        slots[bisect.bisect_left(self.buckets, value)] += 1
+        slots[-1] += value
+
+# --- APPLICATION METRICS ---
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds",
+                            "Request latency per Flask endpoint.", ("endpoint", "method"))
+REQUESTS = Counter("http_requests_total", "Requests per endpoint and status code.",
+                   ("endpoint", "method", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+DB_CONNECTIONS = Counter("db_connections_opened_total", "SQLite connections opened by connect_db().")
+DB_CONNECTION_REUSES = Counter("db_connection_reuses_total",
+                               "Writes run on the write queue's open connection instead of a new one.")
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed (requires SQL tracing).", ("endpoint",))
+DB_REQUEST_TIME = Histogram("db_request_time_seconds",
+                            "Database time per request (requires SQL tracing).", ("endpoint",),
+                            buckets=DB_BUCKETS)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result (hit/miss).",
+                        ("cache", "result"))
+BOOKING_SUBMISSIONS = Counter("booking_submissions_total", "Booking requests submitted.", ("source",))
+BOOKING_CONFLICTS = Counter("booking_conflicts_total", "Booking requests rejected because the slot was taken.",
+                            ("source",))
+UPLOAD_BYTES = Counter("upload_bytes_total", "Bytes received in file uploads.", ("kind",))
+SNAPSHOT_REFRESHES = Counter("snapshot_refreshes_total", "Report snapshot refreshes taken with the backup API.")
+WRITE_BATCH_SIZE = Histogram("db_write_batch_size", "Operations per group commit (queued write mode).",
+                             buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+PURGED_ROWS = Counter("purged_rows_total", "Rows removed by the deleted-teacher purge.", ("table",))
+NOTIFICATIONS = Counter("notifications_total", "Outbox messages handed to a transport, by result.",
+                        ("channel", "result"))
+WRITE_WAIT = Histogram("db_write_wait_seconds", "Time from queuing a write until its batch committed.",
+                       buckets=DB_BUCKETS)
+
+def record_cache(cache, hit):
+    """Convenience for caches: counts one lookup as a hit or a miss."""
+    CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss")
+
+# --- AGGREGATION ---
+
+def _merge_into(totals, key, value):
+    if isinstance(value, list):
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+def snapshot():
+    """Merges this process's thread shards into one {(name, labels): value} dict."""
+    totals = {}
+    with _shards_lock:
+        _fold_dead_shards()
+        for key, value in _retired.items():
+            _merge_into(totals, key, value)
+        shards = [shard for _thread, shard in _shards]
+    for shard in shards:
+        for key, value in dict(shard).items():
+            _merge_into(totals, key, value)
+    return totals
+
+def _worker_file(pid=None):
+    return os.path.join(MULTIPROC_DIR, f"metrics_{pid or os.getpid()}.json")
+
+def flush(force=False):
+    """Writes this worker's values to the multiprocess directory (rate-limited)."""
+    global _last_flush
+    if not MULTIPROC_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL_SECONDS:
+        return
+    _last_flush = now
+    data = [[name, list(labels), value] for (name, labels), value in snapshot().items()]
+    path = _worker_file()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def mark_process_dead(pid):
+    """Called from gunicorn's child_exit hook: keeps counters, drops gauges of a dead worker."""
+    if not MULTIPROC_DIR:
+        return
+    path = _worker_file(pid)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    data = [entry for entry in data if getattr(_registry.get(entry[0]), "kind", None) != "gauge"]
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+def collect():
+    """Returns the values of every worker (or just this process) merged together."""
+    totals = snapshot()
+    if not MULTIPROC_DIR:
+        return totals
+    own = os.path.basename(_worker_file())
+    for filename in os.listdir(MULTIPROC_DIR):
+        if not filename.startswith("metrics_") or not filename.endswith(".json") or filename == own:
+            continue
+        try:
+            with open(os.path.join(MULTIPROC_DIR, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # a worker is rewriting its file; it will be picked up next scrape
+        for name, labels, value in data:
+            _merge_into(totals, (name, tuple(labels)), value)
+    return totals
+
+# --- EXPOSITION ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    """Renders all metrics in the Prometheus text format."""
+    totals = collect()
+    by_metric = {}
+    for (name, labels), value in totals.items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        samples = sorted(by_metric.get(name, []))
+        if not samples and not metric.labelnames and metric.kind != "histogram":
+            lines.append(f"{name} 0")
+        for labels, value in samples:
+            if metric.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                    cumulative += count
+                    le = _format_labels(metric.labelnames, labels, [("le", _format_value(bound))])
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                label_str = _format_labels(metric.labelnames, labels)
+                lines.append(f"{name}_sum{label_str} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{label_str} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# --- FLASK INTEGRATION ---
+
+def init_app(app):
+    """
+    Registers request instrumentation and the /metrics endpoint.
+    Must be called after sql_trace.init_app(), so that this after_request hook
+    runs first and can still read the request's SQL stats.
+    """
+    from flask import Response, g, request
+    import sql_trace
+
+    app.config.setdefault('METRICS_TOKEN', METRICS_TOKEN)
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_start = time.perf_counter()
+        g._metrics_status = 500
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def _metrics_response(response):
+        g._metrics_status = response.status_code
+        stats = sql_trace.current_stats()
+        if stats is not None:
+            endpoint = request.endpoint or "unmatched"
+            DB_QUERIES.inc(endpoint, amount=stats.queries)
+            DB_REQUEST_TIME.observe(stats.db_seconds, endpoint)
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(_exc):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return
+        endpoint = request.endpoint or "unmatched"
+        IN_FLIGHT.dec()
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint, request.method)
+        REQUESTS.inc(endpoint, request.method, g.pop("_metrics_status", 500))
+        flush()
+
+    def metrics_view():
+        expected = app.config.get('METRICS_TOKEN')
+        if expected:
+            supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            allowed = hmac.compare_digest(supplied, expected)
+        else:
+            allowed = request.remote_addr in LOCAL_ADDRESSES
+        if not allowed:
+            return Response("Forbidden\n", status=403, mimetype="text/plain")
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    atexit.register(flush, True)
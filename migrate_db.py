@@ -1,12 +1,13 @@
 # migrate_db.py (Complete schema fix for Teachers table)
 
 import sqlite3
-DATABASE_NAME = 'smart_classroom.db'
+from config import get_db_path
+from db_setup import connect_db
 
-conn = sqlite3.connect(DATABASE_NAME)
+conn = connect_db()
 cursor = conn.cursor()
 
-print(f"Connecting to {DATABASE_NAME} to update Teachers table...")
+print(f"Connecting to {get_db_path()} to update Teachers table...")
 
 # Helper function to execute ALTER TABLE safely
 def add_column_if_not_exists(column_name, definition):
@@ -0,0 +1,340 @@
+# notifications.py
+#
+# SMS and email notifications through a transactional outbox.
+#
+# Status changes call notify_booking_status() / notify_material_status() with the
+# connection of their own write, so the message row in NotificationOutbox commits
+# (or rolls back) together with the change it reports. A dispatcher thread in each
+# worker claims due messages, hands them to the channel's transport in batches and
+# records the outcome; failures are retried with exponential backoff up to
+# MAX_ATTEMPTS, and each channel is held to a per-minute rate limit shared by all
+# workers (counted from the outbox itself).
+#
+#   python notifications.py status
+#   python notifications.py dispatch            # send what is due now, from the shell
+#   python notifications.py retry               # put failed messages back in the queue
+#
+# Transports are chosen per channel with SMART_CLASSROOM_SMS_TRANSPORT and
+# SMART_CLASSROOM_EMAIL_TRANSPORT:
+#   console         print the message (default, nothing leaves the machine)
+#   file            append it as a JSON line to SMART_CLASSROOM_NOTIFICATION_LOG
+#   africastalking  SMS via Africa's Talking (AFRICASTALKING_USERNAME, AFRICASTALKING_API_KEY,
+#                   optional AFRICASTALKING_SENDER_ID)
+#   flask_mail      email via Flask-Mail, configured with the usual MAIL_* app settings
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import metrics
+from config import PROJECT_DIR
+from db_setup import connect_db, record_type
+
+# --- CONFIGURATION ---
+
+SMS_TRANSPORT = os.environ.get("SMART_CLASSROOM_SMS_TRANSPORT", "console")
+EMAIL_TRANSPORT = os.environ.get("SMART_CLASSROOM_EMAIL_TRANSPORT", "console")
+NOTIFICATION_LOG = os.environ.get("SMART_CLASSROOM_NOTIFICATION_LOG", os.path.join(PROJECT_DIR, "notifications.log"))
+
+# Messages per channel and minute, across all workers.
+RATE_LIMITS = {
+    'sms': int(os.environ.get("SMART_CLASSROOM_SMS_PER_MINUTE", 60)),
+    'email': int(os.environ.get("SMART_CLASSROOM_EMAIL_PER_MINUTE", 120)),
+}
+
+# Messages claimed per channel per round, and how long a claim lasts before another
+# worker may take the message over (a worker that died mid-send).
+DISPATCH_BATCH_SIZE = 50
+CLAIM_SECONDS = 120
+
+# Retry after RETRY_BASE_SECONDS * 2**attempts; give up after MAX_ATTEMPTS.
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+
+# The dispatcher wakes up at least this often, and at once after notify_*() + wake().
+DISPATCH_INTERVAL_SECONDS = int(os.environ.get("SMART_CLASSROOM_DISPATCH_INTERVAL", 10))  # 0 disables
+
+# Local numbers (07...) are sent in international format with this prefix.
+SMS_COUNTRY_CODE = os.environ.get("SMART_CLASSROOM_SMS_COUNTRY_CODE", "+250")
+
+# Sent messages are deleted after this many days by the idle maintenance.
+SENT_RETENTION_DAYS = 30
+
+Notification = record_type('Notification', ('OutboxID', 'Channel', 'Recipient', 'Subject', 'Body', 'Attempts'))
+
+_app = None
+_wake = threading.Event()
+_dispatcher_pid = None
+
+# --- ENQUEUE (inside the caller's transaction) ---
+
+def _international(phone):
+    phone = (phone or "").replace(" ", "")
+    if phone.startswith("0"):
+        return SMS_COUNTRY_CODE + phone[1:]
+    return phone
+
+def enqueue(conn, channel, recipient, body, subject=None):
+    """Adds one message to the outbox on the caller's connection. Skips empty recipients."""
+    if channel == 'sms':
+        recipient = _international(recipient)
+    if not recipient:
+        return None
+    cursor = conn.execute("""
+        INSERT INTO NotificationOutbox (Channel, Recipient, Subject, Body) VALUES (?, ?, ?, ?)
+    """, (channel, recipient, subject, body))
+    return cursor.lastrowid
+
+def notify_booking_status(conn, booking_id, status):
+    """Queues an SMS (and an email when the teacher has one) about a booking decision."""
+    row = conn.execute("""
+        SELECT B.Date, B.StartTime, B.EndTime, B.RoomName, T.Name, T.Phone, T.Email
+        FROM BookingView B
+        JOIN Teachers T ON B.TeacherID = T.TeacherID
+        WHERE B.BookingID = ?
+    """, (booking_id,)).fetchone()
+    if not row:
+        return
+    booking_date, start, end, room, name, phone, email = row
+    text = (f"Hello {name}, your booking of {room} on {booking_date} from {start} to {end} "
+            f"has been {status.lower()}. - Smart Classroom")
+    enqueue(conn, 'sms', phone, text)
+    enqueue(conn, 'email', email, text, subject=f"Booking #{booking_id} {status.lower()}")
+
+def notify_material_status(conn, request_id, status):
+    """Queues an SMS to the borrower about a material request decision."""
+    row = conn.execute("""
+        SELECT FullName, PhoneNumber, MaterialName, BorrowedDate FROM MaterialRequests WHERE RequestID = ?
+    """, (request_id,)).fetchone()
+    if not row:
+        return
+    name, phone, material, borrowed = row
+    enqueue(conn, 'sms', phone, f"Hello {name}, your request to borrow {material} from {borrowed} "
+                                f"has been {status.lower()}. - Smart Classroom")
+
+# --- TRANSPORTS ---
+# A transport takes a list of Notification records of one channel and returns
+# {OutboxID: None on success, or an error message}. Raising fails the whole batch.
+
+def _send_console(messages):
+    for message in messages:
+        subject = f"{message.Subject}: " if message.Subject else ""
+        print(f"[{message.Channel} -> {message.Recipient}] {subject}{message.Body}")
+    return {message.OutboxID: None for message in messages}
+
+def _send_file(messages):
+    with open(NOTIFICATION_LOG, "a", encoding="utf-8") as log:
+        for message in messages:
+            log.write(json.dumps(dict(message, LoggedAt=datetime.now().isoformat(timespec='seconds'))) + "\n")
+    return {message.OutboxID: None for message in messages}
+
+def _send_africastalking(messages):
+    import africastalking  # optional: only needed when SMS really goes out
+    africastalking.initialize(os.environ["AFRICASTALKING_USERNAME"], os.environ["AFRICASTALKING_API_KEY"])
+    sender_id = os.environ.get("AFRICASTALKING_SENDER_ID")
+    results = {}
+    # One API call per distinct text, with all of its recipients.
+    by_body = defaultdict(list)
+    for message in messages:
+        by_body[message.Body].append(message)
+    for body, group in by_body.items():
+        response = africastalking.SMS.send(body, [message.Recipient for message in group], sender_id)
+        statuses = {r['number']: r['status'] for r in response['SMSMessageData']['Recipients']}
+        for message in group:
+            status = statuses.get(message.Recipient, "No status returned")
+            results[message.OutboxID] = None if status == "Success" else status
+    return results
+
+def _send_flask_mail(messages):
+    from flask_mail import Mail, Message  # optional: only needed when email really goes out
+    if _app is None:
+        raise RuntimeError("The flask_mail transport needs notifications.init_app(app).")
+    results = {}
+    with _app.app_context():
+        mail = _app.extensions.get('mail') or Mail(_app)
+        with mail.connect() as smtp:  # one SMTP session per batch
+            for message in messages:
+                try:
+                    smtp.send(Message(message.Subject or "Smart Classroom", recipients=[message.Recipient],
+                                      body=message.Body))
+                    results[message.OutboxID] = None
+                except Exception as e:
+                    results[message.OutboxID] = str(e)
+    return results
+
+TRANSPORTS = {
+    'console': _send_console,
+    'file': _send_file,
+    'africastalking': _send_africastalking,
+    'flask_mail': _send_flask_mail,
+}
+
+def transport_for(channel):
+    """Returns the transport function configured for a channel."""
+    name = SMS_TRANSPORT if channel == 'sms' else EMAIL_TRANSPORT
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown {channel} transport: {name}")
+    return TRANSPORTS[name]
+
+# --- DISPATCH ---
+
+def _claim(conn, channel, limit):
+    """Claims up to `limit` due messages of a channel, within its per-minute rate limit."""
+    in_use = conn.execute("""
+        SELECT COUNT(*) FROM NotificationOutbox
+        WHERE Channel = ? AND (SentAt >= datetime('now', '-60 seconds')
+                               OR (Status = 'Sending' AND NextAttemptAt > datetime('now')))
+    """, (channel,)).fetchone()[0]
+    limit = min(limit, RATE_LIMITS.get(channel, limit) - in_use)
+    if limit <= 0:
+        return []
+    # 'Sending' rows whose claim ran out belong to a worker that stopped; they are due again.
+    return conn.execute(f"""
+        UPDATE NotificationOutbox
+        SET Status = 'Sending', NextAttemptAt = datetime('now', '+{CLAIM_SECONDS} seconds')
+        WHERE OutboxID IN (
+            SELECT OutboxID FROM NotificationOutbox
+            WHERE Status IN ('Pending', 'Sending') AND NextAttemptAt <= datetime('now') AND Channel = ?
+            ORDER BY OutboxID
+            LIMIT ?
+        )
+        RETURNING OutboxID, Channel, Recipient, Subject, Body, Attempts
+    """, (channel, limit)).fetchall()
+
+def _record(conn, results, attempts):
+    for outbox_id, error in results.items():
+        if error is None:
+            conn.execute("""
+                UPDATE NotificationOutbox
+                SET Status = 'Sent', SentAt = datetime('now'), Attempts = Attempts + 1, LastError = NULL
+                WHERE OutboxID = ?
+            """, (outbox_id,))
+        else:
+            tries = attempts[outbox_id] + 1
+            conn.execute(f"""
+                UPDATE NotificationOutbox
+                SET Status = ?, Attempts = ?, LastError = ?,
+                    NextAttemptAt = datetime('now', '+{RETRY_BASE_SECONDS * 2 ** (tries - 1)} seconds')
+                WHERE OutboxID = ?
+            """, ('Failed' if tries >= MAX_ATTEMPTS else 'Pending', tries, str(error)[:500], outbox_id))
+
+def dispatch_once(batch_size=DISPATCH_BATCH_SIZE):
+    """Sends one batch per channel. Returns {channel: (sent, failed)}."""
+    from write_queue import run_write  # local import, as in maintenance._claim_run
+
+    done = {}
+    for channel in RATE_LIMITS:
+        messages = [Notification._make(row) for row in run_write(_claim, channel, batch_size)]
+        if not messages:
+            continue
+        try:
+            results = transport_for(channel)(messages)
+        except Exception as e:
+            results = {message.OutboxID: f"{type(e).__name__}: {e}" for message in messages}
+        # A transport that forgot a message did not deliver it.
+        results = {message.OutboxID: results.get(message.OutboxID, "No result from transport")
+                   for message in messages}
+        run_write(_record, results, {message.OutboxID: message.Attempts for message in messages})
+
+        failed = sum(1 for error in results.values() if error is not None)
+        metrics.NOTIFICATIONS.inc(channel, "sent", amount=len(results) - failed)
+        if failed:
+            metrics.NOTIFICATIONS.inc(channel, "failed", amount=failed)
+        done[channel] = (len(results) - failed, failed)
+    return done
+
+def prune_sent(days=SENT_RETENTION_DAYS):
+    """Deletes messages sent more than `days` ago. Returns the number deleted."""
+    from write_queue import run_write
+
+    def prune(conn):
+        return conn.execute("""
+            DELETE FROM NotificationOutbox WHERE Status = 'Sent' AND SentAt < datetime('now', ?)
+        """, (f"-{int(days)} days",)).rowcount
+
+    return run_write(prune)
+
+def outbox_status():
+    """Returns (Channel, Status, count, oldest CreatedAt) for every group in the outbox."""
+    conn = connect_db()
+    try:
+        return conn.execute("""
+            SELECT Channel, Status, COUNT(*), MIN(CreatedAt) FROM NotificationOutbox GROUP BY Channel, Status
+        """).fetchall()
+    finally:
+        conn.close()
+
+def retry_failed():
+    """Puts messages that ran out of attempts back in the queue. Returns how many."""
+    from write_queue import run_write
+
+    def retry(conn):
+        return conn.execute("""
+            UPDATE NotificationOutbox SET Status = 'Pending', Attempts = 0, NextAttemptAt = datetime('now')
+            WHERE Status = 'Failed'
+        """).rowcount
+
+    return run_write(retry)
+
+# --- DISPATCHER THREAD ---
+
+def wake():
+    """Lets this worker's dispatcher send right away instead of at its next interval."""
+    _wake.set()
+
+def _dispatcher_loop(interval):
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        try:
+            while any(sent + failed for sent, failed in dispatch_once().values()):
+                pass  # until nothing more is due (or the rate limits are reached)
+        except sqlite3.Error as e:
+            print(f"Notification dispatch failed, retrying later: {e}")
+
+def start_dispatcher(interval=None):
+    """Starts the dispatcher thread for this process (once per process, also after fork)."""
+    global _dispatcher_pid
+    interval = DISPATCH_INTERVAL_SECONDS if interval is None else interval
+    if not interval or _dispatcher_pid == os.getpid():
+        return None
+    _dispatcher_pid = os.getpid()
+    thread = threading.Thread(target=_dispatcher_loop, args=(interval,), name="notification-dispatch", daemon=True)
+    thread.start()
+    return thread
+
+def init_app(app):
+    """Keeps the app for the Flask-Mail transport and starts the dispatcher on each worker's first request."""
+    global _app
+    _app = app
+    app.config.setdefault('NOTIFICATION_DISPATCH_INTERVAL', DISPATCH_INTERVAL_SECONDS)
+
+    @app.before_request
+    def _notifications_start_dispatcher():
+        if _dispatcher_pid != os.getpid():
+            start_dispatcher(app.config['NOTIFICATION_DISPATCH_INTERVAL'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect and drive the SMS/email notification outbox.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="messages per channel and status")
+    sub.add_parser("dispatch", help="send everything that is due now")
+    sub.add_parser("retry", help="queue failed messages again")
+    args = parser.parse_args()
+
+    if args.command == "dispatch":
+        while True:
+            done = dispatch_once()
+            for channel, (sent, failed) in done.items():
+                print(f"{channel}: {sent} sent, {failed} failed")
+            if not any(sent + failed for sent, failed in done.values()):
+                break
+    elif args.command == "retry":
+        print(f"{retry_failed()} failed messages queued again")
+    else:
+        for channel, status, count, oldest in outbox_status():
+            print(f"{channel:<6} {status:<8} {count:>6}  oldest {oldest}")
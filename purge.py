@@ -0,0 +1,136 @@
+# purge.py
+#
+# Background removal of soft-deleted teachers.
+#
+#   python purge.py            # purge every soft-deleted teacher, printing progress
+#   python purge.py --status   # show what is still waiting to be purged
+#
+# delete_teacher_by_id() only flags the account (Teachers.DeletedAt), which is one
+# short write. Their bookings are then removed here in batches of PURGE_BATCH_SIZE
+# rows, each batch its own short transaction through run_write(), so booking
+# submissions are never stuck behind one huge DELETE. Archived bookings and their
+# BookingArchiveStats rows go too, so the hot table, the archive and the report
+# aggregates stay consistent; the teacher row is removed last, together with the
+# aggregates. An interrupted purge simply resumes on the next run.
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from archive import archive_path
+from config import is_memory_database
+from db_setup import connect_db
+from write_queue import run_write
+
+# --- CONFIGURATION ---
+
+PURGE_BATCH_SIZE = 200
+PURGE_BATCH_SLEEP_SECONDS = 0.01
+
+_purge_lock = threading.Lock()
+
+# --- BATCHES ---
+
+def _delete_booking_batch(conn, teacher_id, batch_size):
+    cursor = conn.execute("""
+        DELETE FROM Bookings WHERE BookingID IN (
+            SELECT BookingID FROM Bookings WHERE TeacherID = ? LIMIT ?
+        )
+    """, (teacher_id, batch_size))
+    return cursor.rowcount
+
+def _delete_teacher_row(conn, teacher_id):
+    # Last step: only once no live bookings are left, and together with the aggregates.
+    if conn.execute("SELECT 1 FROM Bookings WHERE TeacherID = ? LIMIT 1", (teacher_id,)).fetchone():
+        return False
+    conn.execute("DELETE FROM BookingArchiveStats WHERE TeacherID = ?", (teacher_id,))
+    conn.execute("DELETE FROM Teachers WHERE TeacherID = ? AND DeletedAt IS NOT NULL", (teacher_id,))
+    return True
+
+def _purge_archive(teacher_id, batch_size, sleep):
+    path = archive_path()
+    if is_memory_database() or not os.path.exists(path):
+        return 0
+    removed = 0
+    conn = sqlite3.connect(path)
+    try:
+        while True:
+            with conn:
+                count = _delete_booking_batch(conn, teacher_id, batch_size)
+            if not count:
+                return removed
+            removed += count
+            metrics.PURGED_ROWS.inc("archive.Bookings", amount=count)
+            time.sleep(sleep)
+    finally:
+        conn.close()
+
+def purge_teacher(teacher_id, batch_size=PURGE_BATCH_SIZE, sleep=PURGE_BATCH_SLEEP_SECONDS, progress=None):
+    """Removes one soft-deleted teacher and everything that belongs to them. Returns the bookings removed."""
+    removed = _purge_archive(teacher_id, batch_size, sleep)
+    while True:
+        count = run_write(_delete_booking_batch, teacher_id, batch_size)
+        if not count:
+            break
+        removed += count
+        metrics.PURGED_ROWS.inc("Bookings", amount=count)
+        if progress:
+            progress(teacher_id, removed)
+        time.sleep(sleep)
+    if run_write(_delete_teacher_row, teacher_id):
+        metrics.PURGED_ROWS.inc("Teachers")
+    return removed
+
+def pending_purges():
+    """Returns (TeacherID, Name, DeletedAt, live bookings left) for every soft-deleted teacher."""
+    conn = connect_db()
+    try:
+        return conn.execute("""
+            SELECT T.TeacherID, T.Name, T.DeletedAt,
+                   (SELECT COUNT(*) FROM Bookings B WHERE B.TeacherID = T.TeacherID)
+            FROM Teachers T
+            WHERE T.DeletedAt IS NOT NULL
+            ORDER BY T.DeletedAt
+        """).fetchall()
+    finally:
+        conn.close()
+
+def purge_deleted_teachers(batch_size=PURGE_BATCH_SIZE, sleep=PURGE_BATCH_SLEEP_SECONDS, progress=None):
+    """Purges every soft-deleted teacher. Returns {teacher_id: bookings removed}; {} if a purge is already running."""
+    if not _purge_lock.acquire(blocking=False):
+        return {}
+    try:
+        return {teacher_id: purge_teacher(teacher_id, batch_size, sleep, progress)
+                for teacher_id, _name, _deleted_at, _left in pending_purges()}
+    finally:
+        _purge_lock.release()
+
+def start_purge_thread():
+    """Runs purge_deleted_teachers() in the background (used right after a soft delete)."""
+    def run():
+        try:
+            purge_deleted_teachers()
+        except sqlite3.Error as e:
+            print(f"Teacher purge failed, it will resume on the next run: {e}")
+
+    thread = threading.Thread(target=run, name="teacher-purge", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Purge soft-deleted teachers and their bookings in small batches.")
+    parser.add_argument("--status", action="store_true", help="only list teachers waiting to be purged")
+    parser.add_argument("--batch", type=int, default=PURGE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.status:
+        for teacher_id, name, deleted_at, left in pending_purges():
+            print(f"{teacher_id:>6}  {name:<30} deleted {deleted_at}  {left} bookings left")
+    else:
+        results = purge_deleted_teachers(args.batch, progress=lambda teacher_id, removed:
+                                         print(f"  teacher {teacher_id}: {removed} bookings removed"))
+        for teacher_id, removed in results.items():
+            print(f"Purged teacher {teacher_id} ({removed} bookings)")
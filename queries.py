@@ -0,0 +1,291 @@
+# queries.py
+#
+# Registry of the application's hot queries, and a query-plan guard for them.
+#
+# Every query on a request path that has to stay fast is defined here once, with
+# sample parameters, and imported by the code that runs it. The check mode seeds
+# a throwaway database, runs EXPLAIN QUERY PLAN for every registered query and
+# fails when one would SCAN a large table instead of searching an index:
+#
+#   python queries.py --check [--bookings 20000] [--verbose]
+#
+# Queries that must read everything by nature (report aggregates, substring
+# search) are registered with allow_scan=True so their plans are still printed.
+# Queries built from optional filters use {placeholders}; sample_format fills
+# them with the most common variant for the check.
+
+import argparse
+import re
+import sys
+from collections import namedtuple
+
+HotQuery = namedtuple("HotQuery", "name sql sample_params sample_format allow_scan")
+
+HOT_QUERIES = {}
+
+# Tables that grow with use; a full SCAN of these fails the check.
+LARGE_TABLES = {'Bookings', 'BookingView', 'BookingEquipment', 'MaterialRequests', 'ChangeLog'}
+
+def hot_query(name, sql, sample_params=(), sample_format=None, allow_scan=False):
+    """Registers a query under `name` and returns its SQL for the caller to use."""
+    HOT_QUERIES[name] = HotQuery(name, sql, tuple(sample_params), sample_format or {}, allow_scan)
+    return sql
+
+# --- BOOKINGS ---
+# Booking list pages read BookingView (see db_setup.py), which already carries the
+# teacher and room names, so each page is one index range scan with no joins.
+
+AVAILABILITY_SQL = hot_query('availability', """
+    SELECT COUNT(*) FROM Bookings
+    WHERE RoomID = ?
+      AND Date = ?
+      AND Status IN ('Pending', 'Approved')
+      AND (
+          (StartTime < ? AND EndTime > ?)
+      )
+""", (1, '2026-03-02', '09:40', '09:00'))
+
+# Unexpired holds of other teachers overlapping a slot (see slot_holds.py).
+HOLD_CONFLICT_SQL = hot_query('hold_conflict', """
+    SELECT COUNT(*) FROM SlotHolds
+    WHERE RoomID = ?
+      AND Date = ?
+      AND StartTime < ? AND EndTime > ?
+      AND ExpiresAt > ?
+      AND TeacherID <> ?
+""", (1, '2026-03-02', '09:40', '09:00', 1790000000.0, 7))
+
+# Units of a pool item reserved by active bookings overlapping a slot (see equipment.py).
+EQUIPMENT_RESERVED_SQL = hot_query('equipment_reserved', """
+    SELECT COALESCE(SUM(Quantity), 0) FROM BookingEquipment
+    WHERE EquipmentID = ?
+      AND Date = ?
+      AND StartTime < ? AND EndTime > ?
+      AND Active = 1
+""", (1, '2026-03-02', '09:40', '09:00'))
+
+PENDING_QUEUE_SQL = hot_query('pending_queue', """
+    SELECT BookingID, TeacherName AS Teacher, RoomName AS Room, Date, StartTime, Equipment
+    FROM BookingView
+    WHERE Status = 'Pending'
+    ORDER BY Date, StartTime
+""")
+
+APPROVED_BOOKINGS_SQL = hot_query('approved_bookings', """
+    SELECT BookingID, TeacherName, RoomName, Date, StartTime, EndTime
+    FROM BookingView
+    WHERE Status = 'Approved'
+    ORDER BY Date ASC, StartTime ASC
+""")
+
+# {table} is main.Bookings or archive.Bookings, {direction} ASC (upcoming) or DESC.
+TEACHER_HISTORY_SQL = hot_query('teacher_history', """
+    SELECT B.BookingID, B.RoomID, B.Date, B.StartTime, B.EndTime, B.Status, B.Equipment
+    FROM {table} B
+    WHERE {where}
+    ORDER BY B.Date {direction}, B.StartTime {direction}, B.BookingID {direction}
+    LIMIT ?
+""", (1, '2026-10-19', '2026-05-04', '09:00', 120, 21), {
+    'table': 'main.Bookings', 'direction': 'DESC',
+    'where': "B.TeacherID = ? AND B.Date < ? AND (B.Date, B.StartTime, B.BookingID) < (?, ?, ?)",
+})
+
+ALL_REQUESTS_PAGE_SQL = hot_query('all_requests_page', """
+    SELECT
+        B.BookingID, B.Date, B.StartTime, B.EndTime, B.Equipment, B.Status,
+        B.TeacherName, B.Subject,
+        B.RoomName AS ClassroomName
+    FROM BookingView B
+    {where}
+    ORDER BY B.Date DESC, B.StartTime DESC
+    LIMIT ? OFFSET ?
+""", ('2026-01-01', 51, 0), {'where': "WHERE B.Date >= ?"})
+
+# manage_bookings and manage_teacherbook
+MANAGE_BOOKINGS_PAGE_SQL = hot_query('manage_bookings_page', """
+    SELECT
+        BookingID,
+        TeacherName,
+        RoomName,
+        Date,
+        StartTime,
+        EndTime,
+        Equipment,
+        Status
+    FROM BookingView
+    ORDER BY Date DESC
+    LIMIT ? OFFSET ?
+""", (5, 0))
+
+ADMIN_ALL_BOOKINGS_PAGE_SQL = hot_query('admin_all_bookings_page', """
+    SELECT
+        BookingID,
+        TeacherName,
+        Subject,
+        RoomName,
+        Date,
+        StartTime,
+        EndTime,
+        Equipment,
+        Status
+    FROM BookingView
+    ORDER BY Date DESC, StartTime ASC
+    LIMIT ? OFFSET ?
+""", (10, 0))
+
+# --- REPORTS (aggregate every booking by design; they read the report snapshot) ---
+
+REPORT_STATUS_SUMMARY_SQL = hot_query('report_status_summary', """
+    SELECT Status, SUM(Bookings) AS Count
+    FROM BookingCounts
+    GROUP BY Status
+""", allow_scan=True)
+
+REPORT_TEACHER_RANKING_SQL = hot_query('report_teacher_ranking', """
+    SELECT T.Name, SUM(B.Bookings) AS Count
+    FROM BookingCounts B
+    JOIN Teachers T ON B.TeacherID = T.TeacherID
+    WHERE B.Status = 'Approved'
+    GROUP BY T.Name
+    ORDER BY Count DESC
+""", allow_scan=True)
+
+REPORT_SUBJECT_RANKING_SQL = hot_query('report_subject_ranking', """
+    SELECT T.Subject, SUM(B.Bookings) AS Count
+    FROM BookingCounts B
+    JOIN Teachers T ON B.TeacherID = T.TeacherID
+    WHERE B.Status = 'Approved'
+    GROUP BY T.Subject
+    ORDER BY Count DESC
+""", allow_scan=True)
+
+# The ten teachers and subjects with the most approved bookings (admin dashboard).
+REPORT_TOP_TEACHERS_SQL = hot_query('report_top_teachers', """
+    SELECT T.Name, SUM(B.Bookings) AS Count
+    FROM BookingCounts B
+    JOIN Teachers T ON B.TeacherID = T.TeacherID
+    WHERE B.Status = 'Approved'
+    GROUP BY T.Name
+    ORDER BY Count DESC
+    LIMIT ?
+""", (10,), allow_scan=True)
+
+REPORT_TOP_SUBJECTS_SQL = hot_query('report_top_subjects', """
+    SELECT T.Subject, SUM(B.Bookings) AS Count
+    FROM BookingCounts B
+    JOIN Teachers T ON B.TeacherID = T.TeacherID
+    WHERE B.Status = 'Approved' AND T.Subject IS NOT NULL
+    GROUP BY T.Subject
+    ORDER BY Count DESC
+    LIMIT ?
+""", (10,), allow_scan=True)
+
+# Every teacher with their contact details and booking count (admin reports page).
+REPORT_TEACHER_LIST_SQL = hot_query('report_teacher_list', """
+    SELECT T.Name, T.Email, T.Phone,
+           COALESCE(SUM(B.Bookings), 0) AS Bookings
+    FROM Teachers T
+    LEFT JOIN BookingCounts B ON T.TeacherID = B.TeacherID
+    GROUP BY T.TeacherID
+""", allow_scan=True)
+
+# --- MATERIAL REQUESTS ---
+
+# {where} holds the optional FullName/Status filters of the material request pages.
+MATERIAL_REQUESTS_PAGE_SQL = hot_query('material_requests_page', """
+    SELECT * FROM MaterialRequests WHERE 1=1{where} ORDER BY CreatedAt DESC LIMIT ? OFFSET ?
+""", ('Pending', 10, 0), {'where': " AND Status = ?"})
+
+MATERIAL_REQUESTS_COUNT_SQL = hot_query('material_requests_count', """
+    SELECT COUNT(*) FROM MaterialRequests WHERE 1=1{where}
+""", ('Pending',), {'where': " AND Status = ?"})
+
+# Approved loans of a material overlapping [start, end]: BorrowedDate is bounded below by
+# start minus the material's longest loan, so this is one bounded range of
+# idx_material_loans (see materials.py). Params: name, start - longest, end, start.
+MATERIAL_LOANS_SQL = hot_query('material_loans', """
+    SELECT BorrowedDate, ReturnedDate FROM MaterialRequests
+    WHERE MaterialName = ? COLLATE NOCASE
+      AND Status = 'Approved'
+      AND BorrowedDate BETWEEN ? AND ?
+      AND ReturnedDate >= ?
+""", ('Laptop', '2026-10-20', '2026-11-03', '2026-11-03'))
+
+# A substring match cannot use a b-tree index; registered so its plan stays visible.
+hot_query('material_search', MATERIAL_REQUESTS_PAGE_SQL, ('%ana%', 10, 0),
+          {'where': " AND FullName LIKE ?"}, allow_scan=True)
+
+# --- PLAN CHECK ---
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|ORDER\b|GROUP\b|LIMIT\b)(\w+))?",
+                        re.IGNORECASE)
+
+def _large_names(sql):
+    """Names (tables and their aliases) under which a large table appears in the plan."""
+    names = set()
+    for table, alias in _TABLE_REF.findall(sql):
+        if table in LARGE_TABLES:
+            names.add(table)
+            if alias:
+                names.add(alias)
+    return names
+
+def explain(conn, query):
+    """Returns the EXPLAIN QUERY PLAN detail lines of a registered query."""
+    sql = query.sql.format(**query.sample_format)
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, query.sample_params)]
+
+def full_scans(query, plan):
+    """
+    Plan lines that read a whole large table. Walking an index in order counts as a
+    scan too, unless the query has a LIMIT (then it stops after one page).
+    """
+    sql = query.sql.format(**query.sample_format)
+    large = _large_names(sql) | LARGE_TABLES
+    limited = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) is not None
+    scans = []
+    for line in plan:
+        match = re.match(r"SCAN (\S+)", line)
+        if match and match.group(1) in large and not (limited and "INDEX" in line):
+            scans.append(line)
+    return scans
+
+def check_query_plans(bookings=20000, verbose=False):
+    """Seeds an in-memory database, checks every registered plan and returns the failures."""
+    from db_setup import connect_db, isolated_database
+    from seed_data import seed_database
+
+    failures = {}
+    with isolated_database():
+        seed_database({'bookings': bookings})
+        conn = connect_db()
+        try:
+            conn.execute("ANALYZE")
+            for query in HOT_QUERIES.values():
+                plan = explain(conn, query)
+                scans = [] if query.allow_scan else full_scans(query, plan)
+                if scans:
+                    failures[query.name] = scans
+                if verbose or scans:
+                    status = "FAIL" if scans else ("scan allowed" if query.allow_scan else "ok")
+                    print(f"{query.name} [{status}]")
+                    for line in plan:
+                        print(f"    {line}")
+        finally:
+            conn.close()
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Hot query registry and query-plan regression check.")
+    parser.add_argument("--check", action="store_true", help="fail if a hot query scans a large table")
+    parser.add_argument("--bookings", type=int, default=20000, help="bookings to seed for the check")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only failures")
+    args = parser.parse_args()
+
+    if not args.check:
+        for query in HOT_QUERIES.values():
+            print(f"{query.name}{'  (scan allowed)' if query.allow_scan else ''}")
+        sys.exit(0)
+    failures = check_query_plans(args.bookings, args.verbose)
+    print(f"{len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use their indexes.")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,229 @@
+# replay_traffic.py
+#
+# Replays traces recorded by traffic.py against the app and reports latency per endpoint.
+#
+#   python replay_traffic.py traffic.jsonl                        # in-process Flask test client
+#   python replay_traffic.py traffic.jsonl --concurrency 16 --speed 0
+#   python replay_traffic.py traffic.jsonl --target http://127.0.0.1:8000 --concurrency 32
+#
+# --speed 1 keeps the recorded inter-arrival times, 2 replays twice as fast and
+# 0 sends requests as fast as the workers allow. Form values were never recorded,
+# so plausible values are generated for the recorded field names.
+
+import argparse
+import http.cookiejar
+import io
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+# --- TRACE LOADING ---
+
+def load_traces(path, repeat=1):
+    with open(path) as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+    traces.sort(key=lambda trace: trace['t'])
+    if repeat > 1 and traces:
+        span = traces[-1]['t'] - traces[0]['t'] + 1
+        traces = [dict(trace, t=trace['t'] + span * i) for i in range(repeat) for trace in traces]
+    return traces
+
+# --- SYNTHETIC FORM VALUES ---
+
+_rng = random.Random(1)
+_rng_lock = threading.Lock()
+
+def _form_value(key):
+    with _rng_lock:
+        if key in ('date', 'borrowed_date'):
+            return (date.today() + timedelta(days=_rng.randint(1, 60))).isoformat()
+        if key == 'returned_date':
+            return (date.today() + timedelta(days=_rng.randint(61, 90))).isoformat()
+        if key == 'start_time':
+            return f"{_rng.randint(8, 15):02d}:{_rng.choice(['00', '40', '20'])}"
+        if key == 'end_time':
+            return f"{_rng.randint(9, 16):02d}:{_rng.choice(['00', '40', '20'])}"
+        if key in ('room_id', 'teacher_id'):
+            return str(_rng.randint(1, 3))
+        if key in ('session_duration', 'booking_cutoff_minutes'):
+            return '40'
+        if key == 'gender':
+            return _rng.choice(['Male', 'Female'])
+        if key in ('username',):
+            return f"replay_{_rng.randrange(10 ** 9)}"
+        return f"replay {key}"
+
+def build_form(trace):
+    form = {key: _form_value(key) for key in trace.get('form_keys', [])}
+    files = {name: (f"replay_{name}.pdf", size) for name, size in trace.get('files', {}).items()}
+    return form, files
+
+# --- TRANSPORTS ---
+
+class TestClientTarget:
+    """Drives the Flask app in-process, one test client (and session) per worker thread."""
+
+    def __init__(self, credentials):
+        from app import configure_app
+        self.app = configure_app()
+        self.credentials = credentials
+        self.local = threading.local()
+
+    def _client(self, role):
+        clients = getattr(self.local, 'clients', None)
+        if clients is None:
+            clients = self.local.clients = {}
+        if role not in clients:
+            client = self.app.test_client()
+            if role in self.credentials:
+                username, password = self.credentials[role]
+                client.post('/login', data={'username': username, 'password': password})
+            clients[role] = client
+        return clients[role]
+
+    def send(self, trace):
+        form, files = build_form(trace)
+        data = dict(form)
+        for name, (filename, size) in files.items():
+            data[name] = (io.BytesIO(b'0' * size), filename)
+        response = self._client(trace.get('role', 'anonymous')).open(
+            trace['path'], method=trace['method'], query_string=trace.get('query') or None,
+            data=data or None, content_type='multipart/form-data' if files else None)
+        return response.status_code
+
+class HttpTarget:
+    """Sends real HTTP requests (e.g. to a local gunicorn), one cookie jar per worker thread and role."""
+
+    def __init__(self, base_url, credentials, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.credentials = credentials
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _opener(self, role):
+        openers = getattr(self.local, 'openers', None)
+        if openers is None:
+            openers = self.local.openers = {}
+        if role not in openers:
+            opener = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            if role in self.credentials:
+                username, password = self.credentials[role]
+                body = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+                opener.open(self.base_url + '/login', data=body, timeout=self.timeout).read()
+            openers[role] = opener
+        return openers[role]
+
+    def send(self, trace):
+        form, files = build_form(trace)
+        url = self.base_url + trace['path']
+        if trace.get('query'):
+            url += '?' + urllib.parse.urlencode(trace['query'])
+        body = None
+        headers = {}
+        if files:
+            boundary = 'replayboundary'
+            parts = []
+            for key, value in form.items():
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode())
+            for name, (filename, size) in files.items():
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                             f'Content-Type: application/octet-stream\r\n\r\n'.encode() + b'0' * size + b'\r\n')
+            body = b''.join(parts) + f'--{boundary}--\r\n'.encode()
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        elif trace['method'] != 'GET':
+            body = urllib.parse.urlencode(form).encode()
+        request = urllib.request.Request(url, data=body, method=trace['method'], headers=headers)
+        try:
+            with self._opener(trace.get('role', 'anonymous')).open(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+# --- REPLAY ---
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def replay(traces, target, concurrency=8, speed=0.0):
+    """Replays the traces and returns {endpoint: stats} plus the wall-clock duration."""
+    samples = {}
+    errors = {}
+    samples_lock = threading.Lock()
+    if not traces:
+        return {}, 0.0
+    first_t = traces[0]['t']
+    started = time.perf_counter()
+
+    def run(trace):
+        if speed > 0:
+            delay = (trace['t'] - first_t) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        key = f"{trace['method']} {trace.get('endpoint') or trace['path']}"
+        request_started = time.perf_counter()
+        try:
+            status = target.send(trace)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - request_started
+        with samples_lock:
+            samples.setdefault(key, []).append(elapsed)
+            if status >= 500:
+                errors[key] = errors.get(key, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, traces))
+    wall = time.perf_counter() - started
+
+    report = {}
+    for key, values in samples.items():
+        ordered = sorted(values)
+        report[key] = {
+            'count': len(ordered),
+            'errors': errors.get(key, 0),
+            'p50_ms': round(_percentile(ordered, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(ordered, 0.99) * 1000, 3),
+            'throughput_rps': round(len(ordered) / wall, 2) if wall else 0.0,
+        }
+    return report, wall
+
+def print_report(report, wall):
+    total = sum(stats['count'] for stats in report.values())
+    print(f"{'endpoint':<40} {'count':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for key, stats in sorted(report.items(), key=lambda item: -item[1]['count']):
+        print(f"{key:<40} {stats['count']:>7} {stats['errors']:>5} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['throughput_rps']:>8.1f}")
+    if wall:
+        print(f"\n{total} requests in {wall:.2f}s ({total / wall:.1f} req/s overall)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded traffic and report latency per endpoint.")
+    parser.add_argument('trace_file')
+    parser.add_argument('--target', default='test-client', help="'test-client' or a base URL such as http://127.0.0.1:8000")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--speed', type=float, default=0.0, help="time scale; 0 = as fast as possible")
+    parser.add_argument('--repeat', type=int, default=1, help="replay the trace this many times back to back")
+    parser.add_argument('--admin', default='admin:admin123', help="user:password used for ICT_Admin traces")
+    parser.add_argument('--teacher', help="user:password used for Teacher traces")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    credentials = {'ICT_Admin': tuple(args.admin.split(':', 1))}
+    if args.teacher:
+        credentials['Teacher'] = tuple(args.teacher.split(':', 1))
+
+    target = TestClientTarget(credentials) if args.target == 'test-client' else HttpTarget(args.target, credentials)
+    report, wall = replay(load_traces(args.trace_file, args.repeat), target, args.concurrency, args.speed)
+    print_report(report, wall)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'wall_seconds': wall, 'endpoints': report}, f, indent=2)
@@ -1,24 +1,14 @@
 # reports.py
 
-from db_setup import connect_db
+from queries import REPORT_STATUS_SUMMARY_SQL, REPORT_TEACHER_RANKING_SQL, REPORT_SUBJECT_RANKING_SQL
+from snapshots import connect_snapshot
 
 def get_teacher_ranking():
     """Ranks teachers by the number of approved bookings (use)."""
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
     
-    query = """
-    SELECT 
-        T.Name, 
-        COUNT(B.BookingID) AS UsageCount
-    FROM Bookings B
-    JOIN Teachers T ON B.TeacherID = T.TeacherID
-    WHERE B.Status = 'Approved'
-    GROUP BY T.Name
-    ORDER BY UsageCount DESC
-    """
-    
-    cursor.execute(query)
+    cursor.execute(REPORT_TEACHER_RANKING_SQL)
     ranking = cursor.fetchall()
     conn.close()
     
@@ -35,21 +25,10 @@ def get_teacher_ranking():
 
 def get_subject_ranking():
     """Ranks subjects by the number of approved bookings (use)."""
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
     
-    query = """
-    SELECT 
-        T.Subject, 
-        COUNT(B.BookingID) AS SubjectUsageCount
-    FROM Bookings B
-    JOIN Teachers T ON B.TeacherID = T.TeacherID
-    WHERE B.Status = 'Approved'
-    GROUP BY T.Subject
-    ORDER BY SubjectUsageCount DESC
-    """
-    
-    cursor.execute(query)
+    cursor.execute(REPORT_SUBJECT_RANKING_SQL)
     ranking = cursor.fetchall()
     conn.close()
     
@@ -66,16 +45,10 @@ def get_subject_ranking():
 
 def get_status_summary():
     """Provides a count of approved, pending, and denied bookings."""
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
     
-    query = """
-    SELECT Status, COUNT(*) 
-    FROM Bookings 
-    GROUP BY Status
-    """
-    
-    cursor.execute(query)
+    cursor.execute(REPORT_STATUS_SUMMARY_SQL)
     summary = dict(cursor.fetchall())
     conn.close()
     
@@ -0,0 +1,47 @@
+# room_catalog.py
+#
+# In-memory catalog of the classrooms: RoomID -> Room(RoomID, Name, EquipmentList, Capacity).
+#
+# Rooms change a few times a year but are shown on every booking form and list
+# page. The catalog is read once per worker and kept until a write to Classrooms
+# bumps the 'rooms' cache version (see cache_bus.py), so booking forms need no
+# query and the hot list queries select B.RoomID instead of joining Classrooms
+# just for the room name; with_room_names() fills the names in from here.
+
+from cache_bus import cached
+from db_setup import connect_db, record_type, room_row
+
+@cached('rooms')
+def get_room_catalog():
+    """Returns {RoomID: Room record}, ordered by room name. Shared between callers: do not modify."""
+    conn = connect_db(room_row)
+    try:
+        rooms = conn.execute("SELECT RoomID, Name, EquipmentList, Capacity FROM Classrooms ORDER BY Name").fetchall()
+    finally:
+        conn.close()
+    return {room.RoomID: room for room in rooms}
+
+def get_room(room_id):
+    """Returns the Room record for an ID, or None for an unknown room."""
+    return get_room_catalog().get(room_id)
+
+def room_name(room_id):
+    """Returns the name of a room, or None for an unknown room."""
+    room = get_room_catalog().get(room_id)
+    return room.Name if room else None
+
+def with_room_names(rows, column='RoomID', as_column='RoomName'):
+    """
+    Yields the records with the room ID in `column` replaced by the room's name, under
+    the name `as_column` and at the same position, so keyed and positional access both
+    keep working. Rooms missing from the catalog get None.
+    """
+    rooms = get_room_catalog()
+    cls = index = None
+    for row in rows:
+        if cls is None:
+            columns = row._columns
+            index = columns.index(column)
+            cls = record_type(type(row).__name__, columns[:index] + (as_column,) + columns[index + 1:])
+        room = rooms.get(row[index])
+        yield cls._make(row[:index] + (room.Name if room else None,) + row[index + 1:])
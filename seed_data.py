@@ -0,0 +1,179 @@
+# seed_data.py
+#
+# Fills a database with realistic, reproducible volume for benchmarking.
+#
+#   python seed_data.py --db /tmp/bench.db --teachers 300 --bookings 100000
+#
+# Everything is generated from one random seed and inserted with executemany()
+# inside a single transaction, so even large data sets load in seconds.
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from config import get_db_path, set_db_path
+from db_setup import connect_db, initialize_database
+
+# --- CONFIGURATION ---
+
+DEFAULT_COUNTS = {
+    'rooms': 12,
+    'teachers': 200,
+    'bookings': 50000,
+    'material_requests': 5000,
+}
+
+# Academic terms as (start, end) month/day pairs, repeated for every seeded year.
+TERMS = [((1, 8), (4, 5)), ((4, 28), (7, 26)), ((9, 8), (12, 6))]
+
+SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'ICT', 'English', 'French',
+            'Kinyarwanda', 'History', 'Geography', 'Economics', 'Entrepreneurship']
+FIRST_NAMES = ['Jean', 'Marie', 'Eric', 'Alice', 'Patrick', 'Grace', 'David', 'Aline', 'Emmanuel',
+               'Claudine', 'Olivier', 'Diane', 'Samuel', 'Josiane', 'Innocent', 'Esther']
+LAST_NAMES = ['Uwimana', 'Habimana', 'Mukamana', 'Niyonzima', 'Ishimwe', 'Nshimiyimana',
+              'Mugisha', 'Uwase', 'Hakizimana', 'Ingabire', 'Niyitegeka', 'Umutoni']
+EQUIPMENT = ['Projector', 'Interactive Whiteboard', 'Laptops', 'Speakers', 'Document Camera',
+             'Video Conferencing Equipment', 'Microscopes', '3D Printer']
+MATERIALS = ['Laptop', 'Projector', 'Tablet', 'Camera', 'Microphone', 'Extension Cable',
+             'Speaker', 'HDMI Cable', 'Calculator Set', 'Router']
+BOOKING_STATUSES = ['Approved'] * 6 + ['Pending'] * 2 + ['Denied', 'Cancelled']
+MATERIAL_STATUSES = ['Approved'] * 5 + ['Pending'] * 3 + ['Rejected']
+
+SLOT_MINUTES = 40
+SLOTS_PER_DAY = (17 - 8) * 60 // SLOT_MINUTES
+
+# --- GENERATORS ---
+
+def _school_days(years):
+    """All weekdays inside the terms of the given years."""
+    days = []
+    for year in years:
+        for (start_month, start_day), (end_month, end_day) in TERMS:
+            day = date(year, start_month, start_day)
+            end = date(year, end_month, end_day)
+            while day <= end:
+                if day.weekday() < 5:
+                    days.append(day.isoformat())
+                day += timedelta(days=1)
+    return days
+
+def _slot_times(slot):
+    start = datetime(2000, 1, 1, 8, 0) + timedelta(minutes=slot * SLOT_MINUTES)
+    end = start + timedelta(minutes=SLOT_MINUTES)
+    return start.strftime('%H:%M'), end.strftime('%H:%M')
+
+def generate_rows(counts, seed=42, years=None):
+    """Returns the rows to insert per table, deterministic for a given seed."""
+    rng = random.Random(seed)
+    this_year = date.today().year
+    years = years or [this_year - 2, this_year - 1, this_year]
+
+    rooms = []
+    for i in range(1, counts['rooms'] + 1):
+        equipment = ", ".join(rng.sample(EQUIPMENT, rng.randint(1, 4)))
+        rooms.append((f"Seed Room {i:03d}", equipment))
+
+    teachers = []
+    for i in range(1, counts['teachers'] + 1):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        teachers.append((
+            name, rng.choice(SUBJECTS), f"seed_teacher{i}", "password",
+            'Teacher', 1 if rng.random() < 0.9 else 0,
+            f"seed_teacher{i}@school.example", f"07{rng.randint(80000000, 89999999)}",
+            f"S{rng.randint(1, 6)}",
+        ))
+
+    # Unique (room, day, slot) combinations so seeded bookings never overlap.
+    days = _school_days(years)
+    capacity = len(days) * SLOTS_PER_DAY * len(rooms)
+    wanted = min(counts['bookings'], capacity)
+    taken = set()
+    bookings = []
+    while len(bookings) < wanted:
+        room_index = rng.randrange(len(rooms))
+        day = rng.choice(days)
+        slot = rng.randrange(SLOTS_PER_DAY)
+        if (room_index, day, slot) in taken:
+            continue
+        taken.add((room_index, day, slot))
+        start, end = _slot_times(slot)
+        equipment = rng.choice(EQUIPMENT) if rng.random() < 0.6 else ''
+        bookings.append((room_index, rng.randrange(len(teachers)), day, start, end, equipment,
+                         rng.choice(BOOKING_STATUSES)))
+
+    material_requests = []
+    for i in range(counts['material_requests']):
+        borrowed = date.fromisoformat(rng.choice(days))
+        returned = borrowed + timedelta(days=rng.randint(1, 14))
+        material_requests.append((
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(['Male', 'Female']),
+            f"07{rng.randint(80000000, 89999999)}", f"S{rng.randint(1, 6)}", rng.choice(MATERIALS),
+            borrowed.isoformat(), returned.isoformat(), "Class activity", f"seed_letter_{i}.pdf",
+            rng.choice(MATERIAL_STATUSES), f"{borrowed.isoformat()} {rng.randint(7, 17):02d}:{rng.randint(0, 59):02d}:00",
+        ))
+
+    return {'rooms': rooms, 'teachers': teachers, 'bookings': bookings,
+            'material_requests': material_requests}
+
+# --- LOADER ---
+
+def seed_database(counts=None, seed=42, years=None):
+    """Generates and bulk-loads the data set in one transaction. Returns the row counts."""
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    initialize_database()
+    rows = generate_rows(counts, seed, years)
+
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        cursor.executemany("INSERT OR IGNORE INTO Classrooms (Name, EquipmentList) VALUES (?, ?)", rows['rooms'])
+        cursor.executemany("""
+            INSERT OR IGNORE INTO Teachers
+                (Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows['teachers'])
+
+        # Map generated positions to the IDs SQLite assigned.
+        cursor.execute("SELECT Name, RoomID FROM Classrooms WHERE Name LIKE 'Seed Room %'")
+        room_ids = dict(cursor.fetchall())
+        room_ids = [room_ids[name] for name, _equipment in rows['rooms']]
+        cursor.execute("SELECT Username, TeacherID FROM Teachers WHERE Username LIKE 'seed_teacher%'")
+        teacher_ids = dict(cursor.fetchall())
+        teacher_ids = [teacher_ids[teacher[2]] for teacher in rows['teachers']]
+
+        cursor.executemany("""
+            INSERT INTO Bookings (TeacherID, RoomID, Date, StartTime, EndTime, Equipment, Status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, ((teacher_ids[t], room_ids[r], day, start, end, equipment, status)
+              for r, t, day, start, end, equipment, status in rows['bookings']))
+        cursor.executemany("""
+            INSERT INTO MaterialRequests
+                (FullName, Gender, PhoneNumber, ClassTeacher, MaterialName, BorrowedDate,
+                 ReturnedDate, Reason, LetterFile, Status, CreatedAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows['material_requests'])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {table: len(table_rows) for table, table_rows in rows.items()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk-load a reproducible synthetic data set.")
+    parser.add_argument('--db', help="database path (defaults to the configured database)")
+    parser.add_argument('--seed', type=int, default=42)
+    for name, default in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, dest=name)
+    args = parser.parse_args()
+
+    if args.db:
+        set_db_path(args.db)
+    started = time.perf_counter()
+    loaded = seed_database({name: getattr(args, name) for name in DEFAULT_COUNTS}, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {get_db_path()} in {elapsed:.2f}s: " + ", ".join(f"{n} {t}" for t, n in loaded.items()))
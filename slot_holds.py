@@ -0,0 +1,98 @@
+# slot_holds.py
+#
+# Short-lived holds on a booking slot while a teacher fills in the booking form.
+#
+# When a teacher picks a room, date and start time on /bookings/new, the page
+# asks for a hold on that slot. For HOLD_TTL_SECONDS nobody else can take it:
+# check_availability() reports it busy and other submissions for it are refused.
+# Submitting the form converts the hold into the booking in the same transaction;
+# leaving the form without submitting releases it. A teacher holds at most one
+# slot; picking another slot moves the hold.
+#
+# Holds live in the SlotHolds table so every worker sees them. Expired rows are
+# simply ignored by the queries; each worker also keeps a min-heap of the holds
+# it placed, ordered by expiry, and deletes the expired ones lazily on its next
+# hold. Holds of a worker that died are swept by the idle maintenance.
+
+import heapq
+import os
+import threading
+import time
+
+from queries import AVAILABILITY_SQL, HOLD_CONFLICT_SQL
+from write_queue import run_write
+
+# --- CONFIGURATION ---
+
+HOLD_TTL_SECONDS = int(os.environ.get("SMART_CLASSROOM_HOLD_TTL", 300))
+
+_heap_lock = threading.Lock()
+_expiry_heap = []  # (ExpiresAt, RoomID, Date, StartTime) of holds placed by this worker
+
+# --- CHECKS (on the caller's connection) ---
+
+def held_by_other(cursor, teacher_id, room_id, date_str, start_time_str, end_time_str, now=None):
+    """True when another teacher holds a slot overlapping the given period."""
+    cursor.execute(HOLD_CONFLICT_SQL, (room_id, date_str, end_time_str, start_time_str,
+                                       now or time.time(), teacher_id or 0))
+    return cursor.fetchone()[0] > 0
+
+def convert_hold(cursor, teacher_id):
+    """Drops the teacher's hold once their booking is inserted (same transaction)."""
+    cursor.execute("DELETE FROM SlotHolds WHERE TeacherID = ?", (teacher_id,))
+
+# --- HOLDS ---
+
+def _pop_expired(now):
+    """Pops this worker's expired holds off the heap."""
+    expired = []
+    with _heap_lock:
+        while _expiry_heap and _expiry_heap[0][0] <= now:
+            expired.append(heapq.heappop(_expiry_heap))
+    return expired
+
+def place_hold(teacher_id, room_id, date_str, start_time_str, end_time_str, ttl=HOLD_TTL_SECONDS):
+    """
+    Holds a slot for the teacher. Returns the expiry as a Unix timestamp, or None when
+    the slot is already booked or held by someone else.
+    """
+    now = time.time()
+    expires_at = now + ttl
+    expired = _pop_expired(now)
+
+    def hold(conn):
+        cursor = conn.cursor()
+        # Lazy expiry; a hold renewed since it was pushed has a later ExpiresAt and stays.
+        cursor.executemany("""
+            DELETE FROM SlotHolds WHERE RoomID = ? AND Date = ? AND StartTime = ? AND ExpiresAt <= ?
+        """, [(room_id_, date_, start_, expires_) for expires_, room_id_, date_, start_ in expired])
+
+        cursor.execute(AVAILABILITY_SQL, (room_id, date_str, end_time_str, start_time_str))
+        if cursor.fetchone()[0] or held_by_other(cursor, teacher_id, room_id, date_str,
+                                                  start_time_str, end_time_str, now):
+            return None
+        convert_hold(cursor, teacher_id)  # one hold per teacher: release the previous one
+        # Only an expired hold (or the teacher's own) is ever taken over.
+        cursor.execute("""
+            INSERT INTO SlotHolds (RoomID, Date, StartTime, EndTime, TeacherID, ExpiresAt)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (RoomID, Date, StartTime) DO UPDATE
+            SET EndTime = excluded.EndTime, TeacherID = excluded.TeacherID, ExpiresAt = excluded.ExpiresAt
+            WHERE SlotHolds.ExpiresAt <= ? OR SlotHolds.TeacherID = excluded.TeacherID
+        """, (room_id, date_str, start_time_str, end_time_str, teacher_id, expires_at, now))
+        return expires_at if cursor.rowcount else None
+
+    result = run_write(hold)
+    if result is not None:
+        with _heap_lock:
+            heapq.heappush(_expiry_heap, (expires_at, room_id, date_str, start_time_str))
+    return result
+
+def release_hold(teacher_id):
+    """Gives up the teacher's hold, if any (when they leave the form without booking)."""
+    run_write(lambda conn: convert_hold(conn.cursor(), teacher_id))
+
+def sweep_expired_holds():
+    """Deletes every expired hold, including those of workers that stopped. Returns the number deleted."""
+    return run_write(lambda conn: conn.execute("DELETE FROM SlotHolds WHERE ExpiresAt <= ?",
+                                               (time.time(),)).rowcount)
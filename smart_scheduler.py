@@ -1,9 +1,23 @@
 # smart_scheduler.py
 
 from datetime import datetime, timedelta
-from db_setup import connect_db # Using the connect_db from db_setup
+from db_setup import connect_db, booking_row, teacher_row # Using the connect_db from db_setup
 import sqlite3 
-DB_FILE = "smart_classroom.db"
+import base64
+import metrics
+import equipment
+import materials
+import notifications
+import slot_holds
+from write_queue import run_write
+from cache_bus import cached, forget_versions
+from room_catalog import get_room_catalog, with_room_names
+from snapshots import connect_snapshot
+from archive import attach_archive, connect_history
+from queries import (
+    AVAILABILITY_SQL, PENDING_QUEUE_SQL, APPROVED_BOOKINGS_SQL, TEACHER_HISTORY_SQL, ALL_REQUESTS_PAGE_SQL,
+    REPORT_STATUS_SUMMARY_SQL, REPORT_TEACHER_RANKING_SQL, REPORT_SUBJECT_RANKING_SQL,
+)
 # --- CONFIGURATION ---
 # Note: BOOKING_DURATION_MINUTES is often pulled from SystemSettings now, 
 # but kept here as a fallback or default.
@@ -43,9 +57,18 @@ def run_database_migrations():
             _check_and_add_column(conn, "Teachers", "Phone", "TEXT")
             _check_and_add_column(conn, "Teachers", "Class", "TEXT")
             _check_and_add_column(conn, "Teachers", "IsApproved", "INTEGER", default_value=0) 
+            _check_and_add_column(conn, "Teachers", "DeletedAt", "TIMESTAMP")
 
             # Bookings table migrations
             _check_and_add_column(conn, "Bookings", "Equipment", "TEXT")
+
+            # Classrooms table migrations
+            _check_and_add_column(conn, "Classrooms", "Capacity", "INTEGER")
+
+            # Free-text equipment -> inventory tables (once)
+            equipment.migrate_equipment_strings()
+            # Requested materials -> Materials stock table (once)
+            materials.migrate_material_stock()
             
         else:
             print("Could not connect to the database for migrations.")
@@ -107,8 +130,11 @@ def get_available_hours():
 
 # --- BOOKING FUNCTIONS ---
 
-def check_availability(room_id, date_str, start_time_str):
-    """Checks if the room is available for the booking period on a specific date."""
+def check_availability(room_id, date_str, start_time_str, teacher_id=None):
+    """
+    Checks if the room is available for the booking period on a specific date.
+    Slots held by another teacher (see slot_holds.py) count as busy; teacher_id's own hold does not.
+    """
     end_time_str = calculate_end_time(start_time_str)
     
     if not end_time_str or not is_working_hours(start_time_str):
@@ -116,127 +142,188 @@ def check_availability(room_id, date_str, start_time_str):
 
     conn = connect_db()
     cursor = conn.cursor()
-
-    # Overlap Logic: checks if (StartA < EndB) AND (EndA > StartB)
-    query = """
-    SELECT COUNT(*) FROM Bookings
-    WHERE RoomID = ?
-      AND Date = ?
-      AND Status IN ('Pending', 'Approved')
-      AND (
-          (StartTime < ? AND EndTime > ?)
-      )
-    """
-    cursor.execute(query, (room_id, date_str, end_time_str, start_time_str))
-    
-    count = cursor.fetchone()[0]
+    count = _count_overlapping_bookings(cursor, room_id, date_str, start_time_str, end_time_str)
+    held = count == 0 and slot_holds.held_by_other(cursor, teacher_id, room_id, date_str, start_time_str, end_time_str)
     conn.close()
 
-    return count == 0
+    return count == 0 and not held
+
+def _count_overlapping_bookings(cursor, room_id, date_str, start_time_str, end_time_str):
+    """Counts active bookings in the room that overlap the given period."""
+    # Overlap Logic: checks if (StartA < EndB) AND (EndA > StartB)
+    cursor.execute(AVAILABILITY_SQL, (room_id, date_str, end_time_str, start_time_str))
+    return cursor.fetchone()[0]
 
-def submit_booking_request(teacher_id, room_id, date_str, start_time_str, equipment):
+def submit_booking_request(teacher_id, room_id, date_str, start_time_str, equipment_text):
     """Submits a request, checking availability."""
-    
-    if not check_availability(room_id, date_str, start_time_str):
-        return False
+    metrics.BOOKING_SUBMISSIONS.inc('scheduler')
 
     end_time_str = calculate_end_time(start_time_str)
-    
-    conn = connect_db()
-    cursor = conn.cursor()
-    
-    try:
+    if not end_time_str or not is_working_hours(start_time_str):
+        return False
+
+    def insert_booking(conn):
+        cursor = conn.cursor()
+        # Re-checked inside the write transaction, so two requests for the same slot cannot both succeed.
+        if _count_overlapping_bookings(cursor, room_id, date_str, start_time_str, end_time_str):
+            return False
+        if slot_holds.held_by_other(cursor, teacher_id, room_id, date_str, start_time_str, end_time_str):
+            return False
+        reservations, shortages = equipment.plan_equipment(cursor, room_id, date_str, start_time_str,
+                                                           end_time_str, equipment_text)
+        if shortages:
+            return False
         cursor.execute("""
             INSERT INTO Bookings 
             (TeacherID, RoomID, Date, StartTime, EndTime, Equipment, Status) 
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (teacher_id, room_id, date_str, start_time_str, end_time_str, equipment, 'Pending'))
-        
-        conn.commit()
+        """, (teacher_id, room_id, date_str, start_time_str, end_time_str, equipment_text, 'Pending'))
+        equipment.reserve_equipment(cursor, cursor.lastrowid, date_str, start_time_str, end_time_str, reservations)
+        slot_holds.convert_hold(cursor, teacher_id)
         return True
+
+    try:
+        if run_write(insert_booking):
+            return True
+        metrics.BOOKING_CONFLICTS.inc('scheduler')
+        return False
     except sqlite3.Error as e:
         print(f"ERROR submitting booking: {e}") 
         return False
-    finally:
-        conn.close()
 
 def update_booking_status(booking_id, new_status):
     """Updates the status of a specific booking (e.g., 'Approved' or 'Denied')."""
     if new_status not in ['Approved', 'Denied', 'Cancelled']:
         return False
-        
-    conn = connect_db()
-    cursor = conn.cursor()
-    try:
+
+    def set_status(conn):
+        cursor = conn.cursor()
         cursor.execute("UPDATE Bookings SET Status = ? WHERE BookingID = ?", 
                        (new_status, booking_id))
-        conn.commit()
-        return cursor.rowcount > 0
+        updated = cursor.rowcount > 0
+        if updated and new_status in ('Approved', 'Denied'):
+            # Same transaction: the SMS is queued exactly when the decision commits.
+            notifications.notify_booking_status(conn, booking_id, new_status)
+        return updated
+
+    try:
+        updated = run_write(set_status)
+        if updated:
+            notifications.wake()
+        return updated
     except sqlite3.Error as e:
         print(f"Database error updating booking status: {e}")
         return False
-    finally:
-        conn.close()
 
 def get_pending_requests():
     """Retrieves all pending booking requests for the ICT Teacher view."""
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
-    query = """
-    SELECT b.BookingID, t.Name AS Teacher, c.Name AS Room, b.Date, b.StartTime, b.Equipment 
-    FROM Bookings b
-    JOIN Teachers t ON b.TeacherID = t.TeacherID
-    JOIN Classrooms c ON b.RoomID = c.RoomID
-    WHERE b.Status = 'Pending'
-    ORDER BY b.Date, b.StartTime
-    """
-    cursor.execute(query)
+    cursor.execute(PENDING_QUEUE_SQL)
     requests = cursor.fetchall()
     conn.close()
     return requests
     
 def get_bookings_by_teacher_id(teacher_id):
-    """Retrieves all past, pending, and future bookings for a specific teacher."""
-    conn = connect_db()
+    """Retrieves all past, pending, and future bookings for a specific teacher, archived ones included."""
+    conn = connect_history()
+    conn.row_factory = booking_row
     cursor = conn.cursor()
     query = """
     SELECT 
         B.BookingID, 
-        R.Name AS RoomName, 
+        B.RoomID, 
         B.Date, 
         B.StartTime, 
         B.EndTime,
         B.Status, 
         B.Equipment 
-    FROM Bookings B
-    JOIN Classrooms R ON B.RoomID = R.RoomID
+    FROM AllBookings B
     WHERE B.TeacherID = ?
     ORDER BY B.Date DESC, B.StartTime DESC
     """
     cursor.execute(query, (teacher_id,))
-    bookings = cursor.fetchall()
+    bookings = list(with_room_names(cursor.fetchall()))
     conn.close()
     return bookings
 
+HISTORY_PAGE_SIZE = 20
+
+def _encode_history_cursor(booking):
+    raw = f"{booking['Date']}|{booking['StartTime']}|{booking['BookingID']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_history_cursor(token):
+    try:
+        booking_date, start_time, booking_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        return booking_date, start_time, int(booking_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def _history_page(cursor, table, teacher_id, scope, date_from, date_to, status, after, limit):
+    today = datetime.now().strftime('%Y-%m-%d')
+    # Upcoming bookings read soonest first, past ones most recent first.
+    direction, keyset_op = ('ASC', '>') if scope == 'upcoming' else ('DESC', '<')
+    clauses, params = ["B.TeacherID = ?"], [teacher_id]
+    if scope == 'upcoming':
+        clauses.append("B.Date >= ?")
+        params.append(today)
+    elif scope == 'past':
+        clauses.append("B.Date < ?")
+        params.append(today)
+    if date_from:
+        clauses.append("B.Date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("B.Date <= ?")
+        params.append(date_to)
+    if status:
+        clauses.append("B.Status = ?")
+        params.append(status)
+    if after:
+        clauses.append(f"(B.Date, B.StartTime, B.BookingID) {keyset_op} (?, ?, ?)")
+        params.extend(after)
+
+    cursor.execute(TEACHER_HISTORY_SQL.format(table=table, where=' AND '.join(clauses), direction=direction),
+                   params + [limit])
+    return cursor.fetchall()
+
+def get_teacher_booking_history(teacher_id, scope='upcoming', date_from=None, date_to=None,
+                                status=None, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Returns one page of a teacher's bookings as {'bookings': [Booking, ...], 'next_cursor': token or None}.
+
+    scope is 'upcoming' (today onwards, soonest first), 'past' (most recent first) or 'all'
+    (most recent first). Pages are keyset-paginated on (Date, StartTime, BookingID), so
+    each page reads only its own rows from idx_bookings_teacher_history. Past pages
+    continue into the archive database once the live table runs out.
+    """
+    after = _decode_history_cursor(cursor) if cursor else None
+    conn = connect_db(booking_row)
+    try:
+        db_cursor = conn.cursor()
+        # One extra row tells us whether there is a next page.
+        rows = _history_page(db_cursor, "main.Bookings", teacher_id, scope, date_from, date_to, status, after, limit + 1)
+        if len(rows) <= limit and scope != 'upcoming' and attach_archive(conn):
+            # Archived bookings are older than every live one, so they follow on in the same order.
+            archive_after = after if not rows else (rows[-1]['Date'], rows[-1]['StartTime'], rows[-1]['BookingID'])
+            rows += _history_page(db_cursor, "archive.Bookings", teacher_id, scope, date_from, date_to,
+                                  status, archive_after, limit + 1 - len(rows))
+    finally:
+        conn.close()
+
+    has_next = len(rows) > limit
+    rows = list(with_room_names(rows[:limit]))
+    return {
+        'bookings': rows,
+        'next_cursor': _encode_history_cursor(rows[-1]) if has_next else None,
+    }
+
 def get_all_approved_bookings():
     """Retrieves all approved bookings (for calendar/overview purposes)."""
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
-    query = """
-    SELECT 
-        B.BookingID, 
-        T.Name AS TeacherName,
-        R.Name AS RoomName, 
-        B.Date, 
-        B.StartTime,
-        B.EndTime
-    FROM Bookings B
-    JOIN Teachers T ON B.TeacherID = T.TeacherID
-    JOIN Classrooms R ON B.RoomID = R.RoomID
-    WHERE B.Status = 'Approved'
-    ORDER BY B.Date ASC, B.StartTime ASC
-    """
-    cursor.execute(query)
+    cursor.execute(APPROVED_BOOKINGS_SQL)
     all_bookings = cursor.fetchall()
     conn.close()
     return all_bookings
@@ -247,10 +334,10 @@ def get_all_approved_bookings():
 
 def get_teacher_by_username(username):
     """Retrieves a teacher's record by username for login."""
-    conn = connect_db()
+    conn = connect_db(teacher_row)
     cursor = conn.cursor()
-    # Returns (TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class)
-    query = "SELECT TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class FROM Teachers WHERE Username = ?"
+    # Returns a Teacher record (TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class)
+    query = "SELECT TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class FROM Teachers WHERE Username = ? AND DeletedAt IS NULL"
     cursor.execute(query, (username,))
     teacher = cursor.fetchone()
     conn.close()
@@ -258,10 +345,10 @@ def get_teacher_by_username(username):
     
 def get_teacher_by_id(teacher_id):
     """Retrieves a teacher's record by ID."""
-    conn = connect_db()
+    conn = connect_db(teacher_row)
     cursor = conn.cursor()
-    # Returns (TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class)
-    query = "SELECT TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class FROM Teachers WHERE TeacherID = ?"
+    # Returns a Teacher record (TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class)
+    query = "SELECT TeacherID, Name, Subject, Username, Password, Role, IsApproved, Email, Phone, Class FROM Teachers WHERE TeacherID = ? AND DeletedAt IS NULL"
     cursor.execute(query, (teacher_id,))
     teacher = cursor.fetchone()
     conn.close()
@@ -269,15 +356,11 @@ def get_teacher_by_id(teacher_id):
 
 def register_ict_admin(name, username, password):
     """Registers a user with the ICT_Admin role and automatically approves them."""
-    conn = connect_db()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT TeacherID FROM Teachers WHERE Username = ?", (username,))
-    if cursor.fetchone():
-        conn.close()
-        return "Username already exists."
-
-    try:
+    def insert_admin(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT TeacherID FROM Teachers WHERE Username = ?", (username,))
+        if cursor.fetchone():
+            return "Username already exists."
         cursor.execute(
             """
             INSERT INTO Teachers (Name, Subject, Username, Password, Role, IsApproved)
@@ -285,51 +368,57 @@ def register_ict_admin(name, username, password):
             """,
             (name, "ICT Administration", username, password, 'ICT_Admin', 1)
         )
-        conn.commit()
         return True
+
+    try:
+        return run_write(insert_admin)
     except sqlite3.Error as e:
         print(f"Error registering admin: {e}")
         return False
-    finally:
-        conn.close()
     
 def update_teacher_approval_status(teacher_id, new_status):
     """Updates the IsApproved status for a teacher (1 for Approved, 0 for Pending/Denied)."""
     status_value = 1 if str(new_status) == '1' else 0
-    
-    conn = connect_db()
-    cursor = conn.cursor()
-    try:
+
+    def set_approval(conn):
+        cursor = conn.cursor()
         cursor.execute("UPDATE Teachers SET IsApproved = ? WHERE TeacherID = ?", 
                        (status_value, teacher_id))
-        conn.commit()
         return cursor.rowcount > 0
+
+    try:
+        return run_write(set_approval)
     except sqlite3.Error as e:
         print(f"DB Error updating teacher approval: {e}")
         return False
-    finally:
-        conn.close()
     
 def delete_teacher_by_id(teacher_id):
-    """Deletes a teacher and their associated bookings."""
-    conn = connect_db()
-    cursor = conn.cursor()
-    try:
+    """
+    Soft-deletes a teacher: the account is hidden and can no longer log in, and their
+    upcoming bookings are cancelled so the slots free up at once. The bookings
+    themselves are removed later in small batches by purge.purge_deleted_teachers().
+    """
+    def soft_delete(conn):
+        cursor = conn.cursor()
         # Prevent deleting the primary admin account if logic dictates
-        cursor.execute("SELECT Role FROM Teachers WHERE TeacherID = ?", (teacher_id,))
+        cursor.execute("SELECT Role FROM Teachers WHERE TeacherID = ? AND DeletedAt IS NULL", (teacher_id,))
         role = cursor.fetchone()
-        if role and role[0] == 'ICT_Admin':
+        if not role or role[0] == 'ICT_Admin':
             return False # Prevent deletion
 
-        cursor.execute("DELETE FROM Bookings WHERE TeacherID = ?", (teacher_id,))
-        cursor.execute("DELETE FROM Teachers WHERE TeacherID = ?", (teacher_id,))
-        conn.commit()
-        return True 
+        cursor.execute("UPDATE Teachers SET DeletedAt = CURRENT_TIMESTAMP, IsApproved = 0 WHERE TeacherID = ?",
+                       (teacher_id,))
+        cursor.execute("""
+            UPDATE Bookings SET Status = 'Cancelled'
+            WHERE TeacherID = ? AND Date >= ? AND Status IN ('Pending', 'Approved')
+        """, (teacher_id, datetime.now().strftime('%Y-%m-%d')))
+        return True
+
+    try:
+        return run_write(soft_delete)
     except sqlite3.Error as e:
         print(f"Database error deleting teacher: {e}")
         return False
-    finally:
-        conn.close() 
 
 def get_all_teacher_management_data():
     """Retrieves ALL essential data from the Teachers table for administrative viewing."""
@@ -339,6 +428,7 @@ def get_all_teacher_management_data():
     SELECT 
         TeacherID, Name, Subject, Username, Role, IsApproved, Email, Phone, Class
     FROM Teachers
+    WHERE DeletedAt IS NULL
     ORDER BY IsApproved ASC, Name ASC;
     """
     try:
@@ -355,55 +445,28 @@ def get_all_teacher_management_data():
 # --- ROOM AND REPORT FUNCTIONS ---
 
 def get_all_rooms():
-    """Returns a list of all rooms as tuples (RoomID, RoomName)."""
-    conn = connect_db()
-    cursor = conn.cursor()
+    """Returns a list of all rooms as tuples (RoomID, RoomName), from the room catalog."""
     try:
-        cursor.execute("SELECT RoomID, Name FROM Classrooms ORDER BY Name")
-        rooms = cursor.fetchall()
-        return [(room[0], room[1]) for room in rooms]
+        return [(room.RoomID, room.Name) for room in get_room_catalog().values()]
     except sqlite3.Error as e:
         print(f"Database error fetching rooms: {e}")
         return []
-    finally:
-        conn.close()
 
 def get_usage_reports_and_summary():
     """Retrieves data required for the reports dashboard."""
-    conn = connect_db()
+    conn = connect_snapshot()
     cursor = conn.cursor()
     
     # 1. Teacher Usage Ranking (Approved Only)
-    teacher_query = """
-    SELECT T.Name, COUNT(B.BookingID) AS Count
-    FROM Bookings B
-    JOIN Teachers T ON B.TeacherID = T.TeacherID
-    WHERE B.Status = 'Approved'
-    GROUP BY T.Name
-    ORDER BY Count DESC
-    """
-    cursor.execute(teacher_query)
+    cursor.execute(REPORT_TEACHER_RANKING_SQL)
     teacher_ranking = cursor.fetchall()
 
     # 2. Subject Usage Ranking (Approved Only)
-    subject_query = """
-    SELECT T.Subject, COUNT(B.BookingID) AS Count
-    FROM Bookings B
-    JOIN Teachers T ON B.TeacherID = T.TeacherID
-    WHERE B.Status = 'Approved'
-    GROUP BY T.Subject
-    ORDER BY Count DESC
-    """
-    cursor.execute(subject_query)
+    cursor.execute(REPORT_SUBJECT_RANKING_SQL)
     subject_ranking = cursor.fetchall()
     
     # 3. Overall Booking Status Summary
-    summary_query = """
-    SELECT Status, COUNT(BookingID) AS Count
-    FROM Bookings
-    GROUP BY Status
-    """
-    cursor.execute(summary_query)
+    cursor.execute(REPORT_STATUS_SUMMARY_SQL)
     summary_data = cursor.fetchall()
     
     conn.close()
@@ -414,8 +477,9 @@ def get_usage_reports_and_summary():
 
 # --- SYSTEM SETTINGS FUNCTIONS ---
 
+@cached('settings')
 def get_system_setting(key):
-    """Retrieves a single system setting value by key."""
+    """Retrieves a single system setting value by key (cached until a setting changes)."""
     conn = connect_db()
     cursor = conn.cursor()
     try:
@@ -442,55 +506,74 @@ def update_system_setting(key, value):
         print(f"Error updating SystemSettings table: {e}")
     finally:
         conn.close()
+        forget_versions()
         # smart_scheduler.py (Add this function)
 
 # smart_scheduler.py
 
 def get_all_bookings():
     """
-    Retrieves all bookings from the database, joining with Teacher and Classroom names.
+    Retrieves all bookings from the database with Teacher and Classroom names (read from BookingView).
     """
-    conn = connect_db()
+    conn = connect_db(booking_row)
     cursor = conn.cursor()
 
     cursor.execute("""
         SELECT 
             B.BookingID, B.Date, B.StartTime, B.EndTime, B.Equipment, B.Status,
-            T.Name AS TeacherName, T.Subject, 
-            C.Name AS ClassroomName
-        FROM Bookings B
-        JOIN Teachers T ON B.TeacherID = T.TeacherID
-        JOIN Classrooms C ON B.RoomID = C.RoomID   -- ✅ Corrected
+            B.TeacherName, B.Subject, 
+            B.RoomName AS ClassroomName
+        FROM BookingView B
         ORDER BY B.Date DESC, B.StartTime DESC
     """)
     
     bookings = cursor.fetchall()
     conn.close()
     return bookings
+
+BOOKING_STATUSES = ('Pending', 'Approved', 'Denied', 'Cancelled')
+
+def iter_all_bookings(date_from=None, date_to=None, status=None, limit=100, offset=0, chunk_size=100):
+    """
+    Yields one page of bookings (newest first) as Booking records, reading the cursor in chunks
+    instead of materializing the whole joined table. The connection is closed when the
+    generator is exhausted or discarded.
+    """
+    clauses, params = [], []
+    if date_from:
+        clauses.append("B.Date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("B.Date <= ?")
+        params.append(date_to)
+    if status:
+        clauses.append("B.Status = ?")
+        params.append(status)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = connect_db(booking_row)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(ALL_REQUESTS_PAGE_SQL.format(where=where), params + [limit, offset])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
 # smart_scheduler.py
 # smart_scheduler.py (Hypothetically)
 
 # smart_scheduler.py (Fix: Ensure it uses the function that sets the row_factory)
 
 def get_all_classrooms():
-    # If connect_db is the function that sets conn.row_factory = sqlite3.Row
-    conn = connect_db() 
-    if not conn:
-        return []
-        
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT ClassroomID, Name, Capacity FROM Classrooms")
-    
-    all_classrooms = cursor.fetchall()
-    
-    conn.close()
-    # 'all_classrooms' will now contain data accessible by name, e.g., row['Name']
-    return all_classrooms
+    """Returns every classroom as a Room record (RoomID, Name, EquipmentList, Capacity), from the room catalog."""
+    return list(get_room_catalog().values())
 
 def get_db_connection():
     """Returns a SQLite connection with row_factory set to sqlite3.Row."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect_db()
     conn.row_factory = sqlite3.Row # <--- THIS IS REQUIRED
     return conn
 
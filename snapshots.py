@@ -0,0 +1,200 @@
+# snapshots.py
+#
+# Point-in-time read replica for heavy report queries.
+#
+# Reports, exports and analytics read from a copy of the database made with the
+# SQLite backup API instead of the live file, so their long scans never hold the
+# read locks that teachers' booking submissions have to wait for. The copy is
+# refreshed when it is older than SNAPSHOT_MAX_AGE_SECONDS or when more than
+# SNAPSHOT_MAX_CHANGES rows have changed since it was taken (measured with the
+# ChangeLog sequence, which the snapshot carries along).
+#
+# Requests never wait for a copy: a stale snapshot is still served while a
+# background thread refreshes it (reports may lag the live data by one refresh).
+# The copy is taken in steps of SNAPSHOT_BACKUP_PAGES pages with a short pause
+# in between, so the read lock is only held for one step at a time and writers
+# get in between steps. A refreshed copy is written to a temporary file and
+# renamed over the old one, so connections still reading the previous snapshot
+# are not disturbed. In-memory databases have no file to copy, so they are
+# always read live.
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+import metrics
+import sql_trace
+from config import get_db_path, is_memory_database
+
+# --- CONFIGURATION ---
+
+enabled = os.environ.get("SMART_CLASSROOM_SNAPSHOTS", "1").lower() not in ("0", "false", "no")
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get("SMART_CLASSROOM_SNAPSHOT_MAX_AGE", 60))
+SNAPSHOT_MAX_CHANGES = int(os.environ.get("SMART_CLASSROOM_SNAPSHOT_MAX_CHANGES", 200))
+
+# Pages copied per backup step, and the pause after each step that lets writers in.
+SNAPSHOT_BACKUP_PAGES = int(os.environ.get("SMART_CLASSROOM_SNAPSHOT_BACKUP_PAGES", 256))
+SNAPSHOT_BACKUP_PAUSE_SECONDS = 0.005
+
+# A lock file older than this is assumed to belong to a crashed process.
+STALE_LOCK_SECONDS = 120
+
+_refresh_lock = threading.Lock()
+_refresh_wanted = threading.Event()
+_start_lock = threading.Lock()
+_refresher_pid = None  # process that runs the refresh thread (reset by fork)
+_cached_seq = {}  # snapshot path -> (mtime_ns, ChangeLog seq inside that snapshot)
+
+def snapshot_path(db_path=None):
+    """The replica lives next to the live database: smart_classroom.db -> smart_classroom.snapshot.db"""
+    base, ext = os.path.splitext(db_path or get_db_path())
+    return f"{base}.snapshot{ext or '.db'}"
+
+def _read_only_uri(path):
+    return f"file:{quote(os.path.abspath(path))}?mode=ro"
+
+def _changelog_seq(conn):
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error:
+        return 0
+
+def _snapshot_seq(path, mtime_ns):
+    cached = _cached_seq.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    conn = sqlite3.connect(_read_only_uri(path), uri=True)
+    try:
+        seq = _changelog_seq(conn)
+    finally:
+        conn.close()
+    _cached_seq[path] = (mtime_ns, seq)
+    return seq
+
+# --- REFRESH ---
+
+def refresh_snapshot():
+    """Copies the live database into the snapshot file. Returns the elapsed seconds, or None if skipped."""
+    db_path = get_db_path()
+    path = snapshot_path(db_path)
+    lock_path = path + ".lock"
+
+    # One refresh at a time per process, and across gunicorn workers via an exclusive lock file.
+    if not _refresh_lock.acquire(blocking=False):
+        return None
+    try:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if time.time() - os.path.getmtime(lock_path) < STALE_LOCK_SECONDS:
+                return None
+            os.remove(lock_path)
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+
+        started = time.perf_counter()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target, pages=SNAPSHOT_BACKUP_PAGES,
+                          progress=lambda _status, _remaining, _total: time.sleep(SNAPSHOT_BACKUP_PAUSE_SECONDS))
+            # The copy inherits WAL mode from the live file; readers open it read-only,
+            # so keep it a plain rollback-journal file with no -wal/-shm beside it.
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp_path, path)
+        elapsed = time.perf_counter() - started
+        metrics.SNAPSHOT_REFRESHES.inc()
+        return elapsed
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        _refresh_lock.release()
+
+def snapshot_is_stale():
+    """True when the snapshot is missing, too old, or too many changes behind the live database."""
+    path = snapshot_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return True
+    if time.time() - stat.st_mtime > SNAPSHOT_MAX_AGE_SECONDS:
+        return True
+    from db_setup import connect_db  # local import, as db_setup is imported by callers first
+    conn = connect_db()
+    try:
+        live_seq = _changelog_seq(conn)
+    finally:
+        conn.close()
+    return live_seq - _snapshot_seq(path, stat.st_mtime_ns) > SNAPSHOT_MAX_CHANGES
+
+# --- READ CONNECTIONS ---
+
+def connect_snapshot():
+    """
+    Returns a read-only connection to the report snapshot. A stale snapshot is served as
+    it is and refreshed in the background. Falls back to the live database when
+    snapshots are disabled or no snapshot has been taken yet.
+    """
+    from db_setup import connect_db
+    db_path = get_db_path()
+    if not enabled or is_memory_database(db_path):
+        return connect_db()
+
+    path = snapshot_path(db_path)
+    if snapshot_is_stale():
+        request_refresh()
+    if not os.path.exists(path):
+        return connect_db()
+
+    conn = sqlite3.connect(_read_only_uri(path), uri=True, factory=sql_trace.connection_factory())
+    metrics.DB_CONNECTIONS.inc()
+    return conn
+
+# --- BACKGROUND REFRESH ---
+
+def request_refresh():
+    """Asks this process's refresh thread (started if needed) to refresh the snapshot now."""
+    start_refresh_thread()
+    _refresh_wanted.set()
+
+def _refresh_loop(interval):
+    while True:
+        _refresh_wanted.wait(interval)
+        _refresh_wanted.clear()
+        if enabled and not is_memory_database() and snapshot_is_stale():
+            try:
+                refresh_snapshot()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Snapshot refresh failed: {e}")
+
+def start_refresh_thread(interval=None):
+    """Starts the refresh thread for this process (once per process, also after fork)."""
+    global _refresher_pid
+    interval = interval or SNAPSHOT_MAX_AGE_SECONDS
+    if _refresher_pid == os.getpid():
+        return None
+    with _start_lock:
+        if _refresher_pid == os.getpid():
+            return None
+        _refresher_pid = os.getpid()
+    thread = threading.Thread(target=_refresh_loop, args=(interval,), name="snapshot-refresh", daemon=True)
+    thread.start()
+    return thread
+
+def init_app(app):
+    """Starts the refresh thread on each worker's first request, so reports find a warm snapshot."""
+    app.config.setdefault('SNAPSHOT_REFRESH_INTERVAL', SNAPSHOT_MAX_AGE_SECONDS)
+
+    @app.before_request
+    def _snapshots_start_refresh():
+        if _refresher_pid != os.getpid():
+            start_refresh_thread(app.config['SNAPSHOT_REFRESH_INTERVAL'])
@@ -0,0 +1,225 @@
+# sql_trace.py
+#
+# Per-request SQL instrumentation.
+#
+# When tracing is enabled, connect_db() opens connections with TracedConnection,
+# which times every execute/fetch and registers a sqlite3 trace callback that
+# also counts statements run by triggers and executescript(). At the end of
+# each request the totals are sent back in a Server-Timing header (visible in
+# the browser dev tools' Network/Timing panel), statements slower than the
+# threshold are logged together with their EXPLAIN QUERY PLAN, and in debug
+# mode a small toolbar listing the slowest statements is appended to HTML pages.
+#
+# Enable with SMART_CLASSROOM_SQL_TRACE=1 or app.config['SQL_TRACE'] = True.
+
+import heapq
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("sql_trace")
+
+# --- CONFIGURATION ---
+
+enabled = os.environ.get("SMART_CLASSROOM_SQL_TRACE", "").lower() in ("1", "true", "yes")
+
+# Statements slower than this (execute + fetch, in milliseconds) are logged with their plan.
+SLOW_QUERY_MS = float(os.environ.get("SMART_CLASSROOM_SLOW_QUERY_MS", 50))
+
+# Number of statements listed in the debug toolbar.
+TOOLBAR_TOP_N = 5
+
+_local = threading.local()
+
+# --- PER-REQUEST STATS ---
+
+class RequestStats:
+    """Query counters for one request."""
+    __slots__ = ("queries", "statements", "db_seconds", "entries")
+
+    def __init__(self):
+        self.queries = 0         # execute()/executemany() calls made by the app
+        self.statements = 0      # statements seen by the trace callback (includes triggers)
+        self.db_seconds = 0.0    # time spent inside sqlite3 (execute + fetch)
+        self.entries = []        # [seconds, sql, params] per execute() call
+
+    @property
+    def db_ms(self):
+        return self.db_seconds * 1000
+
+    def slowest(self, n=TOOLBAR_TOP_N):
+        return heapq.nlargest(n, self.entries, key=lambda entry: entry[0])
+
+def start_request():
+    _local.stats = RequestStats()
+
+def finish_request():
+    """Detaches and returns the current request's stats (None if tracing was off)."""
+    stats = getattr(_local, "stats", None)
+    _local.stats = None
+    return stats
+
+def current_stats():
+    return getattr(_local, "stats", None)
+
+# --- TRACED CONNECTION ---
+
+def _on_statement(_sql):
+    stats = current_stats()
+    if stats is not None:
+        stats.statements += 1
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that charges execute and fetch time to the current request."""
+
+    def _timed(self, method, sql, parameters):
+        stats = current_stats()
+        if stats is None:
+            return method(sql, parameters)
+        entry = [0.0, sql, parameters]
+        self._trace_entry = entry
+        stats.queries += 1
+        stats.entries.append(entry)
+        start = time.perf_counter()
+        try:
+            return method(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry[0] += elapsed
+            stats.db_seconds += elapsed
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def _timed_fetch(self, method, *args):
+        stats = current_stats()
+        entry = getattr(self, "_trace_entry", None)
+        if stats is None or entry is None:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry[0] += elapsed
+            stats.db_seconds += elapsed
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed_fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection factory used by connect_db() while tracing is enabled."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_on_statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory():
+    """Returns the factory connect_db() should pass to sqlite3.connect()."""
+    return TracedConnection if enabled else sqlite3.Connection
+
+# --- SLOW QUERY LOG ---
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT|REPLACE)\b", re.IGNORECASE)
+
+def _compact(sql, limit=300):
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= limit else sql[:limit] + "..."
+
+def explain_query_plan(sql, parameters=()):
+    """Returns the EXPLAIN QUERY PLAN rows for a statement as readable lines."""
+    if not _EXPLAINABLE.match(sql) or isinstance(parameters, (list, tuple)) and parameters \
+            and isinstance(parameters[0], (list, tuple, dict)):
+        return []  # executemany() batches and non-DML statements are not explained
+    from db_setup import connect_db  # local import: db_setup imports this module
+    conn = connect_db()
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        return [f"{'  ' * (1 if parent else 0)}{detail}" for _id, parent, _unused, detail in rows]
+    except sqlite3.Error as e:
+        return [f"(plan unavailable: {e})"]
+    finally:
+        conn.close()
+
+def log_slow_queries(stats, endpoint):
+    for seconds, sql, parameters in stats.entries:
+        ms = seconds * 1000
+        if ms < SLOW_QUERY_MS:
+            continue
+        plan = "\n    ".join(explain_query_plan(sql, parameters)) or "(no plan)"
+        logger.warning("Slow query (%.1f ms) in %s: %s\n  plan:\n    %s",
+                       ms, endpoint, _compact(sql), plan)
+
+# --- FLASK INTEGRATION ---
+
+def _toolbar_html(stats):
+    from markupsafe import escape
+    rows = "".join(
+        f"<li><b>{seconds * 1000:.2f} ms</b> <code>{escape(_compact(sql, 160))}</code></li>"
+        for seconds, sql, _params in stats.slowest()
+    )
+    return (
+        '<div id="sql-trace" style="position:fixed;right:8px;bottom:70px;z-index:2000;'
+        'max-width:560px;background:#212529;color:#f8f9fa;font-size:12px;padding:8px 12px;'
+        'border-radius:6px;opacity:.92">'
+        f"<div><b>SQL</b>: {stats.queries} queries, {stats.statements} statements, "
+        f"{stats.db_ms:.2f} ms</div><ol style=\"margin:4px 0 0 16px;padding:0\">{rows}</ol></div>"
+    )
+
+def set_enabled(flag):
+    """Switches tracing on or off for connections opened from now on."""
+    global enabled
+    enabled = bool(flag)
+
+def init_app(app):
+    """Registers the request hooks. Tracing itself is switched on by app.config['SQL_TRACE']."""
+    set_enabled(app.config.get("SQL_TRACE", enabled))
+    app.config["SQL_TRACE"] = enabled
+
+    @app.before_request
+    def _sql_trace_start():
+        if enabled:
+            start_request()
+
+    @app.after_request
+    def _sql_trace_finish(response):
+        stats = finish_request()
+        if stats is None:
+            return response
+
+        from flask import request
+        response.headers.add(
+            "Server-Timing", f'db;dur={stats.db_ms:.2f};desc="{stats.queries} queries"'
+        )
+        response.headers["X-DB-Query-Count"] = str(stats.queries)
+        log_slow_queries(stats, request.endpoint)
+        logger.debug("%s: %d queries (%d statements) in %.2f ms",
+                     request.endpoint, stats.queries, stats.statements, stats.db_ms)
+
+        if (app.debug or app.config.get("SQL_TRACE_TOOLBAR")) and response.mimetype == "text/html" \
+                and not response.direct_passthrough and not response.is_streamed:
+            body = response.get_data(as_text=True)
+            if "</body>" in body:
+                response.set_data(body.replace("</body>", _toolbar_html(stats) + "</body>", 1))
+        return response
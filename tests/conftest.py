@@ -0,0 +1,77 @@
+# tests/conftest.py
+#
+# Shared fixtures. Run the suite from the repository root:
+#
+#   python -m pytest -q              # or -n auto with pytest-xdist
+#
+# Every test gets its own database from db_setup.isolated_database() (a private
+# in-memory database) or, where real file locking matters, a file in tmp_path,
+# so tests can run in parallel and in any order. Background threads are
+# disabled, and the default database path points into a temporary directory, so
+# nothing here can touch smart_classroom.db.
+
+import os
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# Set before the project modules read them at import time.
+os.environ["SMART_CLASSROOM_DB"] = os.path.join(tempfile.mkdtemp(prefix="smart_classroom_tests_"), "unused.db")
+os.environ["SMART_CLASSROOM_SNAPSHOTS"] = "0"
+os.environ["SMART_CLASSROOM_DISPATCH_INTERVAL"] = "0"
+os.environ["SMART_CLASSROOM_MAINTENANCE_INTERVAL"] = "0"
+os.environ["SMART_CLASSROOM_NOTIFICATION_LOG"] = os.devnull
+
+import pytest
+
+from config import get_db_path, set_db_path
+from db_setup import connect_db, initialize_database, isolated_database
+
+@pytest.fixture
+def db():
+    """A fresh, initialized in-memory database for one test."""
+    with isolated_database() as uri:
+        yield uri
+
+@pytest.fixture
+def file_db(tmp_path):
+    """A fresh, initialized database file, for tests that need real cross-connection locking."""
+    set_db_path(str(tmp_path / "test.db"))
+    try:
+        initialize_database()
+        yield get_db_path()
+    finally:
+        set_db_path(None)
+
+@pytest.fixture
+def app(db):
+    from app import configure_app
+    return configure_app({'TESTING': True, 'SYNC_TOKEN': None, 'MAINTENANCE_INTERVAL': 0,
+                          'NOTIFICATION_DISPATCH_INTERVAL': 0})
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def add_teacher(username, name=None, role='Teacher'):
+    """Inserts an approved teacher and returns the TeacherID."""
+    conn = connect_db()
+    try:
+        cursor = conn.execute("""
+            INSERT INTO Teachers (Name, Subject, Username, Password, Role, IsApproved)
+            VALUES (?, 'ICT', ?, 'secret', ?, 1)
+        """, (name or username.title(), username, role))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def room_id(name='SMART Lab 1'):
+    """RoomID of one of the default rooms created by initialize_database()."""
+    conn = connect_db()
+    try:
+        return conn.execute("SELECT RoomID FROM Classrooms WHERE Name = ?", (name,)).fetchone()[0]
+    finally:
+        conn.close()
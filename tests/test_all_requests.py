@@ -0,0 +1,66 @@
+# tests/test_all_requests.py
+#
+# The public request list: capped, filtered pages, streaming and the anonymous page cache.
+
+import pytest
+
+import cache_bus
+import metrics
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request, update_booking_status
+
+from conftest import add_teacher, room_id
+
+@pytest.fixture
+def page_client(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(cache_bus, 'VERSION_CHECK_SECONDS', 0)
+    monkeypatch.setattr(app_module, '_all_requests_cache', {})
+    return client
+
+def _book(teacher, day, hour, status=None):
+    assert submit_booking_request(teacher, room_id(), day, hour, '')
+    if status:
+        update_booking_status(_last_booking(), status)
+
+def _last_booking():
+    conn = connect_db()
+    try:
+        return conn.execute("SELECT MAX(BookingID) FROM Bookings").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_pages_are_filtered_and_capped(page_client):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    _book(alice, '2030-01-07', '09:00', 'Approved')
+    _book(bob, '2030-01-08', '09:00')
+    _book(bob, '2030-02-04', '09:00', 'Approved')
+
+    approved = page_client.get('/view_all_request?status=Approved&date_to=2030-01-31').get_data(as_text=True)
+    assert 'Alice' in approved and 'Bob' not in approved
+
+    first = page_client.get('/view_all_request?per_page=2').get_data(as_text=True)
+    second = page_client.get('/view_all_request?per_page=2&page=2').get_data(as_text=True)
+    assert first.count('<td>2030-') == 2 and second.count('<td>2030-') == 1
+    assert '>Next<' in first and '>Next<' not in second
+
+def test_flash_on_the_streamed_request_list_is_shown_once(page_client):
+    message = b'Only the first'
+    response = page_client.get('/view_all_request?page=100000', follow_redirects=True)
+    assert message in response.data
+    assert message not in page_client.get('/view_all_request').data
+
+def _hits():
+    return metrics.snapshot().get(('cache_lookups_total', ('all_requests', 'hit')), 0)
+
+def test_anonymous_page_is_cached_until_a_booking_changes(page_client):
+    alice = add_teacher('alice')
+    _book(alice, '2030-01-07', '09:00')
+    page = page_client.get('/view_all_request').get_data(as_text=True)
+    hits = _hits()
+    assert page_client.get('/view_all_request').get_data(as_text=True) == page
+    assert _hits() == hits + 1
+
+    update_booking_status(_last_booking(), 'Denied')
+    assert page_client.get('/view_all_request').get_data(as_text=True) != page
+    assert _hits() == hits + 1
@@ -0,0 +1,67 @@
+# tests/test_archive.py
+#
+# Archival of old bookings: the move itself, report totals and the history view.
+
+import archive
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request
+
+from conftest import add_teacher, room_id
+
+def _counts():
+    conn = connect_db()
+    try:
+        return conn.execute("""
+            SELECT Month, TeacherID, Status, SUM(Bookings) FROM BookingCounts GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        """).fetchall()
+    finally:
+        conn.close()
+
+def test_archival_moves_old_bookings_and_keeps_report_totals(file_db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    for teacher, day, hour in ((alice, '2020-01-06', '09:00'), (alice, '2020-01-07', '09:00'),
+                               (bob, '2020-02-03', '10:00'), (bob, '2030-01-07', '09:00')):
+        assert submit_booking_request(teacher, room_id(), day, hour, '')
+    conn = connect_db()
+    conn.execute("UPDATE Bookings SET Status = 'Approved' WHERE Date = '2020-01-06'")
+    conn.execute("UPDATE Bookings SET Status = NULL WHERE Date = '2020-02-03'")
+    conn.commit()
+    conn.close()
+    before = _counts()
+
+    # Batches of one, so the move spans several transactions.
+    assert archive.archive_bookings(retention_days=365, batch_size=1, sleep=0) == 3
+    assert archive.archive_bookings(retention_days=365, sleep=0) == 0
+    assert _counts() == before
+    assert ('2020-02', bob, 'Pending', 1) in before
+
+    conn = connect_db()
+    try:
+        assert conn.execute("SELECT Date FROM Bookings").fetchall() == [('2030-01-07',)]
+    finally:
+        conn.close()
+    assert sorted(archive.archive_status()) == [(0, 1, '2030-01-07', '2030-01-07'),
+                                                (1, 3, '2020-01-06', '2020-02-03')]
+
+def test_history_spans_live_and_archived_bookings(file_db):
+    alice = add_teacher('alice')
+    assert submit_booking_request(alice, room_id(), '2020-01-06', '09:00', '')
+    conn = archive.connect_history()
+    try:
+        # Without an archive file, AllBookings is the live table alone.
+        assert conn.execute("SELECT COUNT(*), SUM(Archived) FROM AllBookings").fetchone() == (1, 0)
+    finally:
+        conn.close()
+
+    archive.archive_bookings(retention_days=365, sleep=0)
+    assert submit_booking_request(alice, room_id(), '2030-01-07', '09:00', '')
+    conn = archive.connect_history()
+    try:
+        assert conn.execute("SELECT Date, Archived FROM AllBookings WHERE TeacherID = ? ORDER BY Date",
+                            (alice,)).fetchall() == [('2020-01-06', 1), ('2030-01-07', 0)]
+    finally:
+        conn.close()
+
+def test_memory_databases_are_not_archived(db):
+    assert submit_booking_request(add_teacher('alice'), room_id(), '2020-01-06', '09:00', '')
+    assert archive.archive_bookings(retention_days=365, sleep=0) == 0
@@ -0,0 +1,112 @@
+# tests/test_backup.py
+#
+# Online backups: round trip with the archive database, counters after a restore, rotation.
+
+import os
+
+import pytest
+
+import archive
+import backup
+import snapshots
+from change_log import get_changes_since, get_latest_seq
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request, update_booking_status
+
+from conftest import add_teacher, room_id
+
+@pytest.fixture
+def backup_dir(file_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    return tmp_path / 'backups'
+
+def _scalar(sql):
+    conn = connect_db()
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+def _history():
+    conn = archive.connect_history()
+    try:
+        return conn.execute("SELECT Date, Archived FROM AllBookings ORDER BY Date").fetchall()
+    finally:
+        conn.close()
+
+def test_restore_brings_back_the_live_and_archived_bookings(backup_dir):
+    alice = add_teacher('alice')
+    assert submit_booking_request(alice, room_id(), '2020-01-06', '09:00', '')
+    assert submit_booking_request(alice, room_id(), '2030-01-07', '09:00', '')
+    assert archive.archive_bookings(retention_days=365, sleep=0) == 1
+
+    path = backup.create_backup(sleep=0)
+    assert os.path.exists(backup._archive_artifact(path))
+    assert backup.list_backups() == [path]
+    assert backup.verify_backup(path) == ['ok']
+
+    # Later changes: a new booking, and the archive loses its rows.
+    assert submit_booking_request(alice, room_id(), '2030-01-08', '09:00', '')
+    conn = connect_db()
+    archive.attach_archive(conn)
+    conn.execute("DELETE FROM archive.Bookings")
+    conn.commit()
+    conn.close()
+
+    backup.restore_backup(path, verbose=False)
+    assert _history() == [('2020-01-06', 1), ('2030-01-07', 0)]
+
+def test_restore_moves_counters_past_their_old_values(backup_dir):
+    alice = add_teacher('alice')
+    assert submit_booking_request(alice, room_id(), '2030-01-07', '09:00', '')
+    path = backup.create_backup(sleep=0)
+
+    # Approving after the backup moves the feed, cache and change counters on.
+    update_booking_status(_scalar("SELECT MAX(BookingID) FROM Bookings"), 'Approved')
+    seq = get_latest_seq()
+    feed = _scalar("SELECT MAX(Version) FROM FeedVersions")
+    bookings_version = _scalar("SELECT Version FROM CacheVersions WHERE Domain = 'bookings'")
+    open(snapshots.snapshot_path(), 'w').close()
+
+    backup.restore_backup(path, verbose=False)
+    assert _scalar("SELECT Status FROM Bookings") == 'Pending'
+    assert get_latest_seq() > seq
+    assert _scalar("SELECT MIN(Version) FROM FeedVersions") > feed
+    assert _scalar("SELECT Version FROM CacheVersions WHERE Domain = 'bookings'") > bookings_version
+    assert not os.path.exists(snapshots.snapshot_path())
+
+    # A client that had seen the approval reloads, then follows new changes again.
+    result = get_changes_since(seq)
+    assert result['reset']
+    update_booking_status(_scalar("SELECT MAX(BookingID) FROM Bookings"), 'Denied')
+    changes = get_changes_since(result['next'])
+    assert not changes['reset'] and [change['row']['Status'] for change in changes['changes']] == ['Denied']
+
+def test_a_booking_archived_during_the_backup_is_restored_once(backup_dir):
+    alice = add_teacher('alice')
+    assert submit_booking_request(alice, room_id(), '2020-01-06', '09:00', '')
+    path = backup.create_backup(sleep=0)
+    assert archive.archive_bookings(retention_days=365, sleep=0) == 1
+
+    backup.restore_backup(path, verbose=False)
+    assert _history() == [('2020-01-06', 0)]
+
+def test_rotation_removes_archive_artifacts_too(backup_dir, monkeypatch):
+    assert submit_booking_request(add_teacher('alice'), room_id(), '2020-01-06', '09:00', '')
+    archive.archive_bookings(retention_days=365, sleep=0)
+    names = iter(['20300101_000001', '20300101_000002', '20300101_000003'])
+
+    class Clock:
+        @staticmethod
+        def now():
+            return Clock
+
+        @staticmethod
+        def strftime(_format):
+            return next(names)
+
+    monkeypatch.setattr(backup, 'datetime', Clock)
+    paths = [backup.create_backup('nightly', keep=2, sleep=0) for _ in range(3)]
+    assert backup.list_backups() == paths[:0:-1]
+    assert sorted(os.listdir(backup_dir)) == sorted(
+        os.path.basename(name) for path in paths[1:] for name in (path, backup._archive_artifact(path)))
@@ -0,0 +1,42 @@
+# tests/test_benchmark.py
+#
+# The seeded data set and the benchmark harness.
+
+import json
+
+import benchmark
+import seed_data
+from db_setup import connect_db
+
+SMALL = {'rooms': 3, 'teachers': 10, 'bookings': 200, 'material_requests': 20}
+
+def test_rows_are_reproducible_and_never_overlap():
+    rows = seed_data.generate_rows(SMALL, seed=1, years=[2030])
+    assert rows == seed_data.generate_rows(SMALL, seed=1, years=[2030])
+    assert rows['bookings'] != seed_data.generate_rows(SMALL, seed=2, years=[2030])['bookings']
+    slots = [(room, day, start) for room, _teacher, day, start, _end, _equipment, _status in rows['bookings']]
+    assert len(slots) == len(set(slots)) == SMALL['bookings']
+
+def test_seed_database_loads_every_table(db):
+    assert seed_data.seed_database(SMALL, years=[2030]) == SMALL
+    conn = connect_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM Bookings").fetchone()[0] == SMALL['bookings']
+        assert conn.execute("SELECT COUNT(*) FROM Teachers WHERE Username LIKE 'seed_teacher%'").fetchone()[0] == 10
+    finally:
+        conn.close()
+
+def test_benchmarks_run_against_a_seeded_database(db):
+    seed_data.seed_database(SMALL, years=[2030])
+    results = benchmark.run_benchmarks(iterations=3)
+    assert results['check_availability']['n'] == 30
+    assert all(result['p50_ms'] >= 0 for result in results.values())
+
+def test_compare_flags_a_slower_median(tmp_path):
+    def write(name, p50):
+        path = tmp_path / name
+        path.write_text(json.dumps({'commit': name, 'results': {'GET /': {'p50_ms': p50}}}))
+        return str(path)
+
+    assert benchmark.compare(write('old', 10.0), write('same', 11.0))
+    assert not benchmark.compare(write('before', 10.0), write('slower', 13.0))
@@ -0,0 +1,79 @@
+# tests/test_booking_view.py
+#
+# The BookingView read model: kept in step with Bookings, Teachers and Classrooms
+# by triggers, and rebuilt from scratch by maintenance.py rebuild-views.
+
+from db_setup import BOOKING_VIEW_COLUMNS, connect_db
+from maintenance import rebuild_views
+from smart_scheduler import submit_booking_request, update_booking_status
+
+from conftest import add_teacher, room_id
+
+def _query(sql, params=()):
+    conn = connect_db()
+    try:
+        return [tuple(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+def _execute(sql, params=()):
+    conn = connect_db()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _joined():
+    """What BookingView should hold, computed with the joins it replaces."""
+    return _query("""
+        SELECT B.BookingID, B.TeacherID, B.RoomID, B.Date, B.StartTime, B.EndTime, B.Equipment, B.Status,
+               T.Name, T.Subject, C.Name
+        FROM Bookings B
+        LEFT JOIN Teachers T ON B.TeacherID = T.TeacherID
+        LEFT JOIN Classrooms C ON B.RoomID = C.RoomID
+        ORDER BY B.BookingID
+    """)
+
+def _view():
+    return _query(f"SELECT {BOOKING_VIEW_COLUMNS} FROM BookingView ORDER BY BookingID")
+
+def _book(teacher, day, hour):
+    assert submit_booking_request(teacher, room_id(), day, hour, '')
+    return _query("SELECT MAX(BookingID) FROM Bookings")[0][0]
+
+def test_view_follows_booking_writes(db):
+    alice = add_teacher('alice')
+    first = _book(alice, '2030-01-07', '09:00')
+    second = _book(alice, '2030-01-07', '10:00')
+    assert _view() == _joined()
+    assert _view()[0][-3:] == ('Alice', 'ICT', 'SMART Lab 1')
+
+    update_booking_status(first, 'Approved')
+    _execute("UPDATE Bookings SET RoomID = ? WHERE BookingID = ?", (room_id('SMART Lab 2'), second))
+    assert _view() == _joined()
+    assert _query("SELECT Status FROM BookingView WHERE BookingID = ?", (first,)) == [('Approved',)]
+
+    _execute("DELETE FROM Bookings WHERE BookingID = ?", (first,))
+    assert _view() == _joined()
+    assert len(_view()) == 1
+
+def test_view_follows_teacher_and_room_renames(db):
+    alice = add_teacher('alice')
+    _book(alice, '2030-01-07', '09:00')
+
+    _execute("UPDATE Teachers SET Name = 'Alice Smith', Subject = 'Maths' WHERE TeacherID = ?", (alice,))
+    _execute("UPDATE Classrooms SET Name = 'Innovation Lab' WHERE RoomID = ?", (room_id(),))
+    assert _view() == _joined()
+    assert _view()[0][-3:] == ('Alice Smith', 'Maths', 'Innovation Lab')
+
+def test_rebuild_refills_a_view_out_of_step(db):
+    alice = add_teacher('alice')
+    _book(alice, '2030-01-07', '09:00')
+    _book(alice, '2030-01-08', '09:00')
+    _execute("DELETE FROM BookingView")
+    _execute("INSERT INTO BookingView (BookingID, TeacherID, RoomID, Date, StartTime, EndTime, Status)"
+             " VALUES (999, ?, ?, '2030-01-09', '09:00', '10:00', 'Pending')", (alice, room_id()))
+
+    assert rebuild_views() == 2
+    assert _view() == _joined()
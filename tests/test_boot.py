@@ -0,0 +1,38 @@
+# tests/test_boot.py
+#
+# Worker start-up: configure_app() and the cost of importing the wsgi entry point.
+
+import boot_check
+
+def test_configure_app_applies_settings_to_the_single_app(app):
+    from app import app as module_app, configure_app
+    from config import get_db_path
+
+    assert app is module_app
+    assert configure_app({'BOOT_TEST_FLAG': 1}) is app
+    assert app.config['BOOT_TEST_FLAG'] == 1
+    assert app.config['TESTING']
+    assert app.config['DATABASE'] == get_db_path()
+
+def test_init_command_creates_the_schema_and_the_admin(app, tmp_path):
+    from config import set_db_path
+    from db_setup import connect_db
+
+    set_db_path(str(tmp_path / 'init.db'))
+    try:
+        result = app.test_cli_runner().invoke(args=['init'])
+        assert result.exit_code == 0
+        conn = connect_db()
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM Teachers WHERE Role = 'ICT_Admin'").fetchone()[0] == 1
+        finally:
+            conn.close()
+    finally:
+        set_db_path(None)
+
+def test_importing_wsgi_stays_within_the_budget_and_off_the_database(tmp_path, monkeypatch):
+    database = tmp_path / 'boot.db'
+    monkeypatch.setenv('SMART_CLASSROOM_DB', str(database))
+    # Best of three fresh interpreters, so one slow start on a busy machine does not fail it.
+    assert any(boot_check.check_boot('wsgi') for _ in range(3))
+    assert not database.exists()
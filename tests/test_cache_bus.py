@@ -0,0 +1,65 @@
+# tests/test_cache_bus.py
+#
+# Cross-worker cache invalidation through CacheVersions.
+
+import pytest
+
+import backup
+import cache_bus
+from clear_db import clear_database
+from db_setup import connect_db, CACHE_DOMAINS
+from room_catalog import get_room_catalog
+from write_queue import run_write
+
+@pytest.fixture(autouse=True)
+def fresh_versions(monkeypatch):
+    # Re-read the versions on every lookup, as a new request would.
+    monkeypatch.setattr(cache_bus, 'VERSION_CHECK_SECONDS', 0)
+    get_room_catalog.cache_clear()
+
+def _add_room(name):
+    run_write(lambda conn: conn.execute("INSERT INTO Classrooms (Name) VALUES (?)", (name,)))
+
+def _room_names():
+    return sorted(room.Name for room in get_room_catalog().values())
+
+def test_a_write_invalidates_the_cache(db):
+    assert len(_room_names()) == 3
+    _add_room('Physics Lab')
+    assert 'Physics Lab' in _room_names()
+
+def test_a_write_from_another_connection_invalidates_the_cache(db):
+    _room_names()
+    conn = connect_db()
+    conn.execute("UPDATE Classrooms SET Name = 'Renamed Lab' WHERE Name = 'SMART Lab 1'")
+    conn.commit()
+    conn.close()
+    assert 'Renamed Lab' in _room_names()
+
+def test_missing_version_row_disables_caching(db):
+    conn = connect_db()
+    conn.execute("DELETE FROM CacheVersions WHERE Domain = 'rooms'")
+    conn.commit()
+    conn.close()
+    assert cache_bus.versions_of(('rooms',)) is None
+
+    _room_names()
+    _add_room('Chemistry Lab')  # its trigger bumps no row
+    assert 'Chemistry Lab' in _room_names()
+
+    cache_bus.bump('rooms')  # brings the row back
+    assert cache_bus.versions_of(('rooms',)) is not None
+
+def test_clear_db_keeps_the_version_counters(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, 'BACKUP_DIR', str(tmp_path))
+    assert _room_names()
+    before = dict(cache_bus.current_versions())
+
+    clear_database()
+    after = cache_bus.current_versions()
+    assert set(after) == set(CACHE_DOMAINS)
+    assert after['rooms'] > before['rooms']
+    assert _room_names() == []
+
+    _add_room('New Lab')
+    assert _room_names() == ['New Lab']
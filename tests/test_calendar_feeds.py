@@ -0,0 +1,116 @@
+# tests/test_calendar_feeds.py
+#
+# The per-teacher and per-room iCalendar feeds: approved bookings only, 304 for
+# an unchanged feed, and incremental rebuilds after FeedVersions is bumped.
+
+import pytest
+
+import calendar_feeds
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request, update_booking_status
+
+from conftest import add_teacher, room_id
+
+@pytest.fixture
+def feed_client(client, monkeypatch):
+    monkeypatch.setattr(calendar_feeds, '_feeds', {})
+    return client
+
+def _book(teacher, day, hour, status='Approved'):
+    assert submit_booking_request(teacher, room_id(), day, hour, '')
+    conn = connect_db()
+    try:
+        booking_id = conn.execute("SELECT MAX(BookingID) FROM Bookings").fetchone()[0]
+    finally:
+        conn.close()
+    if status:
+        update_booking_status(booking_id, status)
+    return booking_id
+
+def _execute(sql, params=()):
+    conn = connect_db()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _uids(response):
+    return [line for line in response.get_data(as_text=True).split("\r\n") if line.startswith("UID:")]
+
+def test_feed_lists_approved_bookings_only(feed_client):
+    alice = add_teacher('alice')
+    approved = _book(alice, '2030-01-07', '09:00')
+    _book(alice, '2030-01-08', '09:00', status=None)
+
+    response = feed_client.get(f'/calendar/teacher/{alice}.ics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/calendar'
+    body = response.get_data(as_text=True)
+    assert body.startswith("BEGIN:VCALENDAR\r\n") and body.endswith("END:VCALENDAR\r\n")
+    assert _uids(response) == [f"UID:booking-{approved}@smart-classroom"]
+    assert "DTSTART:20300107T090000" in body
+    assert "SUMMARY:SMART Lab 1 booking" in body
+
+    room = feed_client.get(f'/calendar/room/{room_id()}.ics')
+    assert _uids(room) == _uids(response)
+    assert "SUMMARY:Alice (ICT)" in room.get_data(as_text=True)
+
+def test_unknown_teacher_or_room_is_404(feed_client):
+    assert feed_client.get('/calendar/teacher/999.ics').status_code == 404
+    assert feed_client.get('/calendar/room/999.ics').status_code == 404
+
+def test_unchanged_feed_is_not_modified(feed_client):
+    alice = add_teacher('alice')
+    _book(alice, '2030-01-07', '09:00')
+    first = feed_client.get(f'/calendar/teacher/{alice}.ics')
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = feed_client.get(f'/calendar/teacher/{alice}.ics', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    since = feed_client.get(f'/calendar/teacher/{alice}.ics',
+                            headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+
+    # Pending bookings are not shown, so they leave the feed version alone.
+    _book(alice, '2030-01-08', '09:00', status=None)
+    assert feed_client.get(f'/calendar/teacher/{alice}.ics',
+                           headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+def test_approval_and_cancellation_change_the_feed(feed_client):
+    alice = add_teacher('alice')
+    first_booking = _book(alice, '2030-01-07', '09:00')
+    first = feed_client.get(f'/calendar/teacher/{alice}.ics')
+
+    second_booking = _book(alice, '2030-01-08', '09:00')
+    changed = feed_client.get(f'/calendar/teacher/{alice}.ics', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert _uids(changed) == [f"UID:booking-{first_booking}@smart-classroom",
+                              f"UID:booking-{second_booking}@smart-classroom"]
+
+    update_booking_status(first_booking, 'Cancelled')
+    assert _uids(feed_client.get(f'/calendar/teacher/{alice}.ics')) == [
+        f"UID:booking-{second_booking}@smart-classroom"]
+
+def test_renames_reach_the_cached_feeds(feed_client):
+    alice = add_teacher('alice')
+    _book(alice, '2030-01-07', '09:00')
+    feed_client.get(f'/calendar/teacher/{alice}.ics')
+    feed_client.get(f'/calendar/room/{room_id()}.ics')
+
+    _execute("UPDATE Classrooms SET Name = 'Innovation Lab' WHERE RoomID = ?", (room_id(),))
+    _execute("UPDATE Teachers SET Name = 'Alice Smith' WHERE TeacherID = ?", (alice,))
+    teacher_body = feed_client.get(f'/calendar/teacher/{alice}.ics').get_data(as_text=True)
+    room_body = feed_client.get(f'/calendar/room/{room_id("Innovation Lab")}.ics').get_data(as_text=True)
+    assert "SUMMARY:Innovation Lab booking" in teacher_body
+    assert "Alice Smith - classroom bookings" in teacher_body
+    assert "SUMMARY:Alice Smith (ICT)" in room_body
+
+def test_long_lines_are_folded_and_text_escaped():
+    line = "DESCRIPTION:" + "é" * 80
+    folded = calendar_feeds._fold(line)
+    assert all(len(part.encode("utf-8")) <= 75 for part in folded.split("\r\n"))
+    assert folded.replace("\r\n ", "") == line
+    assert calendar_feeds._escape("a,b;c\\d\ne") == "a\\,b\\;c\\\\d\\ne"
@@ -0,0 +1,72 @@
+# tests/test_change_log.py
+#
+# Delta sync: what is logged, compaction and access to /changes.
+
+import archive
+import change_log
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request
+
+from conftest import add_teacher, room_id
+
+def _ops(table='Bookings'):
+    conn = connect_db()
+    try:
+        return [op for (op,) in conn.execute("SELECT Op FROM ChangeLog WHERE TableName = ? ORDER BY Seq", (table,))]
+    finally:
+        conn.close()
+
+def test_changes_report_the_latest_state_per_row(db):
+    alice = add_teacher('alice')
+    since = change_log.get_latest_seq()
+    assert submit_booking_request(alice, room_id(), '2030-01-07', '09:00', '')
+    conn = connect_db()
+    conn.execute("UPDATE Bookings SET Status = 'Approved'")
+    conn.execute("DELETE FROM Teachers WHERE TeacherID = ?", (alice,))
+    conn.commit()
+    conn.close()
+
+    result = change_log.get_changes_since(since)
+    assert not result['reset'] and result['next'] == change_log.get_latest_seq()
+    assert [(change['table'], change['op']) for change in result['changes']] == [('Bookings', 'upsert'),
+                                                                                 ('Teachers', 'delete')]
+    assert result['changes'][0]['row']['Status'] == 'Approved'
+
+def test_archival_is_not_logged_as_deletes(file_db):
+    alice = add_teacher('alice')
+    assert submit_booking_request(alice, room_id(), '2020-01-06', '09:00', '')
+    assert submit_booking_request(alice, room_id(), '2020-01-06', '10:00', '')
+    assert archive.archive_bookings(retention_days=365, batch_size=1, sleep=0) == 2
+    assert _ops() == ['I', 'I']
+
+    # Other deletes still are, and the archival flag did not stay behind.
+    assert submit_booking_request(alice, room_id(), '2030-01-07', '09:00', '')
+    conn = connect_db()
+    conn.execute("DELETE FROM Bookings")
+    conn.commit()
+    conn.close()
+    assert _ops() == ['I', 'I', 'I', 'D']
+
+def test_compaction_keeps_the_newest_rows_and_raises_the_floor(db):
+    alice = add_teacher('alice')
+    for hour in ('08:00', '09:00', '10:00'):
+        assert submit_booking_request(alice, room_id(), '2030-01-07', hour, '')
+    conn = connect_db()
+    conn.execute("UPDATE Bookings SET Status = 'Approved'")
+    conn.commit()
+    conn.close()
+
+    assert change_log.compact_change_log(max_rows=2) == 5
+    result = change_log.get_changes_since(0)
+    assert result['reset']
+    assert change_log.get_changes_since(result['next'])['changes'] == []
+
+def test_changes_need_a_login_or_the_sync_token(app, client):
+    assert client.get('/changes').status_code == 401
+    app.config['SYNC_TOKEN'] = 'sync-secret'
+    assert client.get('/changes', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/changes', headers={'Authorization': 'Bearer sync-secret'}).status_code == 200
+
+    add_teacher('alice')
+    client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    assert client.get('/changes?since=0').get_json()['reset'] is False
@@ -0,0 +1,53 @@
+# tests/test_config.py
+#
+# Database location and the isolated in-memory databases the other tests run on.
+
+import sqlite3
+
+import pytest
+
+import config
+from config import get_db_path, set_db_path
+from db_setup import connect_db, isolated_database
+
+def test_db_path_resolution(monkeypatch, tmp_path):
+    monkeypatch.setenv(config.DB_ENV_VAR, str(tmp_path / 'env.db'))
+    assert get_db_path() == str(tmp_path / 'env.db')
+    set_db_path(str(tmp_path / 'explicit.db'))
+    try:
+        assert get_db_path() == str(tmp_path / 'explicit.db')
+    finally:
+        set_db_path(None)
+    monkeypatch.delenv(config.DB_ENV_VAR)
+    assert get_db_path() == config.DEFAULT_DB_FILE
+
+def test_memory_shorthand_selects_the_shared_cache_uri(monkeypatch):
+    monkeypatch.setenv(config.DB_ENV_VAR, ':memory:')
+    assert get_db_path() == config.SHARED_MEMORY_URI
+    assert config.is_memory_database()
+
+def test_isolated_databases_do_not_share_rows():
+    with isolated_database() as first:
+        conn = connect_db()
+        conn.execute("INSERT INTO Classrooms (Name) VALUES ('Only in the first')")
+        conn.commit()
+        conn.close()
+        with isolated_database() as second:
+            assert second != first
+            conn = connect_db()
+            assert conn.execute("SELECT COUNT(*) FROM Classrooms WHERE Name = 'Only in the first'").fetchone()[0] == 0
+            conn.close()
+
+def test_isolated_database_is_discarded_afterwards():
+    with isolated_database() as uri:
+        # Another connection opened while the block runs sees the initialized schema.
+        other = sqlite3.connect(uri, uri=True)
+        assert other.execute("SELECT COUNT(*) FROM Classrooms").fetchone()[0] == 3
+        other.close()
+    assert get_db_path() != uri
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("SELECT COUNT(*) FROM Classrooms")
+    finally:
+        conn.close()
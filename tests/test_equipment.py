@@ -0,0 +1,64 @@
+# tests/test_equipment.py
+#
+# Equipment inventory: parsing the free text, the migration and per-slot reservations.
+
+import equipment
+from db_setup import connect_db
+from smart_scheduler import run_database_migrations, submit_booking_request, update_booking_status
+
+from conftest import add_teacher, room_id
+
+DAY = '2030-03-04'
+
+def _pool():
+    conn = connect_db()
+    try:
+        return dict(conn.execute("SELECT Name, Quantity FROM Equipment").fetchall())
+    finally:
+        conn.close()
+
+def test_parse_equipment():
+    assert equipment.parse_equipment('Projector, 2x Speakers; 30 PCs') == [('Projector', 1), ('Speakers', 2), ('PCs', 30)]
+    assert equipment.parse_equipment('Speakers x2, speakers') == [('Speakers', 3)]
+    assert equipment.parse_equipment('Xbox 360\nBox 2') == [('Xbox 360', 1), ('Box 2', 1)]
+    assert equipment.parse_equipment('') == []
+
+def test_migration_leaves_the_pool_of_room_items_empty(db):
+    run_database_migrations()
+    pool = _pool()
+    assert pool['Projector'] == 0 and pool['Interactive Whiteboard'] == 0
+    assert equipment.migrate_equipment_strings() is None
+
+    alice = add_teacher('alice')
+    # Rooms with a projector of their own still get it; other rooms have none to borrow.
+    assert submit_booking_request(alice, room_id('SMART Lab 2'), DAY, '09:00', 'Projector')
+    assert not submit_booking_request(alice, room_id('Meeting Room A'), DAY, '09:00', 'Projector')
+
+    equipment.set_quantity('Projector', 1)
+    assert submit_booking_request(alice, room_id('Meeting Room A'), DAY, '09:00', 'Projector')
+    # A re-run keeps the counted pool.
+    assert equipment.migrate_equipment_strings(force=True) == (3, 2)
+    assert _pool()['Projector'] == 1
+
+def test_equipment_shortage_is_refused_until_the_item_is_freed(db):
+    run_database_migrations()
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    lab_2, meeting_room = room_id('SMART Lab 2'), room_id('Meeting Room A')
+    # Lab 2 has a projector of its own; the meeting room needs the pool's only one.
+    equipment.set_quantity('Projector', 1)
+
+    assert submit_booking_request(alice, meeting_room, DAY, '09:00', 'Projector')
+    assert not submit_booking_request(bob, room_id(), DAY, '09:00', 'Speakers, 2x Projector')
+    assert submit_booking_request(bob, lab_2, DAY, '09:00', 'Projector')
+    assert submit_booking_request(bob, meeting_room, DAY, '10:00', 'Projector')
+    # Free text that names no inventory item is only a note.
+    assert submit_booking_request(bob, room_id(), DAY, '13:00', 'Extension cable')
+
+    conn = connect_db()
+    try:
+        first = conn.execute("SELECT BookingID FROM Bookings WHERE RoomID = ? AND StartTime = '09:00'",
+                             (meeting_room,)).fetchone()[0]
+    finally:
+        conn.close()
+    assert update_booking_status(first, 'Denied')
+    assert submit_booking_request(bob, room_id(), DAY, '09:00', 'Projector x 2')
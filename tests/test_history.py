@@ -0,0 +1,59 @@
+# tests/test_history.py
+#
+# Keyset-paginated booking history, across the live table and the archive.
+
+import archive
+from smart_scheduler import get_teacher_booking_history, submit_booking_request
+
+from conftest import add_teacher, room_id
+
+PAST = [('2020-01-06', '09:00'), ('2020-01-06', '10:00'), ('2024-05-06', '09:00')]
+UPCOMING = [('2030-01-07', '09:00'), ('2030-01-07', '11:00'), ('2031-03-03', '08:00')]
+
+def _book_all(teacher):
+    for day, hour in PAST + UPCOMING:
+        assert submit_booking_request(teacher, room_id(), day, hour, '')
+
+def _walk(teacher, **filters):
+    """Follows next_cursor to the end; returns the (Date, StartTime) pairs in page order."""
+    seen, cursor = [], None
+    while True:
+        page = get_teacher_booking_history(teacher, cursor=cursor, limit=2, **filters)
+        assert len(page['bookings']) <= 2
+        seen += [(booking['Date'], booking['StartTime']) for booking in page['bookings']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return seen
+
+def test_pages_follow_each_other_without_gaps(db):
+    alice = add_teacher('alice')
+    _book_all(alice)
+    assert submit_booking_request(add_teacher('bob'), room_id(), '2030-01-07', '10:00', '')
+
+    assert _walk(alice) == UPCOMING
+    assert _walk(alice, scope='past') == sorted(PAST, reverse=True)
+    assert _walk(alice, scope='all') == sorted(PAST + UPCOMING, reverse=True)
+    assert _walk(alice, scope='all', date_from='2024-01-01', date_to='2030-12-31') == [
+        ('2030-01-07', '11:00'), ('2030-01-07', '09:00'), ('2024-05-06', '09:00')]
+
+def test_past_pages_continue_into_the_archive(file_db):
+    alice = add_teacher('alice')
+    _book_all(alice)
+    assert archive.archive_bookings(retention_days=365 * 3, sleep=0) == 2
+    assert _walk(alice, scope='past') == sorted(PAST, reverse=True)
+    assert _walk(alice) == UPCOMING
+
+def test_a_broken_cursor_starts_from_the_first_page(db):
+    alice = add_teacher('alice')
+    _book_all(alice)
+    page = get_teacher_booking_history(alice, cursor='not-a-cursor', limit=2)
+    assert [booking['Date'] for booking in page['bookings']] == ['2030-01-07', '2030-01-07']
+
+def test_history_api_needs_a_login(client):
+    assert client.get('/api/teacher/bookings').status_code == 401
+    alice = add_teacher('alice')
+    _book_all(alice)
+    client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    data = client.get('/api/teacher/bookings?scope=past&limit=2').get_json()
+    assert [booking['Date'] for booking in data['bookings']] == ['2024-05-06', '2020-01-06']
+    assert data['next_cursor']
@@ -0,0 +1,26 @@
+# tests/test_maintenance.py
+#
+# Housekeeping tasks and the idle scheduler's once-per-interval claim.
+
+import maintenance
+
+from conftest import add_teacher
+
+def test_file_database_runs_in_wal_mode_and_checkpoints(file_db):
+    add_teacher('alice')
+    assert maintenance.file_stats()['journal_mode'] == 'wal'
+    busy, wal_pages, checkpointed = maintenance.checkpoint("TRUNCATE")
+    assert busy == 0 and wal_pages == checkpointed
+
+def test_memory_database_has_nothing_to_checkpoint(db):
+    assert maintenance.checkpoint() is None
+
+def test_idle_maintenance_runs_the_cheap_tasks(file_db):
+    done = maintenance.run_idle_maintenance()
+    assert done['optimize'] and done['checkpoint'] is not None
+    assert done['holds_expired'] == 0
+
+def test_only_one_run_is_claimed_per_interval(file_db):
+    assert maintenance._claim_run(3600)
+    assert not maintenance._claim_run(3600)
+    assert maintenance._claim_run(0)
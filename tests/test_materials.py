@@ -0,0 +1,134 @@
+# tests/test_materials.py
+#
+# Material stock: the loan sweep, the approval check and the stock endpoint.
+
+import random
+from datetime import date, timedelta
+
+import materials
+from db_setup import connect_db
+
+from conftest import add_teacher
+
+def _days(first, last):
+    day = date.fromisoformat(first)
+    while day <= date.fromisoformat(last):
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+def _request(conn, name, borrowed, returned, status='Pending'):
+    return conn.execute("""
+        INSERT INTO MaterialRequests (FullName, Gender, PhoneNumber, MaterialName, BorrowedDate, ReturnedDate,
+                                      LetterFile, Status)
+        VALUES ('Test Teacher', 'F', '0780000000', ?, ?, ?, 'letter.pdf', ?)
+    """, (name, borrowed, returned, status)).lastrowid
+
+def _stock(name):
+    conn = connect_db()
+    try:
+        return conn.execute("SELECT Stock, LongestLoanDays FROM Materials WHERE Name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+
+# --- SWEEP ---
+
+def test_sweep_matches_a_count_per_day():
+    rng = random.Random(7)
+    start = date(2030, 1, 1)
+    loans = []
+    for _ in range(60):
+        borrowed = start + timedelta(days=rng.randrange(-10, 40))
+        loans.append((borrowed.isoformat(), (borrowed + timedelta(days=rng.randrange(0, 8))).isoformat()))
+
+    steps = materials.sweep_loans(loans, '2030-01-01', '2030-01-31')
+    assert steps[0][0] == '2030-01-01' and steps[-1][1] == '2030-01-31'
+    for first, last, out in steps:
+        for day in _days(first, last):
+            assert out == sum(1 for borrowed, returned in loans if borrowed <= day <= returned)
+
+def test_sweep_without_loans_is_one_empty_step():
+    assert materials.sweep_loans([], '2030-01-01', '2030-01-05') == [('2030-01-01', '2030-01-05', 0)]
+
+# --- STOCK CHECKS ---
+
+def test_check_loan_refuses_more_units_than_in_stock(db):
+    materials.set_stock('Laptop', 2)
+    conn = connect_db()
+    try:
+        _request(conn, 'Laptop', '2030-02-01', '2030-02-05', 'Approved')
+        _request(conn, 'laptop', '2030-02-04', '2030-02-10', 'Approved')
+        overlapping = _request(conn, 'Laptop', '2030-02-05', '2030-02-06')
+        after = _request(conn, 'Laptop', '2030-02-11', '2030-02-12')
+        conn.commit()
+
+        assert materials.check_loan(conn.cursor(), overlapping) == ('Laptop', 2, 2)
+        assert materials.check_loan(conn.cursor(), after) is None
+    finally:
+        conn.close()
+
+def test_new_material_is_not_limited_until_its_stock_is_set(db):
+    conn = connect_db()
+    try:
+        materials.track_material(conn.cursor(), 'Microscope')
+        _request(conn, 'Microscope', '2030-03-01', '2030-03-04', 'Approved')
+        second = _request(conn, 'Microscope', '2030-03-02', '2030-03-03')
+        conn.commit()
+        assert materials.check_loan(conn.cursor(), second) is None
+    finally:
+        conn.close()
+    # The longest loan is kept from the first approval on, ready for when the stock is set.
+    assert _stock('Microscope') == (None, 3)
+
+    materials.set_stock('Microscope', 1)
+    conn = connect_db()
+    try:
+        assert materials.check_loan(conn.cursor(), second) == ('Microscope', 1, 1)
+        # Requesting it again keeps the stock that was set.
+        materials.track_material(conn.cursor(), 'microscope')
+        conn.commit()
+    finally:
+        conn.close()
+    assert _stock('Microscope') == (1, 3)
+
+def test_migration_tracks_requested_materials_without_a_stock(db):
+    conn = connect_db()
+    _request(conn, 'Tablet', '2030-01-01', '2030-01-08', 'Approved')
+    _request(conn, 'Camera', '2030-01-01', '2030-01-02')
+    conn.commit()
+    conn.close()
+
+    assert materials.migrate_material_stock() == 2
+    assert materials.migrate_material_stock() is None
+    assert _stock('Tablet') == (None, 7)
+    assert _stock('Camera') == (None, 0)
+
+# --- ROUTES ---
+
+def _log_in(client, role):
+    add_teacher('staff', role=role)
+    client.post('/login', data={'username': 'staff', 'password': 'secret'})
+
+def test_stock_endpoint_needs_an_admin(client):
+    assert client.get('/admin/material_stock').status_code == 403
+    _log_in(client, 'Teacher')
+    assert client.get('/admin/material_stock').status_code == 403
+
+def test_stock_endpoint_reports_units_out_and_free(client):
+    _log_in(client, 'ICT_Admin')
+    materials.set_stock('Laptop', 3)
+    conn = connect_db()
+    _request(conn, 'Laptop', '2030-02-02', '2030-02-03', 'Approved')
+    _request(conn, 'Projector', '2030-02-01', '2030-02-01', 'Approved')
+    materials.track_material(conn.cursor(), 'Projector')
+    conn.commit()
+    conn.close()
+
+    data = client.get('/admin/material_stock?start=2030-02-01&end=2030-02-04').get_json()
+    assert data['Laptop'] == {'stock': 3, 'periods': [
+        {'from': '2030-02-01', 'to': '2030-02-01', 'out': 0, 'free': 3},
+        {'from': '2030-02-02', 'to': '2030-02-03', 'out': 1, 'free': 2},
+        {'from': '2030-02-04', 'to': '2030-02-04', 'out': 0, 'free': 3},
+    ]}
+    assert data['Projector']['stock'] is None
+    assert data['Projector']['periods'][0] == {'from': '2030-02-01', 'to': '2030-02-01', 'out': 1, 'free': None}
+    assert client.get('/admin/material_stock?start=2030-02-04&end=2030-02-01').status_code == 400
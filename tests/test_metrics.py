@@ -0,0 +1,59 @@
+# tests/test_metrics.py
+#
+# Metric types, the text exposition and the /metrics endpoint.
+
+import threading
+
+import metrics
+import write_queue
+
+def _value(name, labels=()):
+    return metrics.snapshot().get((name, tuple(labels)), 0)
+
+def test_counters_from_exited_threads_are_kept():
+    before = _value('upload_bytes_total', ('letter',))
+    threads = [threading.Thread(target=metrics.UPLOAD_BYTES.inc, args=('letter',), kwargs={'amount': 10})
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _value('upload_bytes_total', ('letter',)) - before == 50
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('test_histogram_seconds', 'Test.', ('route',), buckets=(0.1, 1.0))
+    try:
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, 'home')
+        lines = metrics.render().splitlines()
+        assert 'test_histogram_seconds_bucket{route="home",le="0.1"} 1' in lines
+        assert 'test_histogram_seconds_bucket{route="home",le="1.0"} 2' in lines
+        assert 'test_histogram_seconds_bucket{route="home",le="+Inf"} 3' in lines
+        assert 'test_histogram_seconds_count{route="home"} 3' in lines
+    finally:
+        del metrics._registry['test_histogram_seconds']
+
+def test_queued_writes_count_as_connection_reuses(file_db):
+    write_queue._reset_after_fork()
+    write_queue.set_mode('queue')
+    try:
+        before = _value('db_connection_reuses_total')
+        for _ in range(3):
+            write_queue.run_write(lambda conn: conn.execute("SELECT 1"))
+        assert _value('db_connection_reuses_total') - before == 3
+    finally:
+        write_queue.set_mode('direct')
+        write_queue._reset_after_fork()
+
+def test_metrics_endpoint_is_local_only_without_a_token(app, client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'db_connection_reuses_total' in response.get_data(as_text=True)
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 403
+
+def test_metrics_endpoint_needs_the_token_when_one_is_set(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/metrics').status_code == 403
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'},
+                          headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
@@ -0,0 +1,116 @@
+# tests/test_notifications.py
+#
+# The notification outbox: enqueueing with the status change, dispatch, retries and rate limits.
+
+import pytest
+
+import notifications
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request, update_booking_status
+from write_queue import run_write
+
+from conftest import add_teacher, room_id
+
+@pytest.fixture
+def transport(monkeypatch):
+    """Replaces the transports with one that records the messages; set `fail` to make it refuse them."""
+    def send(messages):
+        send.messages.extend(messages)
+        return {message.OutboxID: send.fail for message in messages}
+
+    send.messages, send.fail = [], None
+    monkeypatch.setattr(notifications, 'transport_for', lambda channel: send)
+    return send
+
+def _booking(phone='0788123456', email='alice@example.org'):
+    teacher = add_teacher('alice')
+    conn = connect_db()
+    conn.execute("UPDATE Teachers SET Phone = ?, Email = ? WHERE TeacherID = ?", (phone, email, teacher))
+    conn.commit()
+    conn.close()
+    assert submit_booking_request(teacher, room_id(), '2030-03-04', '09:00', '')
+    conn = connect_db()
+    try:
+        return conn.execute("SELECT BookingID FROM Bookings").fetchone()[0]
+    finally:
+        conn.close()
+
+def _outbox():
+    conn = connect_db()
+    try:
+        return conn.execute("SELECT Channel, Recipient, Status, Attempts FROM NotificationOutbox ORDER BY OutboxID").fetchall()
+    finally:
+        conn.close()
+
+def test_decision_queues_sms_and_email(db):
+    booking_id = _booking()
+    assert update_booking_status(booking_id, 'Approved')
+    assert _outbox() == [('sms', '+250788123456', 'Pending', 0), ('email', 'alice@example.org', 'Pending', 0)]
+    # Cancelling is not a decision the teacher is told about.
+    assert update_booking_status(booking_id, 'Cancelled')
+    assert len(_outbox()) == 2
+
+def test_message_rolls_back_with_its_write(db):
+    booking_id = _booking()
+
+    def approve_then_fail(conn):
+        conn.execute("UPDATE Bookings SET Status = 'Approved' WHERE BookingID = ?", (booking_id,))
+        notifications.notify_booking_status(conn, booking_id, 'Approved')
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        run_write(approve_then_fail)
+    assert _outbox() == []
+
+def test_dispatch_sends_and_retries_with_backoff(db, transport):
+    booking_id = _booking(email=None)
+    update_booking_status(booking_id, 'Approved')
+
+    transport.fail = "provider down"
+    assert notifications.dispatch_once() == {'sms': (0, 1)}
+    assert _outbox() == [('sms', '+250788123456', 'Pending', 1)]
+    # Not due again until the backoff has passed.
+    assert notifications.dispatch_once() == {}
+
+    conn = connect_db()
+    conn.execute("UPDATE NotificationOutbox SET NextAttemptAt = datetime('now', '-1 second')")
+    conn.commit()
+    conn.close()
+    transport.fail = None
+    assert notifications.dispatch_once() == {'sms': (1, 0)}
+    assert _outbox() == [('sms', '+250788123456', 'Sent', 2)]
+    assert [message.Recipient for message in transport.messages] == ['+250788123456'] * 2
+
+def test_message_fails_for_good_after_max_attempts(db, transport, monkeypatch):
+    monkeypatch.setattr(notifications, 'MAX_ATTEMPTS', 1)
+    update_booking_status(_booking(email=None), 'Denied')
+    transport.fail = "invalid number"
+    notifications.dispatch_once()
+    assert _outbox()[0][2] == 'Failed'
+    assert notifications.retry_failed() == 1
+    assert _outbox()[0][2:] == ('Pending', 0)
+
+def test_rate_limit_is_counted_from_the_outbox(db, transport, monkeypatch):
+    monkeypatch.setitem(notifications.RATE_LIMITS, 'sms', 3)
+
+    def enqueue_many(conn):
+        for n in range(5):
+            notifications.enqueue(conn, 'sms', f'07880000{n:02d}', 'hello')
+
+    run_write(enqueue_many)
+    assert notifications.dispatch_once() == {'sms': (3, 0)}
+    # The three sent in the last minute use up the limit, also for other workers.
+    assert notifications.dispatch_once() == {}
+    assert [status for _channel, _recipient, status, _attempts in _outbox()].count('Pending') == 2
+
+def test_admin_edit_of_the_status_notifies_the_teacher(client):
+    booking_id = _booking(email=None)
+    form = {'date': '2030-03-04', 'start_time': '09:00', 'end_time': '09:40', 'equipment': ''}
+
+    client.post(f'/edit_booking/{booking_id}', data=dict(form, status='Pending'))
+    assert _outbox() == []
+    client.post(f'/edit_booking/{booking_id}', data=dict(form, status='Approved'))
+    assert _outbox() == [('sms', '+250788123456', 'Pending', 0)]
+    # Saving again without changing the decision sends nothing new.
+    client.post(f'/edit_booking/{booking_id}', data=dict(form, status='Approved', equipment='Projector'))
+    assert len(_outbox()) == 1
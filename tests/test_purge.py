@@ -0,0 +1,59 @@
+# tests/test_purge.py
+#
+# Soft-deleting a teacher and purging their bookings in batches.
+
+import archive
+import purge
+from db_setup import connect_db
+from smart_scheduler import delete_teacher_by_id, get_teacher_by_username, submit_booking_request
+
+from conftest import add_teacher, room_id
+
+def _scalar(sql, params=()):
+    conn = connect_db()
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+def _book(teacher, days):
+    for day in days:
+        for hour in ('08:00', '09:00', '10:00'):
+            assert submit_booking_request(teacher, room_id(), day, hour, '')
+
+def test_soft_delete_hides_the_teacher_and_cancels_upcoming_bookings(db):
+    alice = add_teacher('alice')
+    _book(alice, ['2020-01-06', '2030-01-07'])
+    assert delete_teacher_by_id(alice)
+    assert get_teacher_by_username('alice') is None
+    assert _scalar("SELECT COUNT(*) FROM Bookings WHERE Status = 'Cancelled'") == 3
+    assert _scalar("SELECT COUNT(*) FROM Bookings WHERE Status = 'Pending'") == 3
+    assert purge.pending_purges()[0][3] == 6
+
+    # Admins cannot be deleted.
+    assert not delete_teacher_by_id(add_teacher('root', role='ICT_Admin'))
+
+def test_purge_removes_bookings_in_batches(db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    _book(alice, ['2030-01-07', '2030-01-08'])
+    assert submit_booking_request(bob, room_id(), '2030-01-09', '09:00', '')
+    delete_teacher_by_id(alice)
+
+    progress = []
+    results = purge.purge_deleted_teachers(batch_size=4, sleep=0,
+                                           progress=lambda teacher, removed: progress.append(removed))
+    assert results == {alice: 6}
+    assert progress == [4, 6]
+    assert _scalar("SELECT COUNT(*) FROM Teachers WHERE TeacherID = ?", (alice,)) == 0
+    assert _scalar("SELECT COUNT(*) FROM Bookings") == 1
+    assert purge.pending_purges() == []
+
+def test_purge_clears_the_archive_and_its_report_counts(file_db):
+    alice = add_teacher('alice')
+    _book(alice, ['2020-01-06'])
+    assert archive.archive_bookings(retention_days=365, sleep=0) == 3
+    delete_teacher_by_id(alice)
+
+    assert purge.purge_deleted_teachers(batch_size=2, sleep=0) == {alice: 3}
+    assert _scalar("SELECT COUNT(*) FROM BookingCounts") == 0
+    assert archive.archive_status() == []
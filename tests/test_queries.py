@@ -0,0 +1,47 @@
+# tests/test_queries.py
+#
+# The query plan guard: every hot query must keep using its index.
+
+import pytest
+
+from db_setup import connect_db
+from queries import HOT_QUERIES, HotQuery, check_query_plans, explain, full_scans
+from smart_scheduler import submit_booking_request, update_booking_status
+
+from conftest import add_teacher, room_id
+
+def test_hot_queries_use_their_indexes():
+    # Smaller than the `queries.py --check` default, but large enough for the planner to prefer the indexes.
+    assert check_query_plans(bookings=2000) == {}
+
+def test_a_full_scan_is_reported(db):
+    query = HotQuery('unindexed', "SELECT * FROM Bookings WHERE Equipment = ?", ('Projector',), {}, False)
+    conn = connect_db()
+    try:
+        assert full_scans(query, explain(conn, query))
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_registered_query_runs(db, name):
+    query = HOT_QUERIES[name]
+    conn = connect_db()
+    try:
+        conn.execute(query.sql.format(**query.sample_format), query.sample_params).fetchall()
+    finally:
+        conn.close()
+
+def test_report_pages_read_the_registered_queries(client):
+    import app
+
+    alice = add_teacher('alice')
+    add_teacher('bob', role='ICT_Admin')
+    for hour in ('09:00', '10:00'):
+        assert submit_booking_request(alice, room_id(), '2030-01-07', hour, '')
+    update_booking_status(1, 'Approved')
+
+    assert app.calculate_teacher_ranking() == [('Alice', 1)]
+    assert app.calculate_subject_ranking() == [('ICT', 1)]
+    client.post('/login', data={'username': 'bob', 'password': 'secret'})
+    assert client.get('/admin/reports').status_code == 200
+    assert client.get('/booking_reports').status_code == 200
@@ -0,0 +1,47 @@
+# tests/test_records.py
+#
+# Compact row records built by the record_factory() row factories.
+
+import json
+
+import pytest
+
+from db_setup import booking_row, connect_db, record_factory, record_type, teacher_row
+
+from conftest import add_teacher
+
+def test_records_read_like_tuples_dicts_and_objects(db):
+    add_teacher('alice')
+    conn = connect_db(teacher_row)
+    try:
+        row = conn.execute("SELECT TeacherID, Name, Role, COUNT(*) FROM Teachers").fetchone()
+    finally:
+        conn.close()
+
+    assert row.Name == row['Name'] == row[1] == row.get('Name') == 'Alice'
+    assert row.get('Missing', 'default') == 'default'
+    assert list(row.keys()) == ['TeacherID', 'Name', 'Role', 'COUNT(*)']
+    assert dict(row) == {'TeacherID': 1, 'Name': 'Alice', 'Role': 'Teacher', 'COUNT(*)': 1}
+    assert row['COUNT(*)'] == row._3 == 1
+    assert tuple(row) == (1, 'Alice', 'Teacher', 1)
+    assert json.loads(json.dumps(row._asdict()))['Role'] == 'Teacher'
+    with pytest.raises(AttributeError):
+        row.Name = 'Bob'
+    with pytest.raises(KeyError):
+        row['Missing']
+
+def test_one_class_per_name_and_column_list(db):
+    assert record_type('Booking', ('BookingID', 'Date')) is record_type('Booking', ('BookingID', 'Date'))
+    assert record_type('Booking', ('BookingID',)) is not record_type('Booking', ('BookingID', 'Date'))
+    assert not hasattr(record_type('Booking', ('BookingID',))(1), '__dict__')
+
+def test_factory_follows_the_columns_of_each_query(db):
+    factory = record_factory('Row')
+    conn = connect_db(factory)
+    try:
+        first = conn.execute("SELECT 1 AS A").fetchone()
+        second = conn.execute("SELECT 2 AS B, 3 AS C").fetchone()
+    finally:
+        conn.close()
+    assert dict(first) == {'A': 1} and dict(second) == {'B': 2, 'C': 3}
+    assert type(first).__name__ == 'Row' and booking_row.__name__ == 'booking_row'
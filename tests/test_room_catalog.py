@@ -0,0 +1,70 @@
+# tests/test_room_catalog.py
+#
+# The in-memory room catalog and its invalidation through the 'rooms' cache version.
+
+import pytest
+
+import cache_bus
+from db_setup import booking_row, connect_db
+from room_catalog import get_room, get_room_catalog, room_name, with_room_names
+from smart_scheduler import submit_booking_request
+
+from conftest import add_teacher, room_id
+
+@pytest.fixture
+def catalog(db, monkeypatch):
+    monkeypatch.setattr(cache_bus, 'VERSION_CHECK_SECONDS', 0)
+    get_room_catalog.cache_clear()
+    yield
+    get_room_catalog.cache_clear()
+
+def _execute(sql, params=()):
+    conn = connect_db()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_catalog_lists_rooms_by_name(catalog):
+    rooms = get_room_catalog()
+    names = [room.Name for room in rooms.values()]
+    assert names == sorted(names)
+    lab = get_room(room_id())
+    assert lab.Name == room_name(room_id()) == 'SMART Lab 1'
+    assert get_room(-1) is None and room_name(-1) is None
+
+def test_catalog_is_reused_until_classrooms_change(catalog):
+    first = get_room_catalog()
+    assert get_room_catalog() is first
+
+    _execute("UPDATE Classrooms SET Name = 'Innovation Lab' WHERE RoomID = ?", (room_id(),))
+    renamed = get_room_catalog()
+    assert renamed is not first
+    assert room_name(room_id('Innovation Lab')) == 'Innovation Lab'
+
+    _execute("INSERT INTO Classrooms (Name, EquipmentList) VALUES ('Annex', '')")
+    assert get_room(room_id('Annex')).Name == 'Annex'
+
+def test_unrelated_writes_keep_the_catalog(catalog):
+    first = get_room_catalog()
+    add_teacher('alice')
+    assert get_room_catalog() is first
+
+def test_with_room_names_swaps_the_id_for_the_name(catalog):
+    teacher = add_teacher('alice')
+    assert submit_booking_request(teacher, room_id(), '2030-01-07', '09:00', '')
+    _execute("INSERT INTO Bookings (TeacherID, RoomID, Date, StartTime, EndTime, Status)"
+             " VALUES (?, 999, '2030-01-08', '09:00', '10:00', 'Pending')", (teacher,))
+    conn = connect_db(booking_row)
+    try:
+        rows = conn.execute("SELECT BookingID, RoomID, Date FROM Bookings ORDER BY Date").fetchall()
+    finally:
+        conn.close()
+
+    named = list(with_room_names(rows))
+    assert named[0].RoomName == named[0][1] == 'SMART Lab 1'
+    assert named[0].Date == '2030-01-07'
+    assert 'RoomID' not in named[0].keys()
+    assert named[1].RoomName is None
+    assert list(with_room_names([])) == []
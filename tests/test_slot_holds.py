@@ -0,0 +1,67 @@
+# tests/test_slot_holds.py
+#
+# Short-lived slot holds: blocking other teachers, conversion on booking,
+# expiry, one hold per teacher and release.
+
+import slot_holds
+from db_setup import connect_db
+from smart_scheduler import calculate_end_time, submit_booking_request
+
+from conftest import add_teacher, room_id
+
+DAY = '2030-03-04'
+
+def _holds():
+    conn = connect_db()
+    try:
+        return conn.execute("SELECT TeacherID, StartTime FROM SlotHolds ORDER BY StartTime").fetchall()
+    finally:
+        conn.close()
+
+def test_hold_blocks_other_teachers_and_converts_on_booking(db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    room = room_id()
+    end = calculate_end_time('11:00')
+    assert slot_holds.place_hold(alice, room, DAY, '11:00', end) is not None
+    assert slot_holds.place_hold(bob, room, DAY, '11:00', end) is None
+    assert not submit_booking_request(bob, room, DAY, '11:00', '')
+
+    assert submit_booking_request(alice, room, DAY, '11:00', '')
+    assert _holds() == []
+
+def test_live_hold_is_not_taken_over_but_expired_one_is(db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    room = room_id()
+    end = calculate_end_time('12:00')
+    assert slot_holds.place_hold(alice, room, DAY, '12:00', end) is not None
+    assert slot_holds.place_hold(bob, room, DAY, '12:00', end) is None
+    # Renewing your own hold is allowed.
+    assert slot_holds.place_hold(alice, room, DAY, '12:00', end) is not None
+
+    assert slot_holds.place_hold(alice, room, DAY, '13:00', calculate_end_time('13:00'), ttl=-1) is not None
+    assert slot_holds.place_hold(bob, room, DAY, '13:00', calculate_end_time('13:00')) is not None
+
+def test_a_teacher_holds_one_slot_at_a_time(db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    room = room_id()
+    assert slot_holds.place_hold(alice, room, DAY, '09:00', calculate_end_time('09:00')) is not None
+    assert slot_holds.place_hold(alice, room, DAY, '14:00', calculate_end_time('14:00')) is not None
+    assert [tuple(row) for row in _holds()] == [(alice, '14:00')]
+    assert slot_holds.place_hold(bob, room, DAY, '09:00', calculate_end_time('09:00')) is not None
+
+def test_released_hold_frees_the_slot(db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    room = room_id()
+    end = calculate_end_time('14:00')
+    assert slot_holds.place_hold(alice, room, DAY, '14:00', end) is not None
+    slot_holds.release_hold(alice)
+    assert submit_booking_request(bob, room, DAY, '14:00', '')
+
+def test_sweep_removes_only_expired_holds(db):
+    alice, bob = add_teacher('alice'), add_teacher('bob')
+    room = room_id()
+    assert slot_holds.place_hold(bob, room, DAY, '10:00', calculate_end_time('10:00')) is not None
+    # Placed last, so no later hold of this worker has expired it lazily.
+    assert slot_holds.place_hold(alice, room, DAY, '09:00', calculate_end_time('09:00'), ttl=-1) is not None
+    assert slot_holds.sweep_expired_holds() == 1
+    assert [tuple(row) for row in _holds()] == [(bob, '10:00')]
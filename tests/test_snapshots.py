@@ -0,0 +1,68 @@
+# tests/test_snapshots.py
+#
+# The report snapshot: copies, staleness and which database reports read.
+
+import os
+import sqlite3
+
+import pytest
+
+import snapshots
+from db_setup import connect_db
+
+from conftest import add_teacher
+
+@pytest.fixture
+def snapshots_on(file_db, monkeypatch):
+    monkeypatch.setattr(snapshots, 'enabled', True)
+    refreshes = []
+    monkeypatch.setattr(snapshots, 'request_refresh', lambda: refreshes.append(1))
+    return refreshes
+
+def _teachers(conn):
+    try:
+        return conn.execute("SELECT COUNT(*) FROM Teachers").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_reports_read_the_snapshot_until_it_is_refreshed(snapshots_on):
+    add_teacher('alice')
+    assert snapshots.refresh_snapshot() is not None
+    add_teacher('bob')
+
+    assert _teachers(snapshots.connect_snapshot()) == 1
+    assert snapshots_on == []
+    snapshots.refresh_snapshot()
+    assert _teachers(snapshots.connect_snapshot()) == 2
+
+def test_snapshot_is_a_read_only_plain_file(snapshots_on):
+    snapshots.refresh_snapshot()
+    conn = snapshots.connect_snapshot()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM Teachers")
+    finally:
+        conn.close()
+    assert not os.path.exists(snapshots.snapshot_path() + '-wal')
+
+def test_too_many_changes_make_the_snapshot_stale(snapshots_on, monkeypatch):
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_MAX_CHANGES', 2)
+    snapshots.refresh_snapshot()
+    assert not snapshots.snapshot_is_stale()
+    for name in ('alice', 'bob', 'carol'):
+        add_teacher(name)
+    assert snapshots.snapshot_is_stale()
+
+    # A stale snapshot is still served while a refresh is requested.
+    assert _teachers(snapshots.connect_snapshot()) == 0
+    assert snapshots_on == [1]
+
+def test_without_a_snapshot_reports_read_live(snapshots_on, monkeypatch):
+    add_teacher('alice')
+    assert _teachers(snapshots.connect_snapshot()) == 1
+    monkeypatch.setattr(snapshots, 'enabled', False)
+    snapshots.refresh_snapshot()
+    add_teacher('bob')
+    assert _teachers(snapshots.connect_snapshot()) == 2
+    assert _teachers(connect_db()) == 2
@@ -0,0 +1,47 @@
+# tests/test_sql_trace.py
+#
+# Per-request SQL tracing: counters, the Server-Timing header and the slow query log.
+
+import logging
+
+import pytest
+
+import sql_trace
+from db_setup import connect_db
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setattr(sql_trace, 'enabled', True)
+
+def test_trigger_statements_are_counted_but_not_as_queries(db, tracing):
+    sql_trace.start_request()
+    conn = connect_db()
+    try:
+        conn.execute("INSERT INTO Teachers (Name, Username, Password) VALUES ('Alice', 'alice', 'secret')")
+        conn.execute("SELECT * FROM Teachers").fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    stats = sql_trace.finish_request()
+    assert stats.queries == 2
+    assert stats.statements > stats.queries  # the ChangeLog, cache and view triggers
+    assert sorted(sql.split()[0] for _seconds, sql, _params in stats.slowest()) == ['INSERT', 'SELECT']
+    assert stats.db_seconds > 0
+
+def test_untraced_connections_record_nothing(db):
+    sql_trace.start_request()
+    conn = connect_db()
+    conn.execute("SELECT 1").fetchall()
+    conn.close()
+    assert sql_trace.finish_request().queries == 0
+
+def test_responses_carry_server_timing(app, client, tracing):
+    response = client.post('/login', data={'username': 'nobody', 'password': 'secret'})
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert int(response.headers['X-DB-Query-Count']) >= 1
+
+def test_slow_queries_are_logged_with_their_plan(app, client, tracing, monkeypatch, caplog):
+    monkeypatch.setattr(sql_trace, 'SLOW_QUERY_MS', 0)
+    with caplog.at_level(logging.WARNING, logger='sql_trace'):
+        client.post('/login', data={'username': 'nobody', 'password': 'secret'})
+    assert any('Slow query' in record.getMessage() and 'plan:' in record.getMessage() for record in caplog.records)
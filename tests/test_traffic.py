@@ -0,0 +1,35 @@
+# tests/test_traffic.py
+#
+# Recording sanitized request traces and replaying them.
+
+import json
+
+import replay_traffic
+
+def _record(app, client, tmp_path, monkeypatch):
+    path = tmp_path / 'traffic.jsonl'
+    monkeypatch.setitem(app.config, 'TRAFFIC_RECORD_FILE', str(path))
+    client.post('/login', data={'username': 'nobody', 'password': 'hunter2'})
+    client.get('/login?token=abc&page=2')
+    client.get('/metrics')
+    return path
+
+def test_traces_keep_field_names_but_no_values(app, client, tmp_path, monkeypatch):
+    path = _record(app, client, tmp_path, monkeypatch)
+    text = path.read_text()
+    assert 'hunter2' not in text and 'abc' not in text
+    traces = [json.loads(line) for line in text.splitlines()]
+    assert [(trace['method'], trace['endpoint']) for trace in traces] == [('POST', 'login'), ('GET', 'login')]
+    assert traces[0]['form_keys'] == ['password', 'username']
+    assert traces[1]['query'] == {'token': '<redacted>', 'page': '2'}
+    assert traces[0]['role'] == 'anonymous'
+
+def test_replay_reports_every_recorded_endpoint(app, client, tmp_path, monkeypatch):
+    path = _record(app, client, tmp_path, monkeypatch)
+    monkeypatch.setitem(app.config, 'TRAFFIC_RECORD_FILE', None)
+
+    traces = replay_traffic.load_traces(str(path), repeat=3)
+    assert len(traces) == 6 and traces == sorted(traces, key=lambda trace: trace['t'])
+    report, _wall = replay_traffic.replay(traces, replay_traffic.TestClientTarget({}), concurrency=2)
+    assert {key: stats['count'] for key, stats in report.items()} == {'POST login': 3, 'GET login': 3}
+    assert all(stats['errors'] == 0 for stats in report.values())
@@ -0,0 +1,160 @@
+# tests/test_write_queue.py
+#
+# Write coordination: direct transactions, the group-commit writer and its timeout.
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import write_queue
+from db_setup import connect_db
+from smart_scheduler import submit_booking_request
+from write_queue import run_write
+
+from conftest import add_teacher, room_id
+
+@pytest.fixture
+def queue_mode(file_db):
+    """Queued writes with a writer thread of their own, connected to this test's database."""
+    write_queue._reset_after_fork()
+    write_queue.set_mode('queue')
+    yield file_db
+    write_queue.set_mode('direct')
+    write_queue._reset_after_fork()
+
+def _insert_room(name):
+    return lambda conn: conn.execute("INSERT INTO Classrooms (Name) VALUES (?)", (name,)).lastrowid
+
+def _room_names():
+    conn = connect_db()
+    try:
+        return {row[0] for row in conn.execute("SELECT Name FROM Classrooms")}
+    finally:
+        conn.close()
+
+def _run_together(functions):
+    """Runs the functions in threads released at the same moment; returns results or exceptions."""
+    barrier = threading.Barrier(len(functions))
+    results = [None] * len(functions)
+
+    def run(i, fn):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, fn)) for i, fn in enumerate(functions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_direct_write_rolls_back_on_error(file_db):
+    def failing(conn):
+        conn.execute("INSERT INTO Classrooms (Name) VALUES ('Half done')")
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        run_write(failing)
+    assert 'Half done' not in _room_names()
+    assert run_write(_insert_room('Done')) > 0
+    assert 'Done' in _room_names()
+
+def test_queued_failing_op_is_rolled_back_alone(queue_mode):
+    def failing(conn):
+        conn.execute("INSERT INTO Classrooms (Name) VALUES ('Rolled back')")
+        raise ValueError("boom")
+
+    functions = [lambda n=n: run_write(_insert_room(f'Room {n}')) for n in range(8)]
+    functions.append(lambda: run_write(failing))
+    results = _run_together(functions)
+
+    assert isinstance(results[-1], ValueError)
+    assert all(isinstance(result, int) for result in results[:-1])
+    names = _room_names()
+    assert {f'Room {n}' for n in range(8)} <= names
+    assert 'Rolled back' not in names
+
+@pytest.mark.parametrize('mode', ['direct', 'queue'])
+def test_concurrent_requests_for_one_slot_book_it_once(file_db, mode):
+    write_queue._reset_after_fork()
+    write_queue.set_mode(mode)
+    try:
+        teachers = [add_teacher(f'teacher{n}') for n in range(6)]
+        room = room_id()
+        results = _run_together([lambda t=t: submit_booking_request(t, room, '2030-03-04', '10:00', '')
+                                 for t in teachers])
+    finally:
+        write_queue.set_mode('direct')
+        write_queue._reset_after_fork()
+
+    assert sorted(results) == [False] * 5 + [True]
+    conn = connect_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM Bookings WHERE RoomID = ?", (room,)).fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_timed_out_write_is_withdrawn_and_never_commits(queue_mode, monkeypatch):
+    monkeypatch.setattr(write_queue, 'RESULT_TIMEOUT_SECONDS', 0.2)
+    started = threading.Event()
+
+    def slow(conn):
+        started.set()
+        time.sleep(0.6)
+        return _insert_room('Slow')(conn)
+
+    slow_result = []
+    thread = threading.Thread(target=lambda: slow_result.append(run_write(slow)))
+    thread.start()
+    assert started.wait(5)
+
+    # Queued behind the slow op: the caller gives up before the writer reaches it.
+    with pytest.raises(sqlite3.OperationalError):
+        run_write(_insert_room('Withdrawn'))
+
+    # The slow op was already running when its caller timed out: it still gets the real result.
+    thread.join()
+    assert isinstance(slow_result[0], int)
+    assert run_write(_insert_room('After')) > 0
+    names = _room_names()
+    assert {'Slow', 'After'} <= names
+    assert 'Withdrawn' not in names
+
+def test_admin_booking_edits_go_through_run_write(client, monkeypatch):
+    calls = []
+    real_run_write = write_queue.run_write
+
+    def counting_run_write(fn, *args):
+        calls.append(fn.__name__)
+        return real_run_write(fn, *args)
+
+    import app as app_module
+    monkeypatch.setattr(app_module, 'run_write', counting_run_write)
+
+    teacher = add_teacher('alice')
+    assert submit_booking_request(teacher, room_id(), '2030-03-04', '09:00', '')
+    conn = connect_db()
+    booking_id = conn.execute("SELECT BookingID FROM Bookings").fetchone()[0]
+    conn.close()
+
+    form = {'date': '2030-03-05', 'start_time': '10:00', 'end_time': '10:40', 'equipment': '', 'status': 'Pending'}
+    assert client.post(f'/edit_booking/{booking_id}', data=form).status_code == 302
+    assert client.post(f'/admin/manage_teachers/edit/{teacher}',
+                       data={'name': 'Alice B', 'subject': 'ICT', 'username': 'alice', 'role': 'Teacher'}
+                       ).status_code == 302
+    conn = connect_db()
+    assert conn.execute("SELECT Date, StartTime FROM Bookings").fetchone() == ('2030-03-05', '10:00')
+    assert conn.execute("SELECT Name FROM Teachers WHERE TeacherID = ?", (teacher,)).fetchone()[0] == 'Alice B'
+    conn.close()
+
+    assert client.post(f'/delete_booking/{booking_id}').status_code == 302
+    assert client.post(f'/delete_booking/{booking_id}').status_code == 302  # already gone: "not found"
+    conn = connect_db()
+    assert conn.execute("SELECT COUNT(*) FROM Bookings").fetchone()[0] == 0
+    conn.close()
+    assert calls == ['update_booking', 'update_teacher', 'delete', 'delete']
@@ -0,0 +1,79 @@
+# traffic.py
+#
+# Records sanitized request traces to JSONL so real traffic (e.g. a Monday-morning
+# booking rush) can be replayed offline with replay_traffic.py.
+#
+# Enable with SMART_CLASSROOM_TRAFFIC_FILE=/path/traffic.jsonl or
+# app.config['TRAFFIC_RECORD_FILE']. Each line looks like:
+#
+#   {"t": 1760000000.123, "method": "POST", "path": "/bookings/new", "endpoint": "bookings",
+#    "query": {"page": "2"}, "form_keys": ["room_id", "date", ...], "files": {"letter_file": 18234},
+#    "role": "Teacher", "status": 302, "duration_ms": 12.4}
+#
+# Form values, cookies and headers are never written; only the names of form fields
+# are kept, and query values of sensitive keys are redacted.
+
+import json
+import os
+import threading
+import time
+
+SENSITIVE_KEYS = {'password', 'token', 'secret', 'csrf_token', 'phone', 'phone_number', 'email'}
+
+# Endpoints that are never recorded.
+SKIPPED_ENDPOINTS = {'static', 'metrics'}
+
+_lock = threading.Lock()
+_files = {}
+
+def _sanitize_query(args):
+    return {key: ('<redacted>' if key.lower() in SENSITIVE_KEYS else value) for key, value in args.items()}
+
+def _upload_size(storage):
+    try:
+        storage.stream.seek(0, os.SEEK_END)
+        return storage.stream.tell()
+    except (OSError, ValueError, AttributeError):
+        return storage.content_length or 0
+
+def build_trace(request, session, response, duration_s):
+    """Builds the JSON-serializable trace for one request."""
+    return {
+        't': round(time.time() - duration_s, 4),
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint or 'unmatched',
+        'query': _sanitize_query(request.args),
+        'form_keys': sorted(request.form.keys()),
+        'files': {name: _upload_size(storage) for name, storage in request.files.items()},
+        'role': session.get('role') or 'anonymous',
+        'status': response.status_code,
+        'duration_ms': round(duration_s * 1000, 3),
+    }
+
+def write_trace(path, trace):
+    line = json.dumps(trace, separators=(',', ':')) + '\n'
+    with _lock:
+        f = _files.get(path)
+        if f is None:
+            f = _files[path] = open(path, 'a', buffering=1)
+        f.write(line)
+
+def init_app(app):
+    """Registers the recorder; it only writes while app.config['TRAFFIC_RECORD_FILE'] is set."""
+    from flask import g, request, session
+
+    app.config.setdefault('TRAFFIC_RECORD_FILE', os.environ.get('SMART_CLASSROOM_TRAFFIC_FILE'))
+
+    @app.before_request
+    def _traffic_start():
+        if app.config['TRAFFIC_RECORD_FILE']:
+            g._traffic_start = time.perf_counter()
+
+    @app.after_request
+    def _traffic_record(response):
+        start = g.pop('_traffic_start', None)
+        path = app.config['TRAFFIC_RECORD_FILE']
+        if start is not None and path and request.endpoint not in SKIPPED_ENDPOINTS:
+            write_trace(path, build_trace(request, session, response, time.perf_counter() - start))
+        return response
@@ -0,0 +1,174 @@
+# write_queue.py
+#
+# Write coordination for SQLite.
+#
+# Every write path hands its work to run_write() as a function that receives a
+# connection. In the default 'direct' mode the function runs on a fresh
+# connection inside BEGIN IMMEDIATE ... COMMIT, so the write lock is taken before
+# its first read and a check-then-write (overlap checks, holds, stock checks)
+# cannot interleave with another writer. In 'queue' mode
+# (SMART_CLASSROOM_WRITE_MODE=queue or app.config['WRITE_MODE'] = 'queue') the
+# function is handed to a single writer thread that collects operations for a
+# few milliseconds and commits them together:
+#
+#   BEGIN IMMEDIATE
+#     SAVEPOINT op; <op 1>; RELEASE op        -- a failing op is rolled back alone
+#     SAVEPOINT op; <op 2>; RELEASE op
+#     ...
+#   COMMIT                                    -- one fsync for the whole batch
+#
+# Callers block until their batch is committed and get their own return value
+# (or exception) back, so the API is identical in both modes. A caller that times
+# out before the writer picks its op up withdraws it; once picked up, the op's
+# real outcome is returned. Write functions must only use the connection they are given.
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import metrics
+
+# --- CONFIGURATION ---
+
+mode = os.environ.get("SMART_CLASSROOM_WRITE_MODE", "direct")
+
+# How long the writer waits for more operations after the first one arrives.
+BATCH_WINDOW_SECONDS = 0.003
+
+# Upper bound on operations per transaction, to keep the write lock short.
+BATCH_MAX_OPS = 200
+
+# How long a caller waits for the writer to pick its op up before giving up.
+RESULT_TIMEOUT_SECONDS = 30
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+def set_mode(new_mode):
+    """Selects 'direct' or 'queue' for writes submitted from now on."""
+    global mode
+    if new_mode not in ("direct", "queue"):
+        raise ValueError(f"Unknown write mode: {new_mode}")
+    mode = new_mode
+
+# --- PUBLIC API ---
+
+def run_write(fn, *args):
+    """Runs fn(conn, *args) inside a committed transaction and returns its result."""
+    from cache_bus import forget_versions  # local import, like db_setup below
+    if mode == "queue":
+        future = _submit(fn, args)
+        try:
+            result = future.result(timeout=RESULT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # Only an op the writer has not picked up yet can be withdrawn; callers handle
+            # sqlite3.Error, so a writer that is too busy looks like a lock timeout.
+            if future.cancel():
+                raise sqlite3.OperationalError(f"write not started within {RESULT_TIMEOUT_SECONDS}s") from None
+            # Already in a batch: it commits or fails with it, so report what actually happened.
+            result = future.result()
+    else:
+        result = _run_direct(fn, args)
+    # The caller's own reads must see its write, not the versions read earlier in the request.
+    forget_versions()
+    return result
+
+def _run_direct(fn, args):
+    from db_setup import connect_db  # local import: db_setup is loaded by callers first
+    conn = connect_db()
+    conn.isolation_level = None  # transactions are managed explicitly, as in the writer thread
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        result = fn(conn, *args)
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+        return result
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+# --- WRITER THREAD ---
+
+def _submit(fn, args):
+    future = Future()
+    _ensure_writer()
+    _queue.put((fn, args, future, time.perf_counter()))
+    return future
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="sqlite-writer", daemon=True)
+            _writer.start()
+
+def _collect_batch():
+    batch = [_queue.get()]
+    deadline = time.perf_counter() + BATCH_WINDOW_SECONDS
+    while len(batch) < BATCH_MAX_OPS:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _writer_loop():
+    from db_setup import connect_db
+    conn = connect_db()
+    conn.isolation_level = None  # transactions are managed explicitly below
+    while True:
+        # Ops whose caller gave up (cancelled futures) are skipped; the rest can no longer be cancelled.
+        batch = [op for op in _collect_batch() if op[2].set_running_or_notify_cancel()]
+        if not batch:
+            continue
+        metrics.WRITE_BATCH_SIZE.observe(len(batch))
+        metrics.DB_CONNECTION_REUSES.inc(amount=len(batch))
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future, queued_at in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    outcomes.append((future, True, fn(conn, *args), queued_at))
+                    conn.execute("RELEASE op")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    outcomes.append((future, False, e, queued_at))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            # The whole batch failed (e.g. the lock could not be taken); report it to every caller.
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, False, e, queued_at) for _fn, _args, future, queued_at in batch]
+
+        # Results are only released after COMMIT, so callers never see uncommitted work.
+        now = time.perf_counter()
+        for future, ok, value, queued_at in outcomes:
+            metrics.WRITE_WAIT.observe(now - queued_at)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+def _reset_after_fork():
+    """The writer thread does not survive fork(); a worker starts its own on first use."""
+    global _queue, _writer, _writer_lock
+    _queue = queue.Queue()
+    _writer = None
+    _writer_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,12 @@
+# wsgi.py
+#
+# Production entry point:
+#   flask --app wsgi init                    (once, before the first deploy and after upgrades)
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Loading this module performs no database work, so workers boot without
+# touching the SQLite write lock.
+
+from app import configure_app
+
+app = configure_app()
@@ -1,9 +1,9 @@
 import sqlite3
 
-DB_FILE = "smart_classroom.db"
+from db_setup import connect_db
 
 def ensure_system_settings_table():
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect_db()
     cursor = conn.cursor()
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS SystemSettings (
@@ -16,7 +16,7 @@ def ensure_system_settings_table():
     conn.close()
 import sqlite3
 
-conn = sqlite3.connect("smart_classroom.db")
+conn = connect_db()
 cursor = conn.cursor()
 cursor.execute("PRAGMA table_info(Bookings);")
 columns = cursor.fetchall()